@@ -0,0 +1,116 @@
+"""
+Benchmark: local ANN index recall and QPS vs corpus size.
+
+Builds synthetic 384-dim unit vectors (a Gaussian mixture, so there is
+cluster structure like real profile/document embeddings) at each --sizes
+value, inserts them through digital_twin_ann in --insert-batch chunks (the
+path embed_digitaltwin.py takes), then times --queries single-vector queries
+for a range of nprobe (IVF) and ef (HNSW, if hnswlib is installed) settings.
+Recall@k is measured against an exact brute-force scan, which is also timed
+as the baseline.
+
+Usage:
+  python benchmarks/bench_ann.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import digital_twin_ann as ann  # noqa: E402
+
+DIM = ann.INDEX_DIMENSION
+
+
+def synthetic_vectors(n: int, clusters: int, rng) -> np.ndarray:
+    centers = ann._normalize(rng.standard_normal((clusters, DIM)))
+    out = np.empty((n, DIM), dtype=np.float32)
+    for start in range(0, n, 100000):
+        size = min(100000, n - start)
+        labels = rng.integers(0, clusters, size)
+        out[start:start + size] = centers[labels] + 0.08 * rng.standard_normal((size, DIM)).astype(np.float32)
+    return ann._normalize(out)
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.stack([ann._top_k(data @ q, k) for q in queries])
+
+
+def time_queries(search, queries: np.ndarray) -> tuple:
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append(search(q))
+    elapsed = time.perf_counter() - start
+    return results, len(queries) / elapsed
+
+
+def recall(found, truth: np.ndarray) -> float:
+    hits = sum(len(set(rows.tolist()) & set(t.tolist())) for rows, t in zip(found, truth))
+    return hits / truth.size
+
+
+def build(index, data: np.ndarray, batch: int) -> float:
+    ids = [str(i) for i in range(len(data))]
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        index.add(ids[offset:offset + batch], data[offset:offset + batch])
+    return time.perf_counter() - start
+
+
+def run_size(n: int, args, rng) -> list:
+    data = synthetic_vectors(n, max(16, n // 500), rng)
+    picks = rng.choice(n, args.queries, replace=False)
+    queries = ann._normalize(data[picks] + 0.05 * rng.standard_normal((args.queries, DIM)).astype(np.float32))
+    truth = exact_top_k(data, queries, args.k)
+    rows = []
+
+    _, qps = time_queries(lambda q: ann._top_k(data @ q, args.k), queries)
+    rows.append((n, "exact", "-", 1.0, qps, 0.0))
+
+    ivf = ann.IVFIndex(dim=DIM)
+    build_s = build(ivf, data, args.insert_batch)
+    for nprobe in args.nprobe:
+        found, qps = time_queries(lambda q: ivf.search(q, args.k, nprobe=nprobe)[0], queries)
+        rows.append((n, "ivf", f"nprobe={nprobe}", recall(found, truth), qps, build_s))
+
+    try:
+        hnsw = ann.HNSWIndex(dim=DIM, capacity=n)
+    except ImportError:
+        print("  (hnswlib not installed; skipping HNSW)", file=sys.stderr)
+        return rows
+    build_s = build(hnsw, data, args.insert_batch)
+    for ef in args.ef:
+        found, qps = time_queries(lambda q: hnsw.search(q, args.k, ef=ef)[0], queries)
+        rows.append((n, "hnsw", f"ef={ef}", recall(found, truth), qps, build_s))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--insert-batch", type=int, default=256, help="embed_digitaltwin.py's ENCODE_CHUNK_SIZE")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'vectors':>9} {'index':>6} {'setting':>11} {f'recall@{args.k}':>10} {'QPS':>9} {'build s':>8}")
+    for n in args.sizes:
+        for size, kind, setting, rec, qps, build_s in run_size(n, args, rng):
+            print(f"{size:>9} {kind:>6} {setting:>11} {rec:>10.3f} {qps:>9.0f} {build_s:>8.1f}")
+    print("\nQPS is single-threaded, one query vector at a time; build time includes incremental "
+          "inserts and IVF (re)training.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark: embedding throughput vs number of worker processes.
+
+Encodes --records texts (profile leaves from digitaltwin.json, repeated with a
+suffix so nothing is trivially cached) through digital_twin_embedding_pool
+for 1..--max-workers workers, without uploading anything. Reports records/s,
+scaling relative to one worker and the parent's peak RSS (which stays flat as
+the record count grows because results are streamed).
+
+Usage:
+  python benchmarks/bench_embed_parallel.py --records 20000 --max-workers 4
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import digital_twin_resources as resources  # noqa: E402
+from digital_twin_embedding_pool import EmbeddingPool, chunked  # noqa: E402
+
+
+def synthetic_texts(count: int):
+    leaves = [t for _, t in resources.flatten_json(resources.load_profile()) if t.strip()]
+    for i in range(count):
+        yield f"{leaves[i % len(leaves)]} ({i})"
+
+
+def run(workers: int, records: int, chunk_size: int) -> dict:
+    done = 0
+    with EmbeddingPool(workers=workers) as pool:
+        # Let every worker load its model before timing
+        list(pool.map(chunked(synthetic_texts(workers * 8), 8)))
+        start = time.perf_counter()
+        for chunk, matrix in pool.map(chunked(synthetic_texts(records), chunk_size)):
+            done += matrix.shape[0]
+        elapsed = time.perf_counter() - start
+    return {
+        "workers": workers,
+        "rps": round(done / elapsed, 1),
+        "parent_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    args = parser.parse_args()
+
+    rows = [run(w, args.records, args.chunk_size) for w in range(1, args.max_workers + 1)]
+    base = rows[0]["rps"] or 1
+    print(f"{'workers':>7} {'records/s':>10} {'scaling':>8} {'parent peak RSS':>16}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['rps']:>10} {r['rps'] / base:>7.2f}x {r['parent_peak_rss_mb']:>13} MB")
+    print("\nParent peak RSS is cumulative over the run; workers=1 encodes in-process, so it includes the model.")
+
+
+if __name__ == "__main__":
+    main()
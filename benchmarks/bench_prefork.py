@@ -0,0 +1,130 @@
+"""
+Benchmark: per-worker memory and throughput scaling of digital_twin_prefork.py.
+
+For each worker count from 1 to --max-workers, starts the pre-fork server on
+benchmarks/prefork_bench_app.py (local embedding only, no LLM calls), drives
+it with concurrent POST /embed requests for --duration seconds and reports:
+
+  - requests/s and scaling relative to one worker
+  - parent RSS and per-worker USS (private memory = what each extra worker costs)
+  - per-worker PSS (shared pages split between all processes)
+
+Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage:
+  python benchmarks/bench_prefork.py --max-workers 4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from digital_twin_prefork import read_memory  # noqa: E402
+
+QUESTIONS = [
+    "What programming languages do you know?",
+    "Tell me about your computer vision projects.",
+    "What was your biggest technical challenge?",
+    "Describe your experience with FastAPI and Next.js.",
+    "What are your salary expectations?",
+    "How did you improve the proctoring system's FPS?",
+]
+
+
+def child_pids(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children", "r") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def wait_ready(url: str, timeout: float = 120.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as r:
+                if r.status == 200:
+                    return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+def drive(base_url: str, duration: float, concurrency: int) -> int:
+    stop_at = time.monotonic() + duration
+    counts = [0] * concurrency
+
+    def loop(slot):
+        i = slot
+        while time.monotonic() < stop_at:
+            body = json.dumps({"text": QUESTIONS[i % len(QUESTIONS)] + f" #{i}"}).encode()
+            req = urllib.request.Request(base_url + "/embed", data=body,
+                                         headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(req, timeout=30) as r:
+                r.read()
+            counts[slot] += 1
+            i += concurrency
+
+    threads = [threading.Thread(target=loop, args=(s,)) for s in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts)
+
+
+def run(workers: int, port: int, duration: float) -> dict:
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT_DIR, "digital_twin_prefork.py"), "benchmarks.prefork_bench_app:app",
+         "--workers", str(workers), "--port", str(port), "--host", "127.0.0.1"],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_ready(base_url + "/health")
+        drive(base_url, 2.0, workers * 2)  # warm every worker
+        completed = drive(base_url, duration, workers * 4)
+        parent = read_memory(proc.pid)
+        children = [read_memory(pid) for pid in child_pids(proc.pid)]
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    mb = lambda kb: round(kb / 1024, 1)  # noqa: E731
+    return {
+        "workers": workers,
+        "rps": round(completed / duration, 1),
+        "parent_rss_mb": mb(parent.get("rss_kb", 0)),
+        "worker_uss_mb": mb(sum(c["uss_kb"] for c in children) / max(1, len(children))),
+        "worker_pss_mb": mb(sum(c["pss_kb"] for c in children) / max(1, len(children))),
+        "worker_rss_mb": mb(sum(c["rss_kb"] for c in children) / max(1, len(children))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    rows = [run(w, args.port + w, args.duration) for w in range(1, args.max_workers + 1)]
+    base = rows[0]["rps"] or 1
+    print(f"{'workers':>7} {'req/s':>8} {'scaling':>8} {'worker USS':>11} {'worker PSS':>11} {'worker RSS':>11}")
+    for r in rows:
+        print(f"{r['workers']:>7} {r['rps']:>8} {r['rps'] / base:>7.2f}x "
+              f"{r['worker_uss_mb']:>9} MB {r['worker_pss_mb']:>8} MB {r['worker_rss_mb']:>8} MB")
+    print("\nworker USS is the incremental memory of each additional worker.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: quantized local index memory vs recall.
+
+Builds the same synthetic corpus (see bench_ann.py) into the local IVF index
+with float32, int8 and binary codes, flat (exact candidate scan) and with IVF
+lists, and reports the RAM the scan needs per vector, the compression against
+float32, recall@k after exact rescoring, single-query QPS and build time, for
+a range of rescore factors. Vectors are inserted in --insert-batch chunks
+(default 256, embed_digitaltwin.py's ENCODE_CHUNK_SIZE), so build time shows
+what quantizing costs the indexer.
+
+Usage:
+  python benchmarks/bench_quantization.py --size 100000 --rescore 2 4 16 32
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import digital_twin_ann as ann  # noqa: E402
+from bench_ann import DIM, exact_top_k, recall, synthetic_vectors  # noqa: E402
+
+
+def run(data, queries, truth, k, quantization, rescore, ivf: bool, nprobe: int, batch: int) -> dict:
+    index = ann.IVFIndex(dim=DIM, quantization=quantization, rescore=rescore,
+                         min_train=ann.IVF_MIN_TRAIN if ivf else len(data) + 1)
+    ids = [str(i) for i in range(len(data))]
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch):
+        index.add(ids[offset:offset + batch], data[offset:offset + batch])
+    # The first search writes any codes the last inserts left to requantize
+    index.search(queries[0], k)
+    build_s = time.perf_counter() - start
+    start = time.perf_counter()
+    found = [index.search(q, k, nprobe=nprobe)[0] for q in queries]
+    qps = len(queries) / (time.perf_counter() - start)
+    return {
+        "bytes": index.memory_bytes() / len(index),
+        "recall": recall(found, truth),
+        "qps": qps,
+        "build_s": build_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[2, 4, 16, 32])
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--insert-batch", type=int, default=256, help="vectors per add() call")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = synthetic_vectors(args.size, max(16, args.size // 500), rng)
+    picks = rng.choice(args.size, args.queries, replace=False)
+    queries = ann._normalize(data[picks] + 0.05 * rng.standard_normal((args.queries, DIM)).astype(np.float32))
+    truth = exact_top_k(data, queries, args.k)
+
+    print(f"{args.size} vectors, {DIM} dims, recall@{args.k} against an exact float32 scan\n")
+    print(f"{'search':>6} {'codes':>7} {'rescore':>8} {'B/vector':>9} {'smaller':>8} {f'recall@{args.k}':>10} {'QPS':>8} {'build s':>8}")
+    for ivf in (False, True):
+        for quantization in ("none", "int8", "binary"):
+            factors = [1] if quantization == "none" else args.rescore
+            for rescore in factors:
+                r = run(data, queries, truth, args.k, quantization, rescore, ivf, args.nprobe, args.insert_batch)
+                print(f"{'ivf' if ivf else 'flat':>6} {quantization:>7} {rescore:>8} {r['bytes']:>9.0f} "
+                      f"{DIM * 4 / r['bytes']:>7.0f}x {r['recall']:>10.3f} {r['qps']:>8.0f} {r['build_s']:>8.1f}")
+    print("\nB/vector is what a loaded index holds in RAM for scanning; quantized indexes keep the float "
+          "vectors memory-mapped on disk and read only the rescored candidates. Synthetic vectors are "
+          "noisier than real embeddings, so binary codes need a larger rescore factor here.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: retrieval quality gain vs added latency of the cross-encoder rerank.
+
+Runs fully offline against digitaltwin.json. Every interview_prep question is
+used as a query; its relevant snippets are the answer leaves stored under that
+question (answer_framework, STAR parts). The question leaves themselves are
+removed from the corpus so the query cannot match itself.
+
+For each query the top --candidates leaves by local embedding similarity are
+taken (the vector-only baseline), then reranked by the cross-encoder. Reported:
+
+  - hit@k and MRR for vector order vs reranked order
+  - rerank latency per query (cold = uncached pairs, warm = pair cache hits)
+
+Usage:
+  python benchmarks/bench_rerank.py --candidates 15 --k 3
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import digital_twin_resources as resources  # noqa: E402
+from digital_twin_precomputed import collect_interview_questions  # noqa: E402
+from digital_twin_rerank import Reranker  # noqa: E402
+
+
+def build_eval_set(profile: dict):
+    leaves = [(k, t) for k, t in resources.flatten_json(profile) if t.strip()]
+    questions = collect_interview_questions(profile)
+    question_keys = {f"{path}.question" for path, _, _ in questions}
+    corpus = [(k, t) for k, t in leaves if k not in question_keys]
+    queries = []
+    for path, question, _ in questions:
+        relevant = {i for i, (k, _) in enumerate(corpus) if k.startswith(path + ".")}
+        if relevant:
+            queries.append((question, relevant))
+    return corpus, queries
+
+
+def metrics(rankings: list, queries: list, k: int) -> dict:
+    hits, rr = 0, []
+    for ranking, (_, relevant) in zip(rankings, queries):
+        ranks = [pos for pos, idx in enumerate(ranking) if idx in relevant]
+        hits += 1 if ranks and ranks[0] < k else 0
+        rr.append(1 / (ranks[0] + 1) if ranks else 0.0)
+    return {f"hit@{k}": round(hits / len(queries), 3), "mrr": round(statistics.mean(rr), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rerank quality vs latency benchmark.")
+    parser.add_argument("--candidates", type=int, default=15)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus, queries = build_eval_set(resources.load_profile())
+    print(f"Corpus: {len(corpus)} leaves, {len(queries)} labelled queries")
+
+    corpus_matrix = resources.encode_matrix([t for _, t in corpus])
+    query_matrix = resources.encode_matrix([q for q, _ in queries])
+    scores = query_matrix @ corpus_matrix.T
+    vector_rankings = [list(row.argsort()[::-1][:args.candidates]) for row in scores]
+
+    reranker = Reranker()
+    reranker.warm_up()
+
+    def rerank_all():
+        rankings, latencies = [], []
+        for (question, _), candidates in zip(queries, vector_rankings):
+            hits = [{"metadata": {"text": corpus[i][1]}, "idx": i} for i in candidates]
+            start = time.perf_counter()
+            ordered, _ = reranker.rerank(question, hits, budget_ms=60_000)
+            latencies.append((time.perf_counter() - start) * 1000)
+            rankings.append([h["idx"] for h in ordered])
+        return rankings, latencies
+
+    reranked, cold = rerank_all()
+    _, warm = rerank_all()
+
+    base = metrics(vector_rankings, queries, args.k)
+    rr = metrics(reranked, queries, args.k)
+    print(f"\n{'':>12} {'hit@' + str(args.k):>8} {'MRR':>8}")
+    print(f"{'vector':>12} {base[f'hit@{args.k}']:>8} {base['mrr']:>8}")
+    print(f"{'reranked':>12} {rr[f'hit@{args.k}']:>8} {rr['mrr']:>8}")
+    print(f"\nRerank latency for {args.candidates} candidates (ms):")
+    print(f"  cold  p50 {statistics.median(cold):6.1f}  max {max(cold):6.1f}")
+    print(f"  warm  p50 {statistics.median(warm):6.2f}  max {max(warm):6.2f}  (pair cache hits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Minimal app for benchmarking the pre-fork server: embeds the posted text with
+the shared model and returns the vector norm. No LLM or network calls, so
+throughput reflects CPU scaling only.
+"""
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+import digital_twin_resources as resources
+
+app = FastAPI(title="Pre-fork benchmark app")
+
+
+class EmbedRequest(BaseModel):
+    text: str
+
+
+@app.post("/embed")
+def embed(payload: EmbedRequest):
+    vector = resources.get_embedding_model().encode(payload.text, show_progress_bar=False)
+    return {"dim": int(vector.shape[0]), "norm": float((vector ** 2).sum() ** 0.5)}
+
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
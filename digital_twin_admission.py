@@ -0,0 +1,190 @@
+"""
+Admission control and load shedding for the Digital Twin RAG endpoints.
+
+Two layers keep latency bounded under traffic spikes:
+
+1. AdmissionController (per endpoint): at most `max_concurrent` requests run
+   at once and at most `max_queue` wait for a slot. When the queue is full,
+   or a request waits longer than `queue_timeout`, it is rejected immediately
+   with 503 + Retry-After instead of timing out slowly downstream.
+
+2. TokenBucket (per LLM provider): completions that miss the response cache
+   take a token before calling the provider, pacing calls to the provider's
+   rate limit. If no token frees up within LLM_PACING_MAX_WAIT the call fails
+   fast with 429 + Retry-After.
+
+Queue depth, in-flight count, rejections and queue-wait percentiles are
+available from `stats()` (served at /admission/stats by the APIs).
+
+Environment variables:
+  - ADMISSION_MAX_CONCURRENT (default 8), ADMISSION_MAX_QUEUE (default 16)
+  - ADMISSION_QUEUE_TIMEOUT (seconds, default 5)
+  - GROQ_REQUESTS_PER_MINUTE (default 30), OPENAI_REQUESTS_PER_MINUTE (default 500)
+  - LLM_PACING_MAX_WAIT (seconds, default 2)
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+PACING_MAX_WAIT = float(os.getenv("LLM_PACING_MAX_WAIT", "2"))
+
+PROVIDER_REQUESTS_PER_MINUTE = {
+    "groq": float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+    "openai": float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "500")),
+}
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After seconds."""
+
+    def __init__(self, status_code: int, retry_after: float, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate * 5)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, max_wait: float = PACING_MAX_WAIT) -> float:
+        """Take a token, sleeping until it is due; raise Overloaded if that would exceed max_wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: each waiter reserves its own future token,
+            # so concurrent callers queue up behind each other instead of
+            # all waking at the same refill.
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if wait > max_wait:
+                self.throttled += 1
+                raise Overloaded(429, wait, "LLM provider rate limit reached, retry later")
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded wait queue."""
+
+    def __init__(self, name: str, max_concurrent: int = MAX_CONCURRENT, max_queue: int = MAX_QUEUE,
+                 queue_timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waits_ms = deque(maxlen=1000)
+        self._service_ms = deque(maxlen=100)
+        self._cond = threading.Condition()
+
+    def _retry_after(self) -> float:
+        # Rough time for the current backlog to drain.
+        mean_service = (sum(self._service_ms) / len(self._service_ms) / 1000) if self._service_ms else 1.0
+        return mean_service * (self.waiting + 1) / max(1, self.max_concurrent)
+
+    @contextmanager
+    def admit(self):
+        start = time.monotonic()
+        with self._cond:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    self.rejected_queue_full += 1
+                    raise Overloaded(503, self._retry_after(), f"{self.name}: server busy, queue full")
+                self.waiting += 1
+                try:
+                    deadline = start + self.queue_timeout
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._cond.wait(remaining):
+                            if self.active < self.max_concurrent:
+                                break
+                            self.rejected_timeout += 1
+                            raise Overloaded(503, self._retry_after(), f"{self.name}: server busy, queue timeout")
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            self._waits_ms.append((time.monotonic() - start) * 1000)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._service_ms.append((time.monotonic() - started) * 1000)
+                self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._waits_ms)
+        pct = lambda p: round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))], 2) if waits else 0.0  # noqa: E731
+        return {
+            "endpoint": self.name,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "queue_wait_ms": {"p50": pct(50), "p99": pct(99)},
+        }
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def provider_bucket(provider: str):
+    """Shared token bucket for an LLM provider, or None if it has no configured limit."""
+    rpm = PROVIDER_REQUESTS_PER_MINUTE.get(provider)
+    if not rpm:
+        return None
+    with _buckets_lock:
+        bucket = _buckets.get(provider)
+        if bucket is None:
+            # Small burst so a cold instance cannot blow through the per-minute quota at once.
+            bucket = _buckets[provider] = TokenBucket(rpm / 60.0, burst=max(1.0, rpm / 10.0))
+        return bucket
+
+
+def pacing_stats() -> dict:
+    with _buckets_lock:
+        return {
+            name: {"tokens": round(b.tokens, 2), "rate_per_s": round(b.rate, 3), "throttled": b.throttled}
+            for name, b in _buckets.items()
+        }
+
+
+def overloaded_exception_handler(request, exc: Overloaded):
+    """FastAPI exception handler: shed requests get their status and a Retry-After header."""
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
@@ -0,0 +1,604 @@
+"""
+Local approximate nearest-neighbour index for large multi-profile corpora.
+
+With VECTOR_BACKEND=local, digital_twin_resources.get_index() returns a
+LocalVectorIndex instead of the Upstash client. It answers the same
+`query(vector=..., top_k=..., include_metadata=..., namespace=...)` calls, so
+adaptive retrieval, rerank and the metadata store work unchanged, but search
+runs in-process:
+
+  - IVFIndex (numpy, always available): spherical k-means coarse quantizer
+    with ~4·sqrt(n) lists; a query scans the `nprobe` closest lists. Below
+    IVF_MIN_TRAIN vectors it is an exact flat scan.
+  - HNSWIndex (needs `pip install hnswlib`): graph index, `ef` trades recall
+    for latency. Selected with LOCAL_INDEX_ALGORITHM=hnsw.
+
+The IVF index can scan quantized codes instead of float vectors
+(LOCAL_INDEX_QUANTIZATION): "int8" (per-dimension scaled, 4x smaller, float
+query × int8 dot product) or "binary" (sign bits, 32x smaller, Hamming
+distance). The best k × LOCAL_INDEX_RESCORE candidates are then rescored
+exactly against the float vectors, which a loaded quantized index keeps
+memory-mapped on disk (vectors.npy) instead of in RAM.
+
+Both take incremental inserts (ids are upserted) and persist to disk. Each
+index namespace (see digital_twin_index_versions.py) is one directory under
+LOCAL_INDEX_DIR holding the index file and a metadata.db store, both written
+through a temporary file and os.replace(). Scores are reported as
+(1 + cosine) / 2 like Upstash's COSINE metric, so retrieval thresholds tuned
+against Upstash still apply.
+
+Environment variables:
+  - VECTOR_BACKEND ("upstash" (default) or "local")
+  - LOCAL_INDEX_DIR (default local_index/ next to this file)
+  - LOCAL_INDEX_ALGORITHM ("ivf" (default) or "hnsw")
+  - IVF_NPROBE (default 16), IVF_MIN_TRAIN (default 4096)
+  - LOCAL_INDEX_QUANTIZATION ("none" (default), "int8" or "binary")
+  - LOCAL_INDEX_RESCORE (candidates per hit to rescore; default 4 for int8, 32 for binary)
+  - HNSW_M (default 16), HNSW_EF_CONSTRUCTION (default 200), HNSW_EF_SEARCH (default 64)
+
+See benchmarks/bench_ann.py for recall and QPS at 10k / 100k / 1M vectors and
+benchmarks/bench_quantization.py for memory and recall per quantization.
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+
+import digital_twin_index_versions as index_versions
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "upstash")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(ROOT_DIR, "local_index"))
+ALGORITHM = os.getenv("LOCAL_INDEX_ALGORITHM", "ivf")
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+IVF_MIN_TRAIN = int(os.getenv("IVF_MIN_TRAIN", "4096"))
+HNSW_M = int(os.getenv("HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "none")
+RESCORE_FACTOR = int(os.getenv("LOCAL_INDEX_RESCORE", "0"))  # 0 = per-quantization default
+
+INDEX_DIMENSION = 384  # all-MiniLM-L6-v2; padded query vectors are truncated to this
+
+_KMEANS_ITERATIONS = 8
+_KMEANS_SAMPLE_PER_LIST = 32
+_ASSIGN_BATCH = 65536
+# int8 range growth per refit, so small insert chunks rarely widen it again
+_SCALE_HEADROOM = 1.25
+
+_CODE_DTYPES = {"none": np.float32, "int8": np.int8, "binary": np.uint8}
+# Candidates rescored exactly per requested hit; sign bits lose more ranking precision than int8
+_DEFAULT_RESCORE = {"none": 1, "int8": 4, "binary": 32}
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _normalize(matrix) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _encode_ids(ids) -> np.ndarray:
+    return np.frombuffer("\n".join(ids).encode("utf-8"), dtype=np.uint8)
+
+
+def _decode_ids(blob) -> list:
+    text = bytes(blob).decode("utf-8")
+    return text.split("\n") if text else []
+
+
+def _atomic_savez(path: str, **arrays) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+class IVFIndex:
+    """Inverted-file index over unit vectors (inner product = cosine).
+
+    With `quantization` ("int8" or "binary"), candidates are scored on compact
+    codes and only the best `k * rescore` are rescored exactly against the
+    float vectors, which a loaded index reads from a memory-mapped file.
+    """
+
+    FILE_NAME = "index.npz"
+    VECTORS_FILE_NAME = "vectors.npy"
+
+    def __init__(self, dim: int = INDEX_DIMENSION, nprobe: int = IVF_NPROBE, min_train: int = IVF_MIN_TRAIN,
+                 quantization: str = QUANTIZATION, rescore: int = None):
+        if quantization not in _CODE_DTYPES:
+            raise ValueError(f"unknown quantization '{quantization}'; expected one of {sorted(_CODE_DTYPES)}")
+        self.dim = dim
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.quantization = quantization
+        self.rescore = rescore or RESCORE_FACTOR or _DEFAULT_RESCORE.get(quantization, 1)
+        self.ids = []
+        self._positions = {}
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._codes = np.zeros((0, self._code_width()), dtype=_CODE_DTYPES[quantization])
+        self._scale = None  # int8: per-dimension multiplier into [-127, 127]
+        self._absmax = None  # int8: per-dimension range covered by the scale
+        self._codes_stale = False  # int8: range widened since the codes were last written
+        self.count = 0
+        self.centroids = None
+        self.assign = np.zeros(0, dtype=np.int32)
+        self.trained_size = 0
+        self._lists = None  # (row order grouped by list, offsets); rebuilt after inserts
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self.count]
+
+    def memory_bytes(self) -> int:
+        """RAM taken by what search scans: the float vectors, or the codes when quantized."""
+        if self.quantization == "none":
+            return self.count * self.dim * 4
+        return self.count * self._code_width()
+
+    def _code_width(self) -> int:
+        return {"none": 0, "int8": self.dim, "binary": (self.dim + 7) // 8}[self.quantization]
+
+    def _reserve(self, extra: int) -> None:
+        needed = self.count + extra
+        # A loaded quantized index maps its vectors read-only; copy them before writing
+        if needed <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(needed, 2 * len(self._vectors), 1024)
+        grown = np.zeros((capacity, self.dim), dtype=np.float32)
+        grown[:self.count] = self.vectors
+        self._vectors = grown
+        if self.quantization != "none":
+            codes = np.zeros((capacity, self._code_width()), dtype=self._codes.dtype)
+            codes[:self.count] = self._codes[:self.count]
+            self._codes = codes
+        assign = np.zeros(capacity, dtype=np.int32)
+        assign[:self.count] = self.assign[:self.count]
+        self.assign = assign
+
+    def _widen_scale(self, vectors: np.ndarray, headroom: float = _SCALE_HEADROOM) -> bool:
+        """Grow the int8 range to cover `vectors`; True if the scale changed.
+
+        Dimensions that overflow grow to `headroom` times the new max (vectors
+        are unit length, so never past 1), which keeps refits rare while a
+        corpus is added in small chunks.
+        """
+        batch_max = np.abs(vectors).max(axis=0) if len(vectors) else np.zeros(self.dim, dtype=np.float32)
+        if self._absmax is not None and not (batch_max > self._absmax).any():
+            return False
+        grown = np.minimum(batch_max * headroom, 1.0)
+        self._absmax = grown if self._absmax is None else np.where(batch_max > self._absmax, grown, self._absmax)
+        self._scale = (127.0 / np.maximum(self._absmax, 1e-6)).astype(np.float32)
+        return True
+
+    def _fresh_codes(self) -> np.ndarray:
+        """Codes for every row, requantized first if the int8 range widened since they were written."""
+        if self._codes_stale:
+            for start in range(0, self.count, _ASSIGN_BATCH):
+                end = min(self.count, start + _ASSIGN_BATCH)
+                self._codes[start:end] = self._quantize(np.asarray(self._vectors[start:end]))
+            self._codes_stale = False
+        return self._codes
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.quantization == "int8":
+            return np.clip(np.rint(vectors * self._scale), -127, 127).astype(np.int8)
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        return self._codes[:0]
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), _ASSIGN_BATCH):
+            block = vectors[start:start + _ASSIGN_BATCH]
+            out[start:start + len(block)] = (block @ self.centroids.T).argmax(axis=1)
+        return out
+
+    def add(self, ids, vectors) -> None:
+        """Insert or overwrite vectors by id."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32)[:, :self.dim])
+        rows = []
+        new_ids = []
+        for key in ids:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self.count + len(new_ids)
+                self._positions[key] = pos
+                new_ids.append(key)
+            rows.append(pos)
+        self._reserve(len(new_ids))
+        self.ids.extend(new_ids)
+        self.count += len(new_ids)
+        rows = np.asarray(rows, dtype=np.int64)
+        self._vectors[rows] = vectors
+        if self.quantization == "int8" and self._widen_scale(vectors):
+            # Codes made under the narrower range would clip: rewrite them all,
+            # once, before the next search or save rather than on every chunk
+            self._codes_stale = True
+        elif self.quantization != "none" and not self._codes_stale:
+            self._codes[rows] = self._quantize(vectors)
+        if self.centroids is not None:
+            self.assign[rows] = self._nearest_centroids(vectors)
+        self._lists = None
+        # Train once there is enough data, retrain when the corpus has grown 4x
+        if self.count >= self.min_train and (self.centroids is None or self.count >= 4 * self.trained_size):
+            self.train()
+
+    def train(self, iterations: int = _KMEANS_ITERATIONS, seed: int = 0) -> None:
+        """Spherical k-means on a sample, then assign every vector to its list."""
+        n = self.count
+        nlist = max(1, min(int(4 * np.sqrt(n)), n // 8, 65536))
+        rng = np.random.default_rng(seed)
+        sample = self.vectors[rng.choice(n, size=min(n, nlist * _KMEANS_SAMPLE_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = (sample @ centroids.T).argmax(axis=1)
+            order = np.argsort(labels, kind="stable")
+            counts = np.bincount(labels, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            filled = counts > 0
+            sums = np.empty_like(centroids)
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            # Re-seed empty lists from random sample points
+            sums[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+            centroids = _normalize(sums)
+        self.centroids = centroids
+        self.assign[:n] = self._nearest_centroids(self.vectors)
+        self.trained_size = n
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            assign = self.assign[:self.count]
+            order = np.argsort(assign, kind="stable")
+            offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assign, minlength=len(self.centroids)), out=offsets[1:])
+            self._lists = (order, offsets)
+        return self._lists
+
+    def _approximate_scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        if self.quantization == "int8":
+            # Asymmetric: float query against int8 codes
+            weights = query / self._scale
+            return np.concatenate([
+                codes[start:start + _ASSIGN_BATCH].astype(np.float32) @ weights
+                for start in range(0, len(codes), _ASSIGN_BATCH)
+            ])
+        query_bits = np.packbits(query > 0)
+        return -np.concatenate([
+            _POPCOUNT[np.bitwise_xor(codes[start:start + _ASSIGN_BATCH], query_bits)].sum(axis=1, dtype=np.int32)
+            for start in range(0, len(codes), _ASSIGN_BATCH)
+        ]).astype(np.float32)
+
+    def _score(self, rows, query: np.ndarray, k: int):
+        """Top k of `rows` (None = every vector) with exact cosine scores."""
+        if self.quantization == "none":
+            scores = self.vectors @ query if rows is None else self._vectors[rows] @ query
+            top = _top_k(scores, k)
+            return (top if rows is None else rows[top]), scores[top]
+        all_codes = self._fresh_codes()
+        codes = all_codes[:self.count] if rows is None else all_codes[rows]
+        if len(codes) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        candidates = _top_k(self._approximate_scores(codes, query), k * self.rescore)
+        if rows is not None:
+            candidates = rows[candidates]
+        # Exact rescoring touches only the candidates' float rows (sorted for locality on a memmap)
+        candidates = np.sort(candidates)
+        exact = self._vectors[candidates] @ query
+        top = _top_k(exact, k)
+        return candidates[top], exact[top]
+
+    def search(self, query, k: int, nprobe: int = None):
+        """Return (row indices, cosine scores) of the k best matches."""
+        if self.count == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = _normalize(np.asarray(query, dtype=np.float32)[:self.dim])
+        if self.centroids is None:
+            return self._score(None, query, k)
+        order, offsets = self._inverted_lists()
+        probes = _top_k(self.centroids @ query, min(nprobe or self.nprobe, len(self.centroids)))
+        rows = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+        return self._score(rows, query, k)
+
+    def search_rows(self, query, k: int, rows: np.ndarray):
+        """Search restricted to the given rows."""
+        query = _normalize(np.asarray(query, dtype=np.float32)[:self.dim])
+        return self._score(rows, query, k)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, self.VECTORS_FILE_NAME)
+        tmp_path = f"{vectors_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.vectors)
+        os.replace(tmp_path, vectors_path)
+        arrays = {
+            "ids": _encode_ids(self.ids),
+            "assign": self.assign[:self.count],
+            "params": np.array([self.dim, self.trained_size], dtype=np.int64),
+            "quantization": np.array(self.quantization),
+        }
+        if self.centroids is not None:
+            arrays["centroids"] = self.centroids
+        if self.quantization != "none":
+            arrays["codes"] = self._fresh_codes()[:self.count]
+        if self._scale is not None:
+            arrays["scale"] = self._scale
+        _atomic_savez(os.path.join(directory, self.FILE_NAME), **arrays)
+
+    @classmethod
+    def load(cls, directory: str, quantization: str = QUANTIZATION, **kwargs) -> "IVFIndex":
+        """Load an index; with quantization the float vectors stay on disk (memory-mapped)."""
+        with np.load(os.path.join(directory, cls.FILE_NAME)) as data:
+            dim, trained_size = (int(x) for x in data["params"])
+            index = cls(dim=dim, quantization=quantization, **kwargs)
+            index.assign = data["assign"].astype(np.int32)
+            index.ids = _decode_ids(data["ids"])
+            index.centroids = data["centroids"] if "centroids" in data.files else None
+            index.trained_size = trained_size
+            stored = str(data["quantization"]) if "quantization" in data.files else "none"
+            if stored == quantization and quantization != "none":
+                index._codes = data["codes"]
+                if "scale" in data.files:
+                    index._scale = data["scale"]
+                    index._absmax = (127.0 / index._scale).astype(np.float32)
+        index._vectors = np.load(os.path.join(directory, cls.VECTORS_FILE_NAME),
+                                 mmap_mode="r" if quantization != "none" else None)
+        index.count = len(index._vectors)
+        if quantization != "none" and len(index._codes) != index.count:
+            # Built with another setting: quantize once at load, in blocks,
+            # with the int8 range fitted on every vector first
+            blocks = range(0, max(index.count, 1), _ASSIGN_BATCH)
+            if quantization == "int8":
+                for start in blocks:
+                    index._widen_scale(np.asarray(index._vectors[start:start + _ASSIGN_BATCH]), headroom=1.0)
+            index._codes = np.concatenate([
+                index._quantize(np.asarray(index._vectors[start:start + _ASSIGN_BATCH]))
+                for start in blocks
+            ])[:index.count]
+        index._positions = {key: i for i, key in enumerate(index.ids)}
+        return index
+
+
+class HNSWIndex:
+    """hnswlib graph index with string ids."""
+
+    FILE_NAME = "index.hnsw"
+    IDS_FILE_NAME = "hnsw_ids.npz"
+
+    def __init__(self, dim: int = INDEX_DIMENSION, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION,
+                 ef: int = HNSW_EF_SEARCH, capacity: int = 1024):
+        import hnswlib
+
+        self.dim = dim
+        self.ef = ef
+        self.ids = []
+        self._positions = {}
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(max_elements=capacity, ef_construction=ef_construction, M=m)
+        self._index.set_ef(ef)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, ids, vectors) -> None:
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32)[:, :self.dim])
+        labels = []
+        for key in ids:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._positions[key] = len(self.ids)
+                self.ids.append(key)
+            labels.append(pos)
+        if len(self.ids) > self._index.get_max_elements():
+            self._index.resize_index(max(len(self.ids), 2 * self._index.get_max_elements()))
+        # hnswlib replaces the vector of a label that is already present
+        self._index.add_items(vectors, np.asarray(labels, dtype=np.int64))
+
+    def search(self, query, k: int, ef: int = None):
+        if not self.ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = _normalize(np.asarray(query, dtype=np.float32)[:self.dim])
+        k = min(k, len(self.ids))
+        if ef is not None:
+            self._index.set_ef(max(ef, k))
+        labels, distances = self._index.knn_query(query, k=k)
+        if ef is not None:
+            self._index.set_ef(self.ef)
+        # "ip" distance is 1 - inner product
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def search_rows(self, query, k: int, rows: np.ndarray):
+        allowed = set(rows.tolist())
+        query = _normalize(np.asarray(query, dtype=np.float32)[:self.dim])
+        labels, distances = self._index.knn_query(query, k=min(k, len(allowed)), filter=lambda label: label in allowed)
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.FILE_NAME)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._index.save_index(tmp_path)
+        os.replace(tmp_path, path)
+        _atomic_savez(os.path.join(directory, self.IDS_FILE_NAME), ids=_encode_ids(self.ids),
+                      params=np.array([self.dim], dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory: str, **kwargs) -> "HNSWIndex":
+        with np.load(os.path.join(directory, cls.IDS_FILE_NAME)) as data:
+            ids = _decode_ids(data["ids"])
+            dim = int(data["params"][0])
+        index = cls(dim=dim, **kwargs)
+        index._index.load_index(os.path.join(directory, cls.FILE_NAME), max_elements=max(len(ids), 1))
+        index._index.set_ef(index.ef)
+        index.ids = ids
+        index._positions = {key: i for i, key in enumerate(ids)}
+        return index
+
+
+def _index_class(algorithm: str = ALGORITHM):
+    if algorithm == "hnsw":
+        try:
+            import hnswlib  # noqa: F401
+
+            return HNSWIndex
+        except ImportError:
+            print("[ANN] hnswlib not installed; using the numpy IVF index", file=sys.stderr)
+    return IVFIndex
+
+
+def namespace_dir(namespace: str = "", root: str = LOCAL_INDEX_DIR) -> str:
+    return os.path.join(root, namespace or "default")
+
+
+def open_index(directory: str, algorithm: str = ALGORITHM, dim: int = INDEX_DIMENSION):
+    """Load the index stored in `directory`, or an empty one if there is none yet."""
+    cls = _index_class(algorithm)
+    marker = cls.IDS_FILE_NAME if cls is HNSWIndex else cls.FILE_NAME
+    if directory and os.path.exists(os.path.join(directory, marker)):
+        return cls.load(directory)
+    return cls(dim=dim)
+
+
+class LocalHit:
+    """Query result shaped like upstash_vector's QueryResult."""
+
+    __slots__ = ("id", "score", "metadata", "vector", "data")
+
+    def __init__(self, id: str, score: float, metadata=None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+        self.vector = None
+        self.data = None
+
+
+class LocalVectorIndex:
+    """Drop-in replacement for the Upstash `Index` used by the retrieval path."""
+
+    def __init__(self, root: str = LOCAL_INDEX_DIR):
+        self.root = root
+        self._open = {}
+        self._sections = {}  # id(index) -> {section: rows}, for filtered queries
+        self._lock = threading.Lock()
+
+    def _namespace(self, namespace: str):
+        directory = namespace_dir(namespace, self.root)
+        entry = self._open.get(directory)
+        if entry is None:
+            with self._lock:
+                entry = self._open.get(directory)
+                if entry is None:
+                    from digital_twin_metadata_store import MetadataStore
+
+                    index = open_index(directory)
+                    path = metadata_path(directory)
+                    store = MetadataStore(path) if os.path.exists(path) else None
+                    print(f"[ANN] loaded {describe(index)} from {directory}", file=sys.stderr)
+                    entry = self._open[directory] = (index, store)
+        return entry
+
+    def _section_rows(self, index) -> dict:
+        rows = self._sections.get(id(index))
+        if rows is None:
+            from digital_twin_sections import section_of_id
+
+            grouped = {}
+            for row, key in enumerate(index.ids):
+                grouped.setdefault(section_of_id(key), []).append(row)
+            rows = self._sections[id(index)] = {s: np.asarray(r, dtype=np.int64) for s, r in grouped.items()}
+        return rows
+
+    def query(self, vector, top_k: int = 10, include_metadata: bool = False, namespace: str = "",
+              filter: str = "", **_):
+        index, store = self._namespace(namespace)
+        if filter:
+            # Only the section filters built by digital_twin_sections are understood
+            from digital_twin_sections import parse_section_filter
+
+            by_section = self._section_rows(index)
+            parts = [by_section[s] for s in parse_section_filter(filter) if s in by_section]
+            if not parts:
+                return []
+            rows, scores = index.search_rows(vector, top_k, np.concatenate(parts))
+        else:
+            rows, scores = index.search(vector, top_k)
+        hits = [LocalHit(index.ids[r], float((1.0 + s) / 2.0)) for r, s in zip(rows, scores)]
+        if include_metadata and store is not None:
+            found = store.get_many(h.id for h in hits)
+            for h in hits:
+                h.metadata = found.get(h.id, {})
+        return hits
+
+    def info(self) -> dict:
+        return {directory: len(index) for directory, (index, _) in self._open.items()}
+
+    # Same names as upstash_vector.Index, so index_versions.prune_namespaces works here too
+    def list_namespaces(self) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        return [name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))]
+
+    def delete_namespace(self, namespace: str) -> None:
+        import shutil
+
+        directory = namespace_dir(namespace, self.root)
+        with self._lock:
+            entry = self._open.pop(directory, None)
+            if entry is not None:
+                self._sections.pop(id(entry[0]), None)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._open = {}
+            self._sections = {}
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    global _local_index
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                _local_index = LocalVectorIndex()
+    return _local_index
+
+
+def _reset_local_index() -> None:
+    if _local_index is not None:
+        _local_index.reset()
+
+
+index_versions.on_reload(_reset_local_index)
+
+
+def metadata_path(directory: str) -> str:
+    return os.path.join(directory, "metadata.db")
+
+
+def describe(index) -> str:
+    extra = ""
+    if isinstance(index, IVFIndex) and index.centroids is not None:
+        extra = f", {len(index.centroids)} lists"
+    if isinstance(index, IVFIndex) and index.quantization != "none":
+        extra += f", {index.quantization} codes"
+    return f"{type(index).__name__} with {len(index)} vectors{extra}"
@@ -0,0 +1,262 @@
+"""
+Unified Digital Twin API: every answer mode in one process.
+
+Replaces the separate FastAPI services (digital_twin_api.py,
+digital_twin_simple_api.py, digital_twin_simple_fallback.py,
+digital_twin_advanced.py), which are now thin aliases for this app with a
+different default mode. All modes share one set of warm clients, embedding
+model, index, response cache and admission controller (see
+digital_twin_pipeline.py for the stages and modes).
+
+POST /rag
+  Body: {
+    "question": string,
+    "mode": "rag" | "simple" | "advanced" | "interview",   (optional)
+    "stages": ["route", "precomputed", "scope", "enhance", "retrieve", "generate", "format"],  (optional)
+    "enhance_query": bool, "format_response": bool          (optional overrides)
+  }
+  Returns: { "answer": string, "mode": string, "stages": [...], ... }
+
+POST /rag/{mode}   same, with the mode taken from the path
+GET  /modes        the available modes and their stages
+GET  /embedding/stats            query-embedding batch sizes and queueing delay
+GET  /prefetch/stats             follow-up prefetch runs, drops and token spend
+GET  /usage/stats                tokens and cost per route and LLM stage
+GET  /scope/stats                questions answered by the out-of-scope gate
+
+With PREFETCH_ENABLED=1, requests carrying a "session_id" get "suggestions":
+predicted follow-up questions whose answers are being prefetched into the
+response cache (see digital_twin_prefetch.py). Questions the profile cannot
+cover get a templated answer with related in-scope questions as
+"suggestions" instead (see digital_twin_scope.py).
+GET  /admin/index-version        the active blue/green index version
+POST /admin/reload-index         swap to the version the pointer file names now
+                                 (header X-Admin-Token must equal ADMIN_TOKEN)
+
+Send `X-Debug-Profile: 1` (with PROFILING_ENABLED=1) to get a profile of the
+request in the "profile" field; see digital_twin_profiling.py.
+
+Run:
+  uvicorn digital_twin_app:app --port 8000
+  python digital_twin_prefork.py digital_twin_app:app --workers 4
+
+`app` (the DIGITAL_TWIN_DEFAULT_MODE app) is built on first access, so the
+entry points that import create_app for their own default mode
+(digital_twin_api.py, digital_twin_advanced.py, ...) get one app and one
+admission controller, not two.
+"""
+
+import functools
+import os
+import threading
+from typing import List, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+
+import digital_twin_index_versions as index_versions
+from digital_twin_admission import AdmissionController, Overloaded, overloaded_exception_handler, pacing_stats
+from digital_twin_cache import get_response_cache
+from digital_twin_embed_batcher import stats as embedding_batch_stats
+from digital_twin_pipeline import DEFAULT_MODE, MODES, STAGES, resolve_stages, run_pipeline
+from digital_twin_prefetch import get_prefetcher, stats as prefetch_stats_snapshot
+from digital_twin_profiling import finish as finish_profile, profile_request
+from digital_twin_request_log import note, track_request
+from digital_twin_resources import log
+from digital_twin_scope import stats as scope_stats_snapshot
+from digital_twin_usage import stats as usage_stats_snapshot
+
+WARM_UP_ON_START = os.getenv("DIGITAL_TWIN_WARM_UP", "1") not in ("0", "false", "False")
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+class RagRequest(BaseModel):
+    question: str
+    mode: Optional[str] = None
+    stages: Optional[List[str]] = None
+    enhance_query: Optional[bool] = None  # None = decided by the intent router
+    format_response: Optional[bool] = None  # None = decided by the intent router
+    session_id: Optional[str] = None  # enables follow-up prefetch (PREFETCH_ENABLED=1)
+
+
+class RagResponse(BaseModel):
+    answer: str
+    mode: str
+    stages: List[str] = []
+    original_question: Optional[str] = None
+    enhanced_question: Optional[str] = None
+    profile: Optional[dict] = None  # only for requests profiled via X-Debug-Profile
+    suggestions: Optional[List[str]] = None  # predicted (and prefetched) follow-up questions
+
+
+def _warm_up(mode: str) -> None:
+    import digital_twin_resources as resources
+
+    try:
+        if "retrieve" in MODES[mode].stages:
+            resources.warm_up()
+        else:
+            resources.load_profile()
+            resources.get_groq_client()
+    except Exception as e:
+        resources.log(f"⚠️  Warm-up failed: {e}")
+
+
+def create_app(default_mode: str = DEFAULT_MODE, title: str = "Digital Twin API") -> FastAPI:
+    """Build the app; `default_mode` answers requests that do not name a mode."""
+    if default_mode not in MODES:
+        raise ValueError(f"unknown mode '{default_mode}'; expected one of {sorted(MODES)}")
+
+    app = FastAPI(title=title)
+    app.add_exception_handler(Overloaded, overloaded_exception_handler)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # One limiter for every mode: they all compete for the same LLM quota and CPU
+    rag_admission = AdmissionController("/rag")
+    prefetcher = get_prefetcher(busy=lambda: rag_admission.active > 0 or rag_admission.waiting > 0)
+
+    def answer(payload: RagRequest, mode: str, route_name: str, headers) -> RagResponse:
+        q = (payload.question or "").strip()
+        if not q:
+            raise HTTPException(status_code=400, detail="'question' must be a non-empty string")
+        try:
+            resolve_stages(mode, payload.stages)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        try:
+            with track_request(route_name, q):
+                # Everything digital_twin_replay.py needs to re-send the same request,
+                # logged before admission so shed requests replay too
+                note(mode=mode, **{field: value for field, value in (
+                    ("request_stages", payload.stages), ("enhance_query", payload.enhance_query),
+                    ("format_response", payload.format_response), ("session_id", payload.session_id),
+                ) if value is not None})
+                with rag_admission.admit():
+                    with profile_request(headers, route_name) as capture:
+                        state = run_pipeline(q, mode=mode, stages=payload.stages, enhance=payload.enhance_query,
+                                             format_response=payload.format_response)
+                    profile = finish_profile(capture)
+        except Overloaded:
+            raise
+        except Exception as e:
+            log(f"ERROR in {route_name} ({mode}): {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+        suggestions = state.suggestions
+        if suggestions is None and prefetcher is not None and payload.session_id:
+            suggestions = prefetcher.observe(payload.session_id, q, functools.partial(
+                run_pipeline, mode=mode, stages=payload.stages,
+                enhance=payload.enhance_query, format_response=payload.format_response,
+            ))
+
+        return RagResponse(
+            answer=state.answer,
+            mode=mode,
+            stages=state.stages_run,
+            original_question=q if state.enhanced_question else None,
+            enhanced_question=state.enhanced_question,
+            profile=profile,
+            suggestions=suggestions,
+        )
+
+    @app.post("/rag", response_model=RagResponse)
+    def rag_endpoint(payload: RagRequest, request: Request):
+        return answer(payload, payload.mode or default_mode, "/rag", request.headers)
+
+    @app.post("/rag/{mode}", response_model=RagResponse)
+    def rag_mode_endpoint(mode: str, payload: RagRequest, request: Request):
+        if mode not in MODES:
+            raise HTTPException(status_code=404, detail=f"unknown mode '{mode}'")
+        return answer(payload, mode, f"/rag/{mode}", request.headers)
+
+    @app.get("/")
+    @app.get("/health")
+    def health_check():
+        return {"status": "ok", "service": title, "default_mode": default_mode, "modes": sorted(MODES)}
+
+    @app.get("/modes")
+    def list_modes():
+        return {
+            "default": default_mode,
+            "modes": {name: list(m.stages) for name, m in MODES.items()},
+            "stages": list(STAGES),
+        }
+
+    @app.get("/cache/stats")
+    def cache_stats():
+        cache = get_response_cache()
+        return cache.stats() if cache else {"enabled": False}
+
+    @app.get("/admission/stats")
+    def admission_stats():
+        return {"rag": rag_admission.stats(), "llm_pacing": pacing_stats()}
+
+    @app.get("/embedding/stats")
+    def embedding_stats():
+        return embedding_batch_stats()
+
+    @app.get("/prefetch/stats")
+    def prefetch_stats():
+        return prefetch_stats_snapshot()
+
+    @app.get("/usage/stats")
+    def usage_stats():
+        return usage_stats_snapshot()
+
+    @app.get("/scope/stats")
+    def scope_stats():
+        return scope_stats_snapshot()
+
+    @app.get("/admin/index-version")
+    def index_version():
+        return {"active": index_versions.current_version()}
+
+    @app.post("/admin/reload-index")
+    def reload_index(x_admin_token: Optional[str] = Header(default=None)):
+        if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+            raise HTTPException(status_code=403, detail="admin endpoints need ADMIN_TOKEN and X-Admin-Token")
+        return index_versions.reload(force=True)
+
+    @app.on_event("startup")
+    def warm_resources():
+        # Background thread: the server accepts connections while models load
+        if WARM_UP_ON_START:
+            threading.Thread(target=_warm_up, args=(default_mode,), daemon=True).start()
+        index_versions.start_watcher()
+
+    return app
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def get_app() -> FastAPI:
+    """The default-mode app, built once per process."""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                _app = create_app()
+    return _app
+
+
+def __getattr__(name):
+    # `digital_twin_app:app` for uvicorn and the prefork runner
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(get_app(), host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,314 @@
+"""
+Persistent LLM response cache backed by SQLite.
+
+Completions are stored on disk keyed by (model, prompt hash, temperature,
+max_tokens), so a restarted or freshly scaled-out process answers repeated
+questions without another round trip to Groq/OpenAI.
+
+- WAL journal mode: any number of worker processes can read while one writes.
+- Size-based eviction: least recently used rows are dropped once the stored
+  responses exceed LLM_CACHE_MAX_BYTES.
+- Profile versioning: every row is tagged with a hash of digitaltwin.json (or
+  PROFILE_VERSION if set). Rows from another profile version are never served.
+
+Environment variables:
+  - LLM_CACHE_ENABLED (default "1")
+  - LLM_CACHE_PATH (default .cache/llm_cache.sqlite3, or /tmp on Vercel)
+  - LLM_CACHE_MAX_BYTES (default 50 MB)
+  - PROFILE_VERSION (optional override of the profile hash)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import digital_twin_index_versions as index_versions
+import digital_twin_request_log as request_log
+from digital_twin_admission import provider_bucket
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False")
+DEFAULT_CACHE_PATH = (
+    "/tmp/digital_twin_llm_cache.sqlite3"
+    if os.getenv("VERCEL")
+    else os.path.join(ROOT_DIR, ".cache", "llm_cache.sqlite3")
+)
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Last-access timestamps are only refreshed this often, so cache hits stay
+# read-only in the common case and do not contend for the write lock.
+_TOUCH_INTERVAL_SECONDS = 60
+# Check the total size every N writes rather than on every insert.
+_EVICTION_CHECK_EVERY = 50
+# Evict down to this fraction of the limit so eviction does not run on every write.
+_EVICTION_TARGET = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    temperature REAL,
+    max_tokens INTEGER,
+    profile_version TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+CREATE INDEX IF NOT EXISTS idx_responses_profile_version ON responses(profile_version);
+"""
+
+
+def compute_profile_version(path: str = os.path.join(ROOT_DIR, "digitaltwin.json")) -> str:
+    """Short content hash of the profile JSON, overridable with PROFILE_VERSION."""
+    override = os.getenv("PROFILE_VERSION")
+    if override:
+        return override
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()[:16]
+    except OSError:
+        return "unknown"
+
+
+def make_key(model: str, messages, temperature, max_tokens, stop=None) -> str:
+    prompt_hash = hashlib.sha256(
+        json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    raw = f"{model}\x1f{prompt_hash}\x1f{temperature}\x1f{max_tokens}"
+    if stop:
+        # Output cut at a stop sequence differs from the same prompt's unstopped output
+        raw += "\x1f" + json.dumps(list(stop), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Disk-backed completion cache shared by threads and processes."""
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, profile_version: str = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.profile_version = profile_version or compute_profile_version()
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._writes = 0
+        self._stats_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads or forks, so each
+        # thread of each process opens its own.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, model: str, messages, temperature, max_tokens, stop=None):
+        key = make_key(model, messages, temperature, max_tokens, stop)
+        try:
+            row = self._conn().execute(
+                "SELECT response, last_access FROM responses WHERE key = ? AND profile_version = ?",
+                (key, self.profile_version),
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[LLM Cache] read failed: {e}", file=sys.stderr)
+            return None
+
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        response, last_access = row
+        now = time.time()
+        if now - last_access > _TOUCH_INTERVAL_SECONDS:
+            try:
+                self._conn().execute(
+                    "UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+                )
+            except sqlite3.Error:
+                pass
+        return response
+
+    def put(self, model: str, messages, temperature, max_tokens, response: str, stop=None) -> None:
+        key = make_key(model, messages, temperature, max_tokens, stop)
+        now = time.time()
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, temperature, max_tokens, profile_version, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, temperature, max_tokens, self.profile_version, response,
+                 len(response.encode("utf-8")), now, now),
+            )
+        except sqlite3.Error as e:
+            print(f"[LLM Cache] write failed: {e}", file=sys.stderr)
+            return
+
+        with self._stats_lock:
+            self._writes += 1
+            check = self._writes % _EVICTION_CHECK_EVERY == 1
+        if check:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop stale-version rows, then least recently used rows above the size limit."""
+        conn = self._conn()
+        try:
+            removed = conn.execute(
+                "DELETE FROM responses WHERE profile_version != ?", (self.profile_version,)
+            ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - int(self.max_bytes * _EVICTION_TARGET)
+                # Walk rows oldest-first until enough bytes are covered.
+                cutoff, freed = None, 0
+                for last_access, size in conn.execute(
+                    "SELECT last_access, size FROM responses ORDER BY last_access ASC"
+                ):
+                    cutoff, freed = last_access, freed + size
+                    if freed >= excess:
+                        break
+                if cutoff is not None:
+                    removed += conn.execute(
+                        "DELETE FROM responses WHERE last_access <= ?", (cutoff,)
+                    ).rowcount
+            return removed
+        except sqlite3.Error as e:
+            print(f"[LLM Cache] eviction failed: {e}", file=sys.stderr)
+            return 0
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM responses")
+
+    def stats(self) -> dict:
+        try:
+            rows, total = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE profile_version = ?",
+                (self.profile_version,),
+            ).fetchone()
+        except sqlite3.Error:
+            rows, total = None, None
+        return {
+            "path": self.path,
+            "profile_version": self.profile_version,
+            "entries": rows,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide cache, or None if caching is disabled or unavailable."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ResponseCache()
+                except (OSError, sqlite3.Error) as e:
+                    print(f"[LLM Cache] disabled: {e}", file=sys.stderr)
+                    return None
+    return _cache
+
+
+def _refresh_profile_version() -> None:
+    # A new index build usually comes with an edited profile; answers cached
+    # against the old one must stop matching.
+    if _cache is not None:
+        _cache.profile_version = compute_profile_version()
+
+
+index_versions.on_reload(_refresh_profile_version)
+
+
+class TruncatedText(str):
+    """Completion text cut off by max_tokens, returned (uncached) with truncated_ok=False.
+
+    Once the caller has finished the answer, `complete(text)` caches it under
+    this call's key, so a repeat of the question is one cache hit.
+    """
+
+    _store = None
+
+    def complete(self, text: str) -> None:
+        if self._store is not None and text:
+            self._store(text)
+
+
+def cached_chat_completion(client, *, model: str, messages, temperature: float, max_tokens: int,
+                           stage: str = "generate", stop=None, truncated_ok: bool = True):
+    """Run client.chat.completions.create through the response cache and return the text.
+
+    `stage` names the pipeline step (enhance, generate, format) in the request log.
+    `stop` sequences end generation and are stripped if a provider echoes them.
+    With truncated_ok=False an answer cut off by max_tokens is not cached and
+    comes back as TruncatedText, so the caller can continue it with more room
+    and then cache the finished answer with TruncatedText.complete().
+    """
+    with request_log.stage(stage):
+        cache = get_response_cache()
+        if cache is not None:
+            cached = cache.get(model, messages, temperature, max_tokens, stop)
+            request_log.note_cache(stage, cached is not None)
+            if cached is not None:
+                return cached
+
+        provider = type(client).__module__.split(".")[0]
+        bucket = provider_bucket(provider)
+        if bucket is not None:
+            # Pace cache misses to the provider's rate limit (raises Overloaded if saturated)
+            with request_log.stage("pacing"):
+                bucket.acquire()
+
+        options = {"stop": stop} if stop else {}
+        completion = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options,
+        )
+        request_log.note_llm_call(provider, getattr(completion, "usage", None), stage=stage, model=model)
+        choice = completion.choices[0]
+        text = choice.message.content or ""
+        for sequence in stop or ():
+            text = text.split(sequence, 1)[0]
+        text = text.strip()
+        if getattr(choice, "finish_reason", None) == "length":
+            request_log.note(**{f"{stage}_truncated": True})
+            if not truncated_ok:
+                truncated = TruncatedText(text)
+                if cache is not None:
+                    truncated._store = lambda full: cache.put(model, messages, temperature, max_tokens, full, stop)
+                return truncated
+        if cache is not None and text:
+            cache.put(model, messages, temperature, max_tokens, text, stop)
+        return text
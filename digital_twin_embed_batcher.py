@@ -0,0 +1,150 @@
+"""
+Dynamic micro-batching of concurrent query embeddings.
+
+Under concurrency every request used to call `model.encode(text)` on its own,
+so N simultaneous questions paid N single-row forward passes. sentence-
+transformers gets far better throughput from one padded batch, so query
+embeddings go through one background thread per process:
+
+  - callers enqueue their text and block on a future
+  - the thread takes the first waiting text, then keeps collecting for up to
+    EMBED_BATCH_WINDOW_MS (or until EMBED_BATCH_MAX texts are queued)
+  - the batch is encoded in one call (duplicate texts once) and each caller
+    gets its own vector back
+
+Texts that arrive while a batch is encoding are picked up by the next batch,
+so even EMBED_BATCH_WINDOW_MS=0 batches under load; the window only decides
+how long a lone request waits for company.
+
+`stats()` reports the batch-size distribution and the queueing delay added
+before encoding (served at /embedding/stats). Each request's trace also gets
+`embed_batch` and `embed_queue_ms`.
+
+Environment variables:
+  - EMBED_BATCHING (default 1; 0 encodes each query inline)
+  - EMBED_BATCH_WINDOW_MS (default 2)
+  - EMBED_BATCH_MAX (default 32)
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import digital_twin_request_log as request_log
+
+BATCHING_ENABLED = os.getenv("EMBED_BATCHING", "1") not in ("0", "false", "False")
+WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", "2"))
+MAX_BATCH = int(os.getenv("EMBED_BATCH_MAX", "32"))
+
+
+def _encode_queries(texts: list):
+    import digital_twin_resources as resources
+
+    return resources.get_embedding_model().encode(texts, batch_size=len(texts), show_progress_bar=False)
+
+
+class EmbeddingBatcher:
+    """Collects texts from concurrent callers and encodes them in batches."""
+
+    def __init__(self, encode=_encode_queries, window_ms: float = WINDOW_MS, max_batch: int = MAX_BATCH):
+        self._encode = encode
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.items = 0
+        self._sizes = Counter()
+        self._delays_ms = deque(maxlen=1000)
+
+    def _ensure_started(self) -> None:
+        # A forked worker inherits the thread object but not the thread
+        if self._thread is None or self._pid != os.getpid():
+            self._queue.clear()
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def embed(self, text: str):
+        """Return the embedding of `text`, encoded together with any concurrent callers."""
+        future = Future()
+        with self._cond:
+            self._ensure_started()
+            self._queue.append((text, time.monotonic(), future))
+            self._cond.notify()
+        vector, batch_size, queue_ms = future.result()
+        request_log.note(embed_batch=batch_size, embed_queue_ms=round(queue_ms, 2))
+        return vector
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window
+            while len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(len(self._queue), self.max_batch))]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started = time.monotonic()
+            texts = list(dict.fromkeys(text for text, _, _ in batch))
+            try:
+                vectors = dict(zip(texts, self._encode(texts)))
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            delays = [(started - queued) * 1000 for _, queued, _ in batch]
+            with self._cond:
+                self.batches += 1
+                self.items += len(batch)
+                self._sizes[len(batch)] += 1
+                self._delays_ms.extend(delays)
+            for (text, _, future), delay in zip(batch, delays):
+                future.set_result((vectors[text], len(batch), delay))
+
+    def stats(self) -> dict:
+        with self._cond:
+            delays = sorted(self._delays_ms)
+            sizes = dict(sorted(self._sizes.items()))
+            batches, items = self.batches, self.items
+        pct = lambda p: round(delays[min(len(delays) - 1, int(p / 100 * len(delays)))], 2) if delays else 0.0  # noqa: E731
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "queue_delay_ms": {"p50": pct(50), "p95": pct(95), "p99": pct(99)},
+        }
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """Process-wide batcher for query embeddings, or None when EMBED_BATCHING=0."""
+    global _batcher
+    if not BATCHING_ENABLED:
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher()
+    return _batcher
+
+
+def stats() -> dict:
+    batcher = _batcher if BATCHING_ENABLED else None
+    return batcher.stats() if batcher else {"enabled": BATCHING_ENABLED, "batches": 0}
@@ -0,0 +1,111 @@
+"""
+Multi-process embedding for bulk indexing.
+
+Encoding with sentence-transformers is CPU-bound, and one process rarely keeps
+every core busy on short profile snippets. EmbeddingPool shards chunks of
+texts across worker processes:
+
+  - each worker loads the model once (process initializer) and is pinned to
+    cores // workers torch threads, so workers do not oversubscribe the CPU
+  - chunks are submitted through a sliding window of at most `max_in_flight`
+    futures and results are yielded in input order, so neither the pending
+    texts nor the finished vectors pile up in memory however large the input
+  - workers return compact (n, 384) float32 matrices; padding to the Upstash
+    dimension happens in the parent, one upsert batch at a time
+
+Workers are started with "spawn" (works on Windows too, and the parent never
+needs to load the model itself). With workers=1 everything runs in-process on
+the shared model from digital_twin_resources.py.
+
+See benchmarks/bench_embed_parallel.py for throughput scaling per core count.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ENCODE_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+
+def _init_worker(threads: int) -> None:
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    try:
+        import torch
+
+        torch.set_num_threads(max(1, threads))
+    except ImportError:
+        pass
+    import digital_twin_resources as resources
+
+    resources.get_embedding_model()
+
+
+def _encode_chunk(texts: list, batch_size: int = ENCODE_BATCH_SIZE):
+    import digital_twin_resources as resources
+
+    return resources.get_embedding_model().encode(
+        list(texts), batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True
+    ).astype("float32", copy=False)
+
+
+class EmbeddingPool:
+    """Encode chunks of texts in parallel, streaming results back in order."""
+
+    def __init__(self, workers: int = 1, threads_per_worker: int = None, max_in_flight: int = None,
+                 batch_size: int = ENCODE_BATCH_SIZE):
+        self.workers = max(1, workers)
+        cores = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.batch_size = batch_size
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.threads_per_worker,),
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def map(self, chunks, key=None):
+        """Yield (chunk, matrix) for each chunk, in input order.
+
+        A chunk is a list of texts, or of records when `key` extracts the text;
+        only the texts are sent to the workers.
+        """
+        texts_of = (lambda chunk: [key(r) for r in chunk]) if key else list  # noqa: E731
+        if self._executor is None:
+            for chunk in chunks:
+                yield chunk, _encode_chunk(texts_of(chunk), self.batch_size)
+            return
+
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, self._executor.submit(_encode_chunk, texts_of(chunk), self.batch_size)))
+            if len(pending) >= self.max_in_flight:
+                done_chunk, future = pending.popleft()
+                yield done_chunk, future.result()
+        while pending:
+            done_chunk, future = pending.popleft()
+            yield done_chunk, future.result()
+
+
+def chunked(iterable, size: int):
+    """Group an iterable into lists of at most `size` items without materializing it."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,208 @@
+"""
+Self-hosted runner for the BaseHTTPRequestHandler entry points (api/rag.py).
+
+Vercel runs `handler` one request per invocation. Under plain
+`http.server.HTTPServer` the same class serves one request at a time over
+HTTP/1.0, so every request pays a new TCP (and TLS, behind a proxy)
+handshake and waits behind the previous one. This runner serves the
+unchanged handler class with:
+
+  - HTTP/1.1 keep-alive: connections stay open between requests and are
+    closed after HTTP_KEEPALIVE_TIMEOUT idle seconds
+  - a bounded worker pool: HTTP_WORKERS threads serve connections and at
+    most HTTP_MAX_PENDING accepted connections wait for one; beyond that new
+    connections get an immediate 503 with Retry-After instead of piling up
+  - worker hand-back: while connections are waiting, responses carry
+    `Connection: close`, so idle keep-alive clients cannot hold every worker
+  - warm shared resources: the Groq/OpenAI clients (one pooled httpx client
+    each, see digital_twin_resources.py) and the profile load before traffic
+
+The handler's own AdmissionController still decides how many pipeline runs
+execute at once; HTTP_WORKERS defaults above its concurrency plus queue so
+that it, not the socket layer, answers overload with a 503.
+
+Usage:
+  python digital_twin_http_server.py                        # api.rag:handler on :8000
+  python digital_twin_http_server.py api.rag:handler --port 8080 --workers 64
+
+Environment variables:
+  - HTTP_WORKERS (default 32), HTTP_MAX_PENDING (default 64)
+  - HTTP_KEEPALIVE_TIMEOUT (seconds, default 15), HTTP_BACKLOG (listen backlog, default 128)
+  - DIGITAL_TWIN_WARM_UP (default 1)
+"""
+
+import argparse
+import importlib
+import json
+import os
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WORKERS = int(os.getenv("HTTP_WORKERS", "32"))
+MAX_PENDING = int(os.getenv("HTTP_MAX_PENDING", "64"))
+KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "15"))
+BACKLOG = int(os.getenv("HTTP_BACKLOG", "128"))
+WARM_UP_ON_START = os.getenv("DIGITAL_TWIN_WARM_UP", "1") not in ("0", "false", "False")
+
+_REJECT_BODY = json.dumps({"error": "server busy, try again shortly"}).encode()
+_REJECT_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Retry-After: 1\r\n"
+    b"Connection: close\r\n"
+    b"Content-Length: " + str(len(_REJECT_BODY)).encode() + b"\r\n\r\n" + _REJECT_BODY
+)
+
+
+def load_handler(spec: str):
+    """Import "module:attribute" and return the handler class."""
+    module_name, _, attr = spec.partition(":")
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    return getattr(importlib.import_module(module_name), attr or "handler")
+
+
+def keep_alive_handler(handler_class, idle_timeout: float = KEEPALIVE_TIMEOUT):
+    """Subclass of `handler_class` that speaks HTTP/1.1 with persistent connections.
+
+    The handler must send Content-Length on every response (api/rag.py does).
+    """
+
+    class KeepAliveHandler(handler_class):
+        protocol_version = "HTTP/1.1"
+        timeout = idle_timeout  # socket timeout: ends idle keep-alive connections
+
+        def end_headers(self):
+            # Give the worker back when connections are waiting for one
+            if self.server.saturated():
+                self.send_header("Connection", "close")
+            self.server.note_request()
+            super().end_headers()
+
+        def log_message(self, format, *args):
+            pass  # the request log (digital_twin_request_log.py) already records every request
+
+    KeepAliveHandler.__name__ = f"KeepAlive{handler_class.__name__}"
+    return KeepAliveHandler
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a bounded thread pool."""
+
+    allow_reuse_address = True
+
+    def __init__(self, address, handler_class, workers: int = WORKERS, max_pending: int = MAX_PENDING,
+                 backlog: int = BACKLOG):
+        self.request_queue_size = backlog  # read by server_activate() during __init__
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http-worker")
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.pending = 0
+        self.connections = 0
+        self.requests = 0
+        self.rejected = 0
+        super().__init__(address, handler_class)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            try:
+                request.sendall(_REJECT_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        with self._lock:
+            self.pending += 1
+            self.connections += 1
+        self._pool.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        with self._lock:
+            self.pending -= 1
+            self.active += 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self.active -= 1
+            self._slots.release()
+
+    def saturated(self) -> bool:
+        return self.pending > 0
+
+    def note_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "pending": self.pending,
+                "connections": self.connections,
+                "requests": self.requests,
+                "requests_per_connection": round(self.requests / self.connections, 2) if self.connections else 0.0,
+                "rejected": self.rejected,
+            }
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def _warm_up() -> None:
+    import digital_twin_resources as resources
+
+    try:
+        resources.load_profile()
+        resources.get_groq_client()
+        resources.get_openai_client()
+    except Exception as e:
+        resources.log(f"⚠️  Warm-up failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a BaseHTTPRequestHandler with keep-alive and a worker pool.")
+    parser.add_argument("handler", nargs="?", default="api.rag:handler", help="module:attribute of the handler class")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WORKERS, help="connection-serving threads")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="connections waiting for a worker")
+    parser.add_argument("--keepalive-timeout", type=float, default=KEEPALIVE_TIMEOUT, help="idle seconds")
+    args = parser.parse_args()
+
+    handler_class = keep_alive_handler(load_handler(args.handler), args.keepalive_timeout)
+    server = PooledHTTPServer((args.host, args.port), handler_class, args.workers, args.max_pending)
+    if WARM_UP_ON_START:
+        threading.Thread(target=_warm_up, daemon=True).start()
+    # shutdown() blocks until serve_forever() returns, so it cannot run on the serving thread
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+
+    print(f"🚀 {args.handler} on http://{args.host}:{args.port} "
+          f"({server.workers} workers, {server.max_pending} pending, keep-alive {args.keepalive_timeout:g}s)",
+          file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"[HTTP] stopped: {json.dumps(server.stats())}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
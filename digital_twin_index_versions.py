@@ -0,0 +1,157 @@
+"""
+Blue/green versions of the vector index with atomic swap and hot reload.
+
+Re-indexing in place lets queries see a half-updated index. With versions:
+
+  1. `embed_digitaltwin.py --new-version` writes every vector into a fresh
+     Upstash namespace (and, with VECTOR_METADATA=local, a fresh metadata
+     store file) while the APIs keep serving the current one.
+  2. Only when the build has finished is the pointer file rewritten, via a
+     temporary file and os.replace(), so readers see either the old or the new
+     version and never a mix.
+  3. Running processes notice the new pointer (a polling watcher thread, or
+     POST /admin/reload-index) and swap to it between requests. A request
+     already in flight finishes on the version it started with; old
+     namespaces are only deleted by a later build (--keep-versions).
+  4. Registered reload hooks drop caches that depend on the index build
+     (profile, precomputed answers, in-memory answer caches).
+
+Without a pointer file everything uses the default namespace, as before.
+
+Environment variables:
+  - INDEX_POINTER_PATH (default index_version.json next to this file)
+  - INDEX_WATCH_INTERVAL (seconds between pointer checks, default 5; 0 disables)
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+POINTER_PATH = os.getenv("INDEX_POINTER_PATH", os.path.join(ROOT_DIR, "index_version.json"))
+WATCH_INTERVAL = float(os.getenv("INDEX_WATCH_INTERVAL", "5"))
+
+_active = None
+_active_mtime = None
+_load_lock = threading.Lock()
+_hooks = []
+_watcher = None
+_watcher_pid = None
+
+
+def new_version_name() -> str:
+    return time.strftime("v%Y%m%d-%H%M%S")
+
+
+def _read_pointer(path: str = POINTER_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"[Index Versions] unreadable pointer {path}: {e}", file=sys.stderr)
+        return None
+
+
+def publish_version(info: dict, path: str = POINTER_PATH) -> None:
+    """Atomically point every reader at a finished build."""
+    info = dict(info, published_at=time.time())
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def current_version():
+    """The active version dict ({"version", "namespace", ...}), or None for the default namespace."""
+    global _active, _active_mtime
+    if _active_mtime is None:
+        with _load_lock:
+            if _active_mtime is None:
+                _active = _read_pointer()
+                _active_mtime = _pointer_mtime()
+    return _active
+
+
+def current_namespace() -> str:
+    version = current_version()
+    return version.get("namespace", "") if version else ""
+
+
+def on_reload(callback) -> None:
+    """Register a callable run after every swap to a new version."""
+    _hooks.append(callback)
+
+
+def _pointer_mtime():
+    try:
+        return os.stat(POINTER_PATH).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def reload(force: bool = False) -> dict:
+    """Swap to the version the pointer file names, if it changed. Returns the outcome."""
+    global _active, _active_mtime
+    with _load_lock:
+        mtime = _pointer_mtime()
+        if not force and mtime == _active_mtime:
+            return {"reloaded": False, "version": (_active or {}).get("version")}
+        new = _read_pointer()
+        if mtime and new is None:
+            # Keep serving the current version rather than falling back to an unknown state
+            return {"reloaded": False, "version": (_active or {}).get("version"), "error": "unreadable pointer"}
+        old = _active
+        _active, _active_mtime = new, mtime
+
+    old_name = (old or {}).get("version")
+    new_name = (new or {}).get("version")
+    if old_name == new_name and not force:
+        return {"reloaded": False, "version": new_name}
+    for hook in list(_hooks):
+        try:
+            hook()
+        except Exception as e:
+            print(f"[Index Versions] reload hook {getattr(hook, '__name__', hook)} failed: {e}", file=sys.stderr)
+    print(f"[Index Versions] 🔁 swapped index {old_name or 'default'} → {new_name or 'default'}", file=sys.stderr)
+    return {"reloaded": True, "previous": old_name, "version": new_name}
+
+
+def _watch(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            reload()
+        except Exception as e:
+            print(f"[Index Versions] watcher error: {e}", file=sys.stderr)
+
+
+def start_watcher(interval: float = WATCH_INTERVAL) -> None:
+    """Poll the pointer file in a daemon thread (once per process, fork-aware)."""
+    global _watcher, _watcher_pid
+    if interval <= 0:
+        return
+    if _watcher is not None and _watcher_pid == os.getpid():
+        return
+    current_version()
+    _watcher = threading.Thread(target=_watch, args=(interval,), name="index-version-watcher", daemon=True)
+    _watcher_pid = os.getpid()
+    _watcher.start()
+
+
+def prune_namespaces(index, keep: int, path: str = POINTER_PATH) -> list:
+    """Delete namespaces of old builds, keeping the newest `keep` (the active one always survives)."""
+    if keep <= 0 or not hasattr(index, "list_namespaces"):
+        return []
+    active = (_read_pointer(path) or {}).get("namespace", "")
+    versions = sorted(ns for ns in index.list_namespaces() if ns.startswith("v") and ns != active)
+    doomed = versions[:max(0, len(versions) - (keep - 1))]
+    for ns in doomed:
+        index.delete_namespace(ns)
+    return doomed
@@ -0,0 +1,230 @@
+"""
+Cheap local intent router for the Digital Twin pipeline.
+
+Decides per question which stages are worth running, without any LLM call:
+
+  intent       enhance  retrieve  STAR format  LLM calls  answer length
+  direct       no       no        no           0          (templated from digitaltwin.json)
+  factual      no       yes       no           1          ~80 words
+  technical    yes      yes       no           2          ~220 words
+  behavioral   yes      yes       yes          3          ~250 words
+  general      yes      yes       no           2          ~160 words
+
+The answer length is a per-class output budget: the generation prompt asks
+for about that many words and max_tokens is capped in proportion (see
+digital_twin_pipeline.py), so a short factual question no longer reserves a
+700-token completion. Override the word targets with
+ANSWER_WORD_BUDGETS='{"factual": 60, ...}'.
+
+Classification is keyword rules first; questions no rule matches fall back to
+nearest centroid over cached embeddings of example questions (including the
+interview_prep questions in the profile) when the local embedding model is
+already loaded in the process. The router never triggers a model load itself:
+without one, unmatched questions are "general".
+
+Environment variables:
+  - INTENT_ROUTER_ENABLED (default "1")
+  - INTENT_USE_EMBEDDINGS (default "1")
+  - INTENT_CENTROID_MIN_SIMILARITY (default 0.45)
+  - ANSWER_WORD_BUDGETS (JSON object of intent -> target answer words)
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from typing import NamedTuple, Optional
+
+import digital_twin_index_versions as index_versions
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "1") not in ("0", "false", "False")
+USE_EMBEDDINGS = os.getenv("INTENT_USE_EMBEDDINGS", "1") not in ("0", "false", "False")
+CENTROID_MIN_SIMILARITY = float(os.getenv("INTENT_CENTROID_MIN_SIMILARITY", "0.45"))
+
+
+class RoutePlan(NamedTuple):
+    intent: str
+    enhance_query: bool
+    retrieve: bool
+    star_format: bool
+    direct_answer: Optional[str] = None
+
+
+_PLANS = {
+    "direct": (False, False, False),
+    "factual": (False, True, False),
+    "technical": (True, True, False),
+    "behavioral": (True, True, True),
+    "general": (True, True, False),
+}
+# With the router off every question gets every stage
+_FULL_PLAN = (True, True, True)
+
+_DEFAULT_ANSWER_WORDS = {"direct": 80, "factual": 80, "technical": 220, "behavioral": 250, "general": 160}
+try:
+    ANSWER_WORDS = {**_DEFAULT_ANSWER_WORDS, **{k: int(v) for k, v in json.loads(os.getenv("ANSWER_WORD_BUDGETS", "{}")).items()}}
+except (ValueError, TypeError, AttributeError) as e:
+    print(f"[Intent] ignoring invalid ANSWER_WORD_BUDGETS: {e}", file=sys.stderr)
+    ANSWER_WORDS = dict(_DEFAULT_ANSWER_WORDS)
+
+# (intent, sub-kind, pattern). Order matters: first match wins.
+# "direct" rules skip the LLM entirely, so they only match whole-question
+# forms; keywords inside other questions fall through to the classifier.
+_RULES = [
+    ("direct", "location", r"^\s*(where (are|do) you (located|based|live|from)|what('s| is) your (location|city|country))\??\s*$"),
+    ("direct", "contact", r"^\s*(what('s| is) your (e-?mail|phone|linkedin|github)|how can I (contact|reach) you)\??\s*$"),
+    ("direct", "name", r"^\s*(what('s| is) your name|who are you)\??\s*$"),
+    ("behavioral", None, r"\b(tell me about a time|describe a (time|situation|project)|give (me )?an example|"
+                         r"challenge|conflict|fail(ed|ure)?|mistake|proud|led a team|leadership|disagree|"
+                         r"under pressure|deadline|overc[oa]me)\b"),
+    ("technical", None, r"\b(how (does|do|would|did) |explain|design|architecture|implement|optimi[sz]e|"
+                        r"difference between|algorithm|scal(e|able|ing)|debug)\b"),
+    ("factual", None, r"\b(salary|expect(ation)?s?|education|degree|university|gpa|graduat|certif|"
+                      r"languages? (do you )?speak|available|availability|notice period|relocat|remote|"
+                      r"years of experience|how many years|skills|tech stack|what (languages|frameworks|tools))\b"),
+]
+_COMPILED_RULES = [(intent, kind, re.compile(p, re.IGNORECASE)) for intent, kind, p in _RULES]
+
+_EXAMPLES = {
+    "factual": [
+        "What is your educational background?",
+        "What are your salary expectations?",
+        "What programming languages do you know?",
+        "Are you open to relocation?",
+        "When can you start?",
+    ],
+    "technical": [
+        "How would you design a scalable system?",
+        "Explain how your model works.",
+        "How did you optimize inference speed?",
+    ],
+    "behavioral": [
+        "Tell me about a time you overcame a challenge.",
+        "Describe a situation where you led a team.",
+        "What is your biggest weakness?",
+    ],
+}
+
+_profile = None
+_centroids = None
+_centroid_lock = threading.Lock()
+
+
+def _load_profile() -> dict:
+    global _profile
+    if _profile is None:
+        with open(os.path.join(ROOT_DIR, "digitaltwin.json"), "r", encoding="utf-8") as f:
+            _profile = json.load(f)
+    return _profile
+
+
+def direct_answer(kind: str) -> Optional[str]:
+    """Templated first-person answer for trivial profile lookups."""
+    personal = _load_profile().get("personal", {})
+    if kind == "location" and personal.get("location"):
+        return f"I'm based in {personal['location']}."
+    if kind == "contact" and personal.get("contact"):
+        contact = personal["contact"]
+        parts = [f"{label}: {contact[key]}" for key, label in (
+            ("email", "Email"), ("linkedin", "LinkedIn"), ("github", "GitHub"), ("portfolio", "Portfolio")
+        ) if contact.get(key)]
+        return "You can reach me here — " + ", ".join(parts) + "."
+    if kind == "name" and personal.get("name"):
+        title = f", {personal['title']}" if personal.get("title") else ""
+        return f"I'm {personal['name']}{title}."
+    return None
+
+
+def _interview_examples() -> dict:
+    """interview_prep questions grouped by category (behavioral/technical/situational)."""
+    examples = {}
+    common = _load_profile().get("interview_prep", {}).get("common_questions", {})
+    for category, items in common.items():
+        intent = {"situational": "technical"}.get(category, category)
+        if intent not in _PLANS or not isinstance(items, list):
+            continue
+        examples.setdefault(intent, []).extend(
+            i["question"] for i in items if isinstance(i, dict) and i.get("question")
+        )
+    return examples
+
+
+def _get_centroids():
+    """(intent names, unit-norm centroid matrix), built once; None if no local model."""
+    global _centroids
+    if _centroids is None:
+        with _centroid_lock:
+            if _centroids is None:
+                try:
+                    from digital_twin_resources import encode_matrix
+
+                    examples = {k: list(v) for k, v in _EXAMPLES.items()}
+                    for intent, questions in _interview_examples().items():
+                        examples.setdefault(intent, []).extend(questions)
+                    names, rows = [], []
+                    for intent, questions in examples.items():
+                        centroid = encode_matrix(questions).mean(axis=0)
+                        rows.append(centroid / ((centroid ** 2).sum() ** 0.5))
+                        names.append(intent)
+                    import numpy as np
+
+                    _centroids = (names, np.vstack(rows))
+                except ImportError:
+                    _centroids = False
+    return _centroids or None
+
+
+def _embedding_model_loaded() -> bool:
+    try:
+        from digital_twin_resources import embedding_model_loaded
+    except ImportError:
+        return False
+    return embedding_model_loaded()
+
+
+def classify(question: str) -> tuple:
+    """Return (intent, sub_kind) for a question."""
+    for intent, kind, pattern in _COMPILED_RULES:
+        if pattern.search(question):
+            return intent, kind
+    if USE_EMBEDDINGS and _embedding_model_loaded():
+        centroids = _get_centroids()
+        if centroids is not None:
+            from digital_twin_resources import encode_matrix
+
+            names, matrix = centroids
+            scores = matrix @ encode_matrix([question])[0]
+            best = int(scores.argmax())
+            if float(scores[best]) >= CENTROID_MIN_SIMILARITY:
+                return names[best], None
+    return "general", None
+
+
+def _reset() -> None:
+    global _profile, _centroids
+    with _centroid_lock:
+        _profile, _centroids = None, None
+
+
+index_versions.on_reload(_reset)
+
+
+def answer_words(intent: str) -> int:
+    """Target answer length in words for a question class."""
+    return ANSWER_WORDS.get(intent, ANSWER_WORDS["general"])
+
+
+def route(question: str) -> RoutePlan:
+    """Decide which pipeline stages to run for this question."""
+    if not ROUTER_ENABLED:
+        return RoutePlan("general", *_FULL_PLAN)
+    intent, kind = classify(question)
+    if intent == "direct":
+        answer = direct_answer(kind)
+        if answer:
+            return RoutePlan("direct", *_PLANS["direct"], direct_answer=answer)
+        intent = "factual"
+    return RoutePlan(intent, *_PLANS[intent])
@@ -0,0 +1,280 @@
+"""
+Bulk job-posting matcher for the Digital Twin profile.
+
+Reads a directory of job postings (.md / .txt), splits them into chunks,
+embeds every chunk in batched calls and scores all chunks against the
+profile embedding matrix with a single matrix product. Postings are ranked by
+how well the profile covers their content, and each result lists the skills
+the posting asks for that the profile matches or is missing.
+
+CLI:
+  python digital_twin_job_matcher.py job-postings --top 10
+  python digital_twin_job_matcher.py job-postings --json > matches.json
+
+API:
+  uvicorn digital_twin_job_matcher:app --port 8001
+  POST /match
+    Body: { "directory": string } or { "postings": [{ "name": string, "text": string }] }
+    Returns: { "results": [...], "postings": int, "chunks": int, "elapsed_ms": float }
+
+Over HTTP, "directory" is resolved under JOB_POSTINGS_ROOT (default the
+job-postings/ folder; "." is the root itself) and anything that resolves
+outside it is rejected, so a request cannot read files elsewhere on the host.
+The CLI reads any directory it is given.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+import digital_twin_resources as resources
+
+POSTING_EXTENSIONS = (".md", ".txt")
+CHUNK_WORDS = int(os.getenv("JOB_MATCH_CHUNK_WORDS", "120"))
+CHUNK_OVERLAP = int(os.getenv("JOB_MATCH_CHUNK_OVERLAP", "20"))
+ENCODE_BATCH_SIZE = int(os.getenv("JOB_MATCH_BATCH_SIZE", "128"))
+POSTINGS_ROOT = os.path.realpath(os.getenv(
+    "JOB_POSTINGS_ROOT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "job-postings")
+))
+
+# Skills commonly requested in postings. Anything here that a posting mentions
+# but the profile does not is reported as missing.
+COMMON_SKILLS = [
+    "Python", "Java", "C++", "C#", "Golang", "Rust", "JavaScript", "TypeScript", "PHP", "Ruby",
+    "Kotlin", "Swift", "Scala", "SQL", "Bash",
+    "React", "Next.js", "Vue", "Angular", "Node.js", "Express", "Django", "Flask", "FastAPI",
+    "Spring", ".NET", "Tailwind CSS",
+    "TensorFlow", "PyTorch", "Keras", "Scikit-learn", "OpenCV", "YOLOv8", "MediaPipe", "NumPy",
+    "Pandas", "Hugging Face", "LangChain", "LLM", "RAG", "NLP", "Computer Vision",
+    "Machine Learning", "Deep Learning", "Data Analysis", "Power BI", "Tableau", "Excel",
+    "PostgreSQL", "MySQL", "MongoDB", "Redis", "SQLite", "Elasticsearch",
+    "Docker", "Kubernetes", "AWS", "Azure", "GCP", "Terraform", "CI/CD", "Git", "Linux",
+    "REST", "GraphQL", "Microservices", "Agile", "Scrum",
+]
+
+# Keys under the profile's "skills" section whose values name a single skill.
+_SKILL_NAME_KEYS = {"language", "name", "skill", "tool", "technology"}
+_MAX_SKILL_LENGTH = 40
+# Names this short ("REST", "Git", "RAG") are matched case-sensitively so
+# ordinary words like "rest" are not counted as skills.
+_CASE_SENSITIVE_MAX_LENGTH = 4
+
+
+def load_postings(directory: str) -> list:
+    """Return (name, text) pairs for every posting file in a directory."""
+    postings = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(POSTING_EXTENSIONS):
+            continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8", errors="replace") as f:
+            text = f.read().strip()
+        if text:
+            postings.append((name, text))
+    return postings
+
+
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list:
+    """Split text into overlapping word windows."""
+    words = text.split()
+    if len(words) <= max_words:
+        return [" ".join(words)]
+    step = max(1, max_words - overlap)
+    return [" ".join(words[i:i + max_words]) for i in range(0, len(words) - overlap, step)]
+
+
+def profile_skills(profile: dict) -> list:
+    """Collect skill names from the profile's skills section."""
+    skills = set()
+
+    def add(value: str):
+        value = value.strip()
+        if not value or len(value) > _MAX_SKILL_LENGTH:
+            return
+        skills.add(value)
+        # "JavaScript/TypeScript" also counts as each half
+        for part in value.split("/"):
+            if part.strip() and part.strip() != value:
+                skills.add(part.strip())
+
+    def walk(obj, key=None):
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                walk(v, k)
+        elif isinstance(obj, list):
+            for v in obj:
+                walk(v, key)
+        elif isinstance(obj, str) and key in _SKILL_NAME_KEYS:
+            add(obj)
+
+    walk(profile.get("skills", {}))
+    return sorted(skills)
+
+
+def _skill_pattern(skills: list, flags: int = 0) -> Optional[re.Pattern]:
+    # Longest first so "Next.js" wins over "Next"; lookarounds instead of \b
+    # because names like "C++" and ".NET" start or end with punctuation.
+    alternatives = sorted({s for s in skills if s}, key=len, reverse=True)
+    if not alternatives:
+        return None
+    body = "|".join(re.escape(s) for s in alternatives)
+    return re.compile(rf"(?<![\w+#.])({body})(?![\w+#])", flags)
+
+
+class JobMatcher:
+    """Holds the profile embedding matrix and skill vocabulary between calls."""
+
+    def __init__(self, profile: Optional[dict] = None):
+        self.profile = profile or resources.load_profile()
+        leaves = [(k, t) for k, t in resources.flatten_json(self.profile) if len(t.split()) >= 3]
+        self.profile_keys = [k for k, _ in leaves]
+        self.profile_matrix = resources.encode_matrix([t for _, t in leaves], ENCODE_BATCH_SIZE)
+
+        self.profile_skills = profile_skills(self.profile)
+        self._profile_skill_keys = {s.lower() for s in self.profile_skills}
+        canonical = {}
+        for s in COMMON_SKILLS + self.profile_skills:
+            canonical.setdefault(s.lower(), s)
+        self._canonical = canonical
+        names = list(canonical.values())
+        self._skill_patterns = [p for p in (
+            _skill_pattern([s for s in names if len(s) > _CASE_SENSITIVE_MAX_LENGTH], re.IGNORECASE),
+            _skill_pattern([s for s in names if len(s) <= _CASE_SENSITIVE_MAX_LENGTH]),
+        ) if p is not None]
+
+    def extract_skills(self, text: str) -> list:
+        found = {m.group(1).lower() for p in self._skill_patterns for m in p.finditer(text)}
+        return sorted(self._canonical[k] for k in found)
+
+    def match(self, postings: list, top: Optional[int] = None) -> list:
+        """Rank (name, text) postings against the profile."""
+        if not postings:
+            return []
+
+        chunks, offsets = [], []
+        for _, text in postings:
+            offsets.append(len(chunks))
+            chunks.extend(chunk_text(text))
+
+        chunk_matrix = resources.encode_matrix(chunks, ENCODE_BATCH_SIZE)
+        # One (chunks x profile) product scores every chunk against every profile leaf.
+        similarity = chunk_matrix @ self.profile_matrix.T
+        best_per_chunk = similarity.max(axis=1)
+        best_leaf = similarity.argmax(axis=1)
+
+        starts = np.asarray(offsets)
+        counts = np.diff(np.append(starts, len(chunks)))
+        coverage = np.add.reduceat(best_per_chunk, starts) / counts
+        peak = np.maximum.reduceat(best_per_chunk, starts)
+
+        results = []
+        for i, (name, text) in enumerate(postings):
+            requested = self.extract_skills(text)
+            matched = [s for s in requested if s.lower() in self._profile_skill_keys]
+            missing = [s for s in requested if s.lower() not in self._profile_skill_keys]
+            lo, hi = offsets[i], offsets[i] + counts[i]
+            top_chunk = lo + int(best_per_chunk[lo:hi].argmax())
+            results.append({
+                "posting": name,
+                "score": round(float(coverage[i]), 4),
+                "peak_score": round(float(peak[i]), 4),
+                "matched_skills": matched,
+                "missing_skills": missing,
+                "skill_coverage": round(len(matched) / len(requested), 3) if requested else None,
+                "best_profile_match": self.profile_keys[int(best_leaf[top_chunk])],
+            })
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:top] if top else results
+
+
+_matcher: Optional[JobMatcher] = None
+
+
+def get_matcher() -> JobMatcher:
+    global _matcher
+    if _matcher is None:
+        _matcher = JobMatcher()
+    return _matcher
+
+
+class PostingIn(BaseModel):
+    name: str
+    text: str
+
+
+class MatchRequest(BaseModel):
+    directory: Optional[str] = None
+    postings: Optional[List[PostingIn]] = None
+    top: Optional[int] = None
+
+
+app = FastAPI(title="Digital Twin Job Matcher")
+
+
+def resolve_postings_dir(directory: str) -> str:
+    """Path of a request's postings directory, which must stay inside POSTINGS_ROOT."""
+    path = os.path.realpath(os.path.join(POSTINGS_ROOT, directory))
+    if os.path.commonpath([path, POSTINGS_ROOT]) != POSTINGS_ROOT:
+        raise HTTPException(status_code=400, detail="'directory' must be inside the job postings folder")
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=400, detail=f"Not a directory: {directory}")
+    return path
+
+
+@app.post("/match")
+def match_endpoint(payload: MatchRequest):
+    if payload.postings:
+        postings = [(p.name, p.text) for p in payload.postings]
+    elif payload.directory:
+        postings = load_postings(resolve_postings_dir(payload.directory))
+    else:
+        raise HTTPException(status_code=400, detail="Provide 'postings' or 'directory'")
+
+    start = time.perf_counter()
+    results = get_matcher().match(postings, top=payload.top)
+    return {
+        "results": results,
+        "postings": len(postings),
+        "chunks": sum(len(chunk_text(t)) for _, t in postings),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank job postings against the Digital Twin profile.")
+    parser.add_argument("directory", nargs="?", default="job-postings", help="directory of .md/.txt postings")
+    parser.add_argument("--top", type=int, default=None, help="only show the best N postings")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    postings = load_postings(args.directory)
+    if not postings:
+        print(f"No postings found in {args.directory}", file=sys.stderr)
+        sys.exit(1)
+
+    matcher = JobMatcher()
+    start = time.perf_counter()
+    results = matcher.match(postings, top=args.top)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+        return
+
+    print(f"📄 Scored {len(postings)} postings in {elapsed:.2f}s\n")
+    for rank, r in enumerate(results, 1):
+        print(f"{rank:>3}. {r['posting']}  (score {r['score']:.3f}, peak {r['peak_score']:.3f})")
+        print(f"     ✅ Matched: {', '.join(r['matched_skills']) or '-'}")
+        print(f"     ❌ Missing: {', '.join(r['missing_skills']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
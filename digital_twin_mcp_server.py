@@ -0,0 +1,215 @@
+"""
+Digital Twin MCP Server (stdio)
+
+Exposes the profile RAG pipeline to MCP clients such as Claude Desktop:
+  - query_digital_twin: answer a question in first person using retrieved context
+  - search_profile: return the raw profile snippets that match a query
+  - get_profile_section: return one top-level section of digitaltwin.json
+
+The process stays alive for the whole client session, so the embedding model,
+Upstash index, Groq client and answer cache are loaded once and reused by
+every tool call. Blocking work runs on worker threads, so slow LLM calls do
+not hold up concurrent searches.
+
+Run:
+  python digital_twin_mcp_server.py
+
+Environment variables:
+  - UPSTASH_VECTOR_REST_URL, UPSTASH_VECTOR_REST_TOKEN
+  - GROQ_API_KEY (for query_digital_twin)
+  - Optional: MCP_MAX_CONCURRENT_CALLS (default 8), MCP_ANSWER_CACHE_SIZE (default 256)
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import anyio
+from mcp.server.fastmcp import FastMCP
+
+import digital_twin_index_versions as index_versions
+import digital_twin_resources as resources
+from digital_twin_cache import cached_chat_completion
+from digital_twin_resources import DEFAULT_GROQ_MODEL, log
+from digital_twin_precomputed import answer_from_table
+from digital_twin_request_log import track_request
+from digital_twin_retrieval import adaptive_query, query_index
+from digital_twin_scope import gate as scope_gate, top_score
+
+MAX_CONCURRENT_CALLS = int(os.getenv("MCP_MAX_CONCURRENT_CALLS", "8"))
+ANSWER_CACHE_SIZE = int(os.getenv("MCP_ANSWER_CACHE_SIZE", "256"))
+
+SYSTEM_PROMPT = (
+    "You are an AI digital twin. Answer questions as if you are the person, "
+    "speaking in first person about your background, skills, and experience."
+)
+
+mcp = FastMCP("digital-twin")
+
+# Bounds how many blocking tool calls run at once; the rest wait their turn
+# without stalling the event loop that serves other requests.
+_call_limiter = anyio.CapacityLimiter(MAX_CONCURRENT_CALLS)
+
+_answer_cache: "OrderedDict[tuple, str]" = OrderedDict()
+_answer_cache_lock = threading.Lock()
+
+
+def _cache_get(key: tuple):
+    with _answer_cache_lock:
+        answer = _answer_cache.get(key)
+        if answer is not None:
+            _answer_cache.move_to_end(key)
+        return answer
+
+
+def _cache_put(key: tuple, answer: str) -> None:
+    with _answer_cache_lock:
+        _answer_cache[key] = answer
+        _answer_cache.move_to_end(key)
+        while len(_answer_cache) > ANSWER_CACHE_SIZE:
+            _answer_cache.popitem(last=False)
+
+
+def _clear_answer_cache() -> None:
+    with _answer_cache_lock:
+        _answer_cache.clear()
+
+
+index_versions.on_reload(_clear_answer_cache)
+
+
+def search_hits(query: str, top_k: Optional[int] = 5) -> list:
+    """Embed the query and return matching profile snippets with scores.
+
+    top_k=None picks the number of hits adaptively from the score curve.
+    """
+    vector = resources.embed_query(query)
+    if top_k is None:
+        results, _ = adaptive_query(resources.get_index(), vector, query_text=query)
+    else:
+        results = query_index(resources.get_index(), vector, top_k)
+    hits = []
+    for res in results or []:
+        md = getattr(res, "metadata", {}) or {}
+        text = md.get("text") or md.get("content") or ""
+        if not text:
+            continue
+        hits.append({
+            "id": str(getattr(res, "id", "")),
+            "score": round(float(getattr(res, "score", 0.0)), 4),
+            "title": md.get("title"),
+            "text": text,
+        })
+    return hits
+
+
+def answer_question(question: str, top_k: Optional[int] = None) -> str:
+    """Retrieve context and generate a first-person answer, memoized per question."""
+    key = (" ".join(question.lower().split()), top_k)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    precomputed = answer_from_table(question)
+    if precomputed:
+        return precomputed
+
+    hits = search_hits(question, top_k=top_k)
+    if not hits:
+        return "I don't have specific information about that topic."
+    out_of_scope = scope_gate(question, top_score(hits), resources.LOCAL_EMBEDDING_MODEL)
+    if out_of_scope is not None:
+        return out_of_scope.text()
+
+    groq_client = resources.get_groq_client()
+    if groq_client is None:
+        return "Answer generation is not configured. Set GROQ_API_KEY to enable it."
+
+    context = "\n\n".join(
+        f"{h['title']}: {h['text']}" if h["title"] else h["text"] for h in hits
+    )
+    prompt = (
+        "Based on the following information about yourself, answer the question.\n"
+        "Speak in first person as if you are describing your own background.\n\n"
+        f"Your Information:\n{context}\n\n"
+        f"Question: {question}\n\n"
+        "Provide a helpful, professional response:"
+    )
+    answer = cached_chat_completion(
+        groq_client,
+        model=DEFAULT_GROQ_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.7,
+        max_tokens=500,
+    )
+    _cache_put(key, answer)
+    return answer
+
+
+def _tracked_answer(question: str, top_k: Optional[int]) -> str:
+    with track_request("mcp:query_digital_twin", question):
+        return answer_question(question, top_k)
+
+
+def profile_section(section: str) -> str:
+    """Return one top-level section of the profile as pretty JSON."""
+    profile = resources.load_profile()
+    if section not in profile:
+        available = ", ".join(profile.keys())
+        return f"Unknown section '{section}'. Available sections: {available}"
+    return json.dumps(profile[section], indent=2, ensure_ascii=False)
+
+
+@mcp.tool()
+async def query_digital_twin(question: str, top_k: Optional[int] = None) -> str:
+    """Ask the digital twin a question about its background, skills, projects or goals.
+
+    Leave top_k unset to size the retrieved context to the question.
+    """
+    question = (question or "").strip()
+    if not question:
+        return "'question' must be a non-empty string"
+    try:
+        return await anyio.to_thread.run_sync(_tracked_answer, question, top_k, limiter=_call_limiter)
+    except Exception as e:
+        log(f"[query_digital_twin] {e}")
+        return f"❌ Error during query: {e}"
+
+
+@mcp.tool()
+async def search_profile(query: str, top_k: int = 5) -> str:
+    """Semantic search over the profile; returns the matching snippets and scores as JSON."""
+    query = (query or "").strip()
+    if not query:
+        return "'query' must be a non-empty string"
+    try:
+        hits = await anyio.to_thread.run_sync(search_hits, query, top_k, limiter=_call_limiter)
+        return json.dumps(hits, indent=2, ensure_ascii=False)
+    except Exception as e:
+        log(f"[search_profile] {e}")
+        return f"❌ Error during search: {e}"
+
+
+@mcp.tool()
+async def get_profile_section(section: str) -> str:
+    """Return a top-level section of the profile, e.g. 'experience', 'skills' or 'projects_portfolio'."""
+    return await anyio.to_thread.run_sync(profile_section, (section or "").strip(), limiter=_call_limiter)
+
+
+def main():
+    log("Digital Twin MCP Server running on stdio")
+    # Warm the model and clients in the background so the client handshake is
+    # answered immediately; early tool calls simply wait on the resource locks.
+    threading.Thread(target=resources.warm_up, name="warm-up", daemon=True).start()
+    # Pick up blue/green index swaps without restarting the client's server process
+    index_versions.start_watcher()
+    mcp.run(transport="stdio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Local read-only metadata store for ID-only vector queries.
+
+By default every Upstash hit carries its snippet text in the vector metadata,
+so each query ships the full text of every candidate over HTTP and the client
+parses it. With VECTOR_METADATA=local:
+
+  - embed_digitaltwin.py upserts vectors with their id only and writes the
+    text, title, section path and profile of every record to a SQLite file
+  - queries use include_metadata=False and the hits are resolved against that
+    file with one indexed SELECT per query
+
+The file is written to a temporary path and moved into place with
+os.replace(), and readers open it immutable, so a running API never sees a
+half-written store. Readers reopen the file when it is replaced in place
+(a new inode or mtime) and on every version swap, and a store that appears
+after the first query is picked up by the next one. Versioned builds (digital_twin_index_versions.py) get
+their own file, named in the version pointer, and readers follow the active
+version. If the store is missing, queries fall back to fetching metadata
+from Upstash.
+
+Environment variables:
+  - VECTOR_METADATA ("upstash" (default) or "local")
+  - VECTOR_METADATA_PATH (default vector_metadata.db next to this file)
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+
+from digital_twin_index_versions import current_version, on_reload
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+METADATA_MODE = os.getenv("VECTOR_METADATA", "upstash")
+STORE_PATH = os.getenv("VECTOR_METADATA_PATH", os.path.join(ROOT_DIR, "vector_metadata.db"))
+
+_SCHEMA = """
+CREATE TABLE records (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    title TEXT,
+    section TEXT,
+    profile TEXT
+) WITHOUT ROWID;
+"""
+
+# SQLite's default limit on bound parameters is 999 on older builds
+_MAX_IDS_PER_QUERY = 900
+
+
+class MetadataStoreWriter:
+    """Builds a store next to the target path and swaps it in on close().
+
+    With `base`, the new store starts as a copy of that existing store
+    (incremental builds); otherwise it starts empty.
+    """
+
+    def __init__(self, path: str = STORE_PATH, base: str = None):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.count = 0
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        copy_base = bool(base) and os.path.exists(base)
+        if copy_base:
+            shutil.copyfile(base, self.tmp_path)
+        self._conn = sqlite3.connect(self.tmp_path)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        if not copy_base:
+            self._conn.executescript(_SCHEMA)
+
+    def add(self, records) -> None:
+        """Insert (id, metadata) pairs; metadata is the dict that Upstash would have stored."""
+        rows = [
+            (key, md.get("text", ""), md.get("title"), md.get("section", key), md.get("profile"))
+            for key, md in records
+        ]
+        self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", rows)
+        self.count += len(rows)
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        self._conn.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class MetadataStore:
+    """Read-only id → metadata lookups, safe across threads and forked workers."""
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self.missing = 0
+        self._conn()  # fail fast if the file is not there
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            uri = f"file:{self.path}?mode=ro&immutable=1"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, ids) -> dict:
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        for start in range(0, len(ids), _MAX_IDS_PER_QUERY):
+            batch = ids[start:start + _MAX_IDS_PER_QUERY]
+            placeholders = ",".join("?" * len(batch))
+            for key, text, title, section, profile in self._conn().execute(
+                f"SELECT id, text, title, section, profile FROM records WHERE id IN ({placeholders})", batch
+            ):
+                md = {"text": text, "section": section}
+                if title:
+                    md["title"] = title
+                if profile:
+                    md["profile"] = profile
+                found[key] = md
+        self.missing += len(ids) - len(found)
+        return found
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+
+def versioned_store_path(version: str) -> str:
+    """Store file for a versioned build, next to the default store."""
+    base, ext = os.path.splitext(STORE_PATH)
+    return f"{base}.{version}{ext}"
+
+
+def active_store_path(version=None) -> str:
+    version = version or current_version()
+    if version and version.get("metadata_file"):
+        return os.path.join(os.path.dirname(STORE_PATH), version["metadata_file"])
+    return STORE_PATH
+
+
+_stores = {}  # path -> ((inode, mtime), MetadataStore or None if it failed to open)
+_reported_missing = set()
+_store_lock = threading.Lock()
+
+
+def get_metadata_store(version=None):
+    """The store for an index version (default: the active one) when VECTOR_METADATA=local
+    and its file exists, else None."""
+    if METADATA_MODE != "local":
+        return None
+    path = active_store_path(version)
+    try:
+        st = os.stat(path)
+    except OSError:
+        # Not cached: a store written later is used from the next query on
+        if path not in _reported_missing:
+            _reported_missing.add(path)
+            print(f"[Metadata Store] {path} not found; fetching metadata from Upstash", file=sys.stderr)
+        return None
+    signature = (st.st_ino, st.st_mtime_ns)
+    cached = _stores.get(path)
+    if cached is None or cached[0] != signature:
+        with _store_lock:
+            cached = _stores.get(path)
+            if cached is None or cached[0] != signature:
+                # An immutable reader keeps serving the old inode, so a rebuilt file is reopened
+                store = None
+                try:
+                    store = MetadataStore(path)
+                except sqlite3.Error as e:
+                    print(f"[Metadata Store] failed to open {path}: {e}", file=sys.stderr)
+                cached = _stores[path] = (signature, store)
+                _reported_missing.discard(path)
+    return cached[1]
+
+
+def _reset() -> None:
+    with _store_lock:
+        _stores.clear()
+        _reported_missing.clear()
+
+
+on_reload(_reset)
+
+
+def attach_metadata(results, store: MetadataStore) -> list:
+    """Fill in `.metadata` on ID-only query results from the local store."""
+    results = list(results or [])
+    found = store.get_many(getattr(r, "id", None) for r in results)
+    for r in results:
+        md = found.get(r.id)
+        if md is None:
+            print(f"[Metadata Store] no record for vector id {r.id}", file=sys.stderr)
+            md = {}
+        r.metadata = md
+    return results
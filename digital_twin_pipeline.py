@@ -0,0 +1,372 @@
+"""
+Composable answer pipeline shared by every Digital Twin HTTP mode.
+
+A request runs an ordered list of stages over one PipelineState:
+
+  route        local intent router (digital_twin_intent.py); may answer directly
+  precomputed  answers built at index time (digital_twin_precomputed.py)
+  scope        questions the profile cannot cover end here, judged on a
+               retrieval of the raw question (digital_twin_scope.py)
+  enhance      LLM query expansion
+  retrieve     embed + adaptive Upstash query (+ optional rerank); applies
+               the scope gate itself when no scope stage ran before it
+  generate     LLM answer from retrieved snippets or a static profile context
+  format       LLM interview / STAR refinement (behavioral questions only)
+
+"generate" and "format" ask for an answer length that fits the question's
+class (digital_twin_intent.answer_words) and stop at an end sentinel.
+max_tokens is capped at TOKENS_PER_WORD times that target; an answer that
+still runs out of room is continued from where it stopped with the rest of
+the mode's max_tokens, so budgets shorten answers without truncating the
+ones that need the length (and without paying for them twice).
+
+Named modes reproduce the services this replaces:
+
+  rag        precomputed → retrieve → generate          (digital_twin_api.py)
+  simple     generate from a static context             (digital_twin_simple_api.py)
+  advanced   route → precomputed → enhance → generate → format
+             from a static context                      (digital_twin_advanced.py, api/rag.py)
+  interview  route → precomputed → scope → enhance → retrieve → generate → format
+
+Every stage uses the process-wide clients, model, index and caches from
+digital_twin_resources.py, so all modes served by one process share one warm
+set. Heavy imports happen inside the stages that need them: a deployment that
+never retrieves never loads the embedding model or the Upstash client.
+
+Environment variables:
+  - DIGITAL_TWIN_DEFAULT_MODE (default "rag"; an unknown mode falls back to "rag" with a warning)
+  - EMBEDDING_PROVIDER ("sentence-transformers" (default) or "openai")
+"""
+
+import os
+from typing import NamedTuple, Optional
+
+from digital_twin_cache import TruncatedText, cached_chat_completion
+from digital_twin_prompts import (
+    ANSWER_END_SENTINEL,
+    CONTINUE_PROMPT,
+    advanced_answer_messages,
+    interview_format_prompt,
+    query_enhancement_prompt,
+    rag_answer_messages,
+    simple_answer_messages,
+    with_length_budget,
+)
+from digital_twin_request_log import note, stage
+from digital_twin_resources import log
+
+FALLBACK_MODE = "rag"
+DEFAULT_MODE = os.getenv("DIGITAL_TWIN_DEFAULT_MODE", FALLBACK_MODE)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "sentence-transformers")
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+GROQ_MODEL = "llama-3.1-8b-instant"
+OPENAI_MODEL = "gpt-4o-mini"
+
+NO_INFORMATION_ANSWER = "I don't have specific information about that topic."
+FORMAT_MAX_TOKENS = 600
+# max_tokens per target word: ~1.3 tokens per English word plus headroom
+TOKENS_PER_WORD = 2
+
+
+class Mode(NamedTuple):
+    stages: tuple
+    # Static context used by "generate" when nothing was retrieved
+    messages: object = simple_answer_messages
+    max_tokens: int = 500
+
+
+MODES = {
+    "rag": Mode(("precomputed", "retrieve", "generate")),
+    "simple": Mode(("generate",)),
+    "advanced": Mode(("route", "precomputed", "enhance", "generate", "format"),
+                     messages=advanced_answer_messages, max_tokens=700),
+    "interview": Mode(("route", "precomputed", "scope", "enhance", "retrieve", "generate", "format"),
+                      max_tokens=700),
+}
+
+if DEFAULT_MODE not in MODES:
+    # Checked once here so a typo cannot break importing every entry point
+    log(f"⚠️  DIGITAL_TWIN_DEFAULT_MODE='{DEFAULT_MODE}' is not one of {sorted(MODES)}; "
+        f"using '{FALLBACK_MODE}'")
+    DEFAULT_MODE = FALLBACK_MODE
+
+
+class PipelineState:
+    """Everything the stages read and write for one question."""
+
+    def __init__(self, question: str, mode: str, enhance: Optional[bool] = None,
+                 format_response: Optional[bool] = None):
+        self.question = question
+        self.mode = mode
+        # Explicit per-request switches; None lets the router decide
+        self.enhance = enhance
+        self.format_response = format_response
+        self.plan = None
+        self.enhanced_question = None
+        self.search_query = question
+        self.context = None
+        self.answer = None
+        self.done = False
+        self.stages_run = []
+        self.suggestions = None  # in-scope questions offered with an out-of-scope answer
+
+
+def _groq():
+    from digital_twin_resources import get_groq_client
+
+    return get_groq_client()
+
+
+def _chat(messages: list, *, temperature: float, max_tokens: int, stage_name: str = "generate", **options):
+    """Groq first, OpenAI as fallback when it is configured.
+
+    `options` (stop, truncated_ok) are passed to cached_chat_completion.
+    """
+    from digital_twin_resources import get_openai_client
+
+    groq_client = _groq()
+    openai_client = get_openai_client()
+    if groq_client is None and openai_client is None:
+        raise RuntimeError("No LLM provider configured; set GROQ_API_KEY or OPENAI_API_KEY")
+    if groq_client is not None:
+        try:
+            return cached_chat_completion(groq_client, model=GROQ_MODEL, messages=messages,
+                                          temperature=temperature, max_tokens=max_tokens, stage=stage_name,
+                                          **options)
+        except Exception:
+            # Includes Overloaded from provider pacing: shed to OpenAI if we can
+            if openai_client is None:
+                raise
+    return cached_chat_completion(openai_client, model=OPENAI_MODEL, messages=messages,
+                                  temperature=temperature, max_tokens=max_tokens, stage=stage_name, **options)
+
+
+def _answer_class(state: PipelineState) -> str:
+    """The router's intent, or a local classification for modes without the route stage."""
+    if state.plan is not None:
+        return state.plan.intent
+    from digital_twin_intent import classify
+
+    return classify(state.question)[0]
+
+
+def budgeted_chat(messages: list, words: int, *, max_tokens: int, temperature: float, stage_name: str,
+                  chat=None) -> str:
+    """Ask for about `words` words under a proportional max_tokens; continue up to `max_tokens` if that ran out.
+
+    `chat` takes _chat()'s arguments; the index-time answer builder passes its own client.
+    """
+    chat = chat or _chat
+    budget = min(max_tokens, words * TOKENS_PER_WORD)
+    messages = with_length_budget(messages, words)
+    note(**{f"{stage_name}_max_tokens": budget})
+    answer = chat(messages, temperature=temperature, max_tokens=budget, stage_name=stage_name,
+                  stop=[ANSWER_END_SENTINEL], truncated_ok=budget >= max_tokens)
+    if isinstance(answer, TruncatedText):
+        # Finish the cut-off text with the remaining tokens instead of regenerating it
+        note(**{f"{stage_name}_continued": True})
+        rest = chat(messages + [{"role": "assistant", "content": str(answer)},
+                                {"role": "user", "content": CONTINUE_PROMPT}],
+                    temperature=temperature, max_tokens=max_tokens - budget, stage_name=stage_name,
+                    stop=[ANSWER_END_SENTINEL])
+        head, answer = answer, _join_continuation(str(answer), rest)
+        # Cached under the first call's key: a repeat skips both calls
+        head.complete(answer)
+    return answer
+
+
+def _join_continuation(head: str, rest: str) -> str:
+    if not rest:
+        return head
+    return head + ("" if rest[0] in ",.;:!?)" else " ") + rest
+
+
+def _wants(explicit: Optional[bool], planned: bool) -> bool:
+    return planned if explicit is None else explicit
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def route_stage(state: PipelineState) -> None:
+    from digital_twin_intent import route
+
+    state.plan = route(state.question)
+    note(intent=state.plan.intent)
+    # Trivial profile lookups are answered from digitaltwin.json with no LLM call
+    if state.plan.direct_answer and state.enhance is None and state.format_response is None:
+        state.answer = state.plan.direct_answer
+        state.done = True
+
+
+def precomputed_stage(state: PipelineState) -> None:
+    if state.format_response is False:
+        return
+    from digital_twin_precomputed import answer_from_table
+
+    answer = answer_from_table(state.question)
+    if answer:
+        state.answer = answer
+        state.done = True
+
+
+def _out_of_scope(state: PipelineState, score: float) -> bool:
+    from digital_twin_scope import gate
+
+    decision = gate(state.question, score, _embedding_model())
+    if decision is None:
+        return False
+    state.answer, state.suggestions = decision.answer, decision.suggestions
+    state.done = True
+    return True
+
+
+def scope_stage(state: PipelineState) -> None:
+    # Runs before enhance so an out-of-scope question costs no LLM call, and
+    # scores the raw question the same way calibration did
+    if state.plan is not None and not state.plan.retrieve:
+        return
+    from digital_twin_scope import get_threshold, retrieval_score
+
+    if get_threshold(_embedding_model()) is None:
+        return
+    with stage("scope"):
+        score = retrieval_score(state.question, embed=_embed, embedding_model=_embedding_model())
+    _out_of_scope(state, score)
+
+
+def enhance_stage(state: PipelineState) -> None:
+    if not _wants(state.enhance, state.plan.enhance_query if state.plan else True):
+        return
+    try:
+        enhanced = _chat([{"role": "user", "content": query_enhancement_prompt(state.question)}],
+                         temperature=0.3, max_tokens=150, stage_name="enhance")
+    except Exception as e:
+        log(f"[Query Enhancement Error] {e}, using original query")
+        return
+    log(f"[Query Enhancement] Original: {state.question} → Enhanced: {enhanced}")
+    state.enhanced_question = enhanced
+    state.search_query = enhanced
+
+
+def _embed(text: str) -> list:
+    if EMBEDDING_PROVIDER == "openai":
+        from digital_twin_resources import get_openai_client
+
+        with stage("embed"):
+            resp = get_openai_client().embeddings.create(model=OPENAI_EMBEDDING_MODEL, input=text)
+        return resp.data[0].embedding
+    from digital_twin_resources import embed_query
+
+    return embed_query(text)
+
+
+def _embedding_model() -> str:
+    """Name of the model _embed() uses, to match against the scope calibration."""
+    if EMBEDDING_PROVIDER == "openai":
+        return OPENAI_EMBEDDING_MODEL
+    from digital_twin_resources import LOCAL_EMBEDDING_MODEL
+
+    return LOCAL_EMBEDDING_MODEL
+
+
+def retrieve_stage(state: PipelineState) -> None:
+    if state.plan is not None and not state.plan.retrieve:
+        return
+    from digital_twin_rerank import hit_text
+    from digital_twin_resources import get_index
+    from digital_twin_retrieval import adaptive_query
+    from digital_twin_scope import top_score
+
+    results, _ = adaptive_query(get_index(), _embed(state.search_query), query_text=state.search_query,
+                                embedding_model=_embedding_model())
+    # The threshold is calibrated on raw questions, so an enhanced query's
+    # score is not gated; modes that enhance run the scope stage instead
+    if ("scope" not in state.stages_run and state.search_query == state.question
+            and _out_of_scope(state, top_score(results))):
+        return
+    snippets = [text for text in (hit_text(r) for r in results or []) if text]
+    if not snippets:
+        state.answer = NO_INFORMATION_ANSWER
+        state.done = True
+        return
+    state.context = "\n\n".join(snippets)
+
+
+def generate_stage(state: PipelineState) -> None:
+    from digital_twin_intent import answer_words
+
+    mode = MODES.get(state.mode, MODES[DEFAULT_MODE])
+    if state.context is not None:
+        messages = rag_answer_messages(state.context, state.question)
+    else:
+        # Static-context modes have nothing to retrieve with, so the enhanced
+        # question (if any) goes straight into the prompt
+        messages = mode.messages(state.search_query)
+    answer_class = _answer_class(state)
+    note(answer_class=answer_class)
+    state.answer = budgeted_chat(messages, answer_words(answer_class), max_tokens=mode.max_tokens,
+                                  temperature=0.7, stage_name="generate")
+
+
+def format_stage(state: PipelineState) -> None:
+    from digital_twin_intent import answer_words
+
+    if state.answer is None:
+        return
+    answer_class = _answer_class(state)
+    # STAR refinement only helps behavioral answers (the router's plan says so)
+    planned = state.plan.star_format if state.plan else answer_class == "behavioral"
+    if not _wants(state.format_response, planned):
+        return
+    try:
+        state.answer = budgeted_chat(
+            [{"role": "user", "content": interview_format_prompt(state.answer, state.question)}],
+            answer_words(answer_class), max_tokens=FORMAT_MAX_TOKENS, temperature=0.7, stage_name="format",
+        )
+        log("[Response Formatting] Applied interview optimization")
+    except Exception as e:
+        log(f"[Response Formatting Error] {e}, using original answer")
+
+
+STAGES = {
+    "route": route_stage,
+    "precomputed": precomputed_stage,
+    "scope": scope_stage,
+    "enhance": enhance_stage,
+    "retrieve": retrieve_stage,
+    "generate": generate_stage,
+    "format": format_stage,
+}
+
+
+def resolve_stages(mode: str, stages=None) -> tuple:
+    """Stage names for a request: an explicit list, or the mode's default."""
+    if mode not in MODES:
+        raise ValueError(f"unknown mode '{mode}'; expected one of {sorted(MODES)}")
+    if stages is None:
+        return MODES[mode].stages
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise ValueError(f"unknown stages {unknown}; expected a subset of {list(STAGES)}")
+    # Stages always run in pipeline order, whatever order they were listed in
+    return tuple(s for s in STAGES if s in stages)
+
+
+def run_pipeline(question: str, mode: str = DEFAULT_MODE, stages=None, enhance: Optional[bool] = None,
+                 format_response: Optional[bool] = None) -> PipelineState:
+    """Answer a question with the given mode (or explicit stage list)."""
+    names = resolve_stages(mode, stages)
+    state = PipelineState(question, mode, enhance=enhance, format_response=format_response)
+    note(mode=mode)
+    for name in names:
+        STAGES[name](state)
+        state.stages_run.append(name)
+        if state.done:
+            break
+    if state.answer is None:
+        # A stage list without "generate" still returns something useful
+        generate_stage(state)
+        state.stages_run.append("generate")
+    return state
@@ -0,0 +1,239 @@
+"""
+Precomputed answers for the interview_prep questions in digitaltwin.json.
+
+The questions the APIs see most often are close to verbatim copies of the
+ones listed under `interview_prep`. embed_digitaltwin.py can generate their
+answers at index time and store them with their question embeddings in
+precomputed_answers.json. Generation goes through the live format stage's
+path (digital_twin_pipeline.budgeted_chat): the same interview-coach prompt,
+behavioral length budget, end sentinel and max_tokens cap.
+
+At request time `answer_from_table(question)` serves:
+  1. exact matches (case/whitespace-insensitive hash) from a dict, and
+  2. near matches whose cosine similarity to a stored question is at least
+     PRECOMPUTED_MATCH_THRESHOLD, found with one dot product over the table,
+     once the local embedding model is in memory (the retrieving modes load
+     it at warm-up). Like the intent router, the table never loads the model
+     itself, so modes without retrieval (advanced) serve exact matches only
+     and keep the model off the request path.
+Everything else returns None and falls through to the live pipeline.
+
+Rebuilds are incremental: an entry is regenerated only when its question,
+source material, prompt or model changed.
+
+Environment variables:
+  - PRECOMPUTED_ANSWERS_ENABLED (default "1")
+  - PRECOMPUTED_ANSWERS_PATH (default precomputed_answers.json next to digitaltwin.json)
+  - PRECOMPUTED_MATCH_THRESHOLD (default 0.92)
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import digital_twin_index_versions as index_versions
+import digital_twin_request_log as request_log
+from digital_twin_prompts import interview_format_prompt, with_length_budget
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENABLED = os.getenv("PRECOMPUTED_ANSWERS_ENABLED", "1") not in ("0", "false", "False")
+TABLE_PATH = os.getenv("PRECOMPUTED_ANSWERS_PATH", os.path.join(ROOT_DIR, "precomputed_answers.json"))
+MATCH_THRESHOLD = float(os.getenv("PRECOMPUTED_MATCH_THRESHOLD", "0.92"))
+GENERATION_MODEL = "llama-3.1-8b-instant"
+
+
+def collect_interview_questions(profile: dict) -> list:
+    """Return (path, question, source_material) for every interview_prep question with an answer."""
+    found = []
+
+    def walk(obj, path):
+        if isinstance(obj, dict):
+            if isinstance(obj.get("question"), str) and obj.get("answer_framework"):
+                material = {k: v for k, v in obj.items() if k != "question"}
+                found.append((path, obj["question"].strip(), material))
+                return
+            for k, v in obj.items():
+                walk(v, f"{path}.{k}")
+        elif isinstance(obj, list):
+            for i, v in enumerate(obj):
+                walk(v, f"{path}[{i}]")
+
+    walk(profile.get("interview_prep", {}), "interview_prep")
+    return found
+
+
+def _draft_answer(material: dict) -> str:
+    """Flatten the stored framework (and STAR breakdown, if any) into one draft answer."""
+    draft = material.get("answer_framework", "")
+    star = material.get("improved_star_format")
+    if isinstance(star, dict):
+        parts = [f"{k.replace('_', ' ').title()}: {v}" for k, v in star.items() if v]
+        draft = f"{draft}\n\n" + "\n".join(parts)
+    return draft
+
+
+def _answer_words() -> int:
+    from digital_twin_intent import answer_words
+
+    # The format stage refines behavioral answers, the class these questions are prepared for
+    return answer_words("behavioral")
+
+
+def _source_hash(question: str, material: dict) -> str:
+    prompt = [{"role": "user", "content": interview_format_prompt("{answer}", "{question}")}]
+    payload = json.dumps(
+        {
+            "question": question,
+            "material": material,
+            "prompt": with_length_budget(prompt, _answer_words())[0]["content"],
+            "model": GENERATION_MODEL,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build_table(profile: dict, groq_client, path: str = TABLE_PATH) -> dict:
+    """Generate (or incrementally refresh) the precomputed answer table on disk."""
+    from digital_twin_cache import cached_chat_completion
+    from digital_twin_pipeline import FORMAT_MAX_TOKENS, budgeted_chat
+    from digital_twin_resources import encode_matrix
+
+    def chat(messages, *, temperature, max_tokens, stage_name, **options):
+        return cached_chat_completion(groq_client, model=GENERATION_MODEL, messages=messages,
+                                      temperature=temperature, max_tokens=max_tokens, stage=stage_name, **options)
+
+    existing = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for entry in json.load(f).get("entries", []):
+                existing[entry["source_hash"]] = entry
+
+    entries, generated, reused = [], 0, 0
+    pending = []
+    for source_path, question, material in collect_interview_questions(profile):
+        source_hash = _source_hash(question, material)
+        if source_hash in existing:
+            entries.append(existing[source_hash])
+            reused += 1
+            continue
+        answer = budgeted_chat(
+            [{"role": "user", "content": interview_format_prompt(_draft_answer(material), question)}],
+            _answer_words(), max_tokens=FORMAT_MAX_TOKENS, temperature=0.7, stage_name="precompute", chat=chat,
+        )
+        entry = {
+            "path": source_path,
+            "question": question,
+            "question_hash": request_log.question_hash(question),
+            "source_hash": source_hash,
+            "answer": answer,
+        }
+        entries.append(entry)
+        pending.append(entry)
+        generated += 1
+        print(f"  ✍️  Generated answer for: {question}")
+
+    if pending:
+        embeddings = encode_matrix([e["question"] for e in pending])
+        for entry, embedding in zip(pending, embeddings):
+            entry["embedding"] = [round(float(x), 6) for x in embedding]
+
+    table = {"model": GENERATION_MODEL, "entries": entries}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    print(f"✅ Precomputed answers: {generated} generated, {reused} reused, {len(entries)} total")
+    return table
+
+
+class PrecomputedAnswers:
+    """In-memory lookup table loaded from precomputed_answers.json."""
+
+    def __init__(self, path: str = TABLE_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f).get("entries", [])
+        self.entries = entries
+        self.by_hash = {e["question_hash"]: e for e in entries}
+        self._matrix = None
+        with_vectors = [e for e in entries if e.get("embedding")]
+        if with_vectors:
+            try:
+                import numpy as np
+
+                self._matrix = np.asarray([e["embedding"] for e in with_vectors], dtype="float32")
+                self._vector_entries = with_vectors
+            except ImportError:
+                self._matrix = None
+
+    def lookup(self, question: str, threshold: float = MATCH_THRESHOLD):
+        """Return (entry, score) for an exact or near match, else None."""
+        entry = self.by_hash.get(request_log.question_hash(question))
+        if entry is not None:
+            return entry, 1.0
+        if self._matrix is None:
+            return None
+        try:
+            from digital_twin_resources import embedding_model_loaded, encode_matrix
+        except ImportError:
+            # No local embedding model (e.g. the slim Vercel bundle): exact matches only.
+            self._matrix = None
+            return None
+        if not embedding_model_loaded():
+            return None
+        query = encode_matrix([question])[0]
+        scores = self._matrix @ query
+        best = int(scores.argmax())
+        if float(scores[best]) >= threshold:
+            return self._vector_entries[best], float(scores[best])
+        return None
+
+
+_table = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_table():
+    """Load the table once per process; None if disabled or not built yet."""
+    global _table, _table_loaded
+    if not ENABLED:
+        return None
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                if os.path.exists(TABLE_PATH):
+                    try:
+                        _table = PrecomputedAnswers(TABLE_PATH)
+                    except (OSError, ValueError) as e:
+                        print(f"[Precomputed] failed to load {TABLE_PATH}: {e}", file=sys.stderr)
+                _table_loaded = True
+    return _table
+
+
+def _reset_table() -> None:
+    global _table, _table_loaded
+    with _table_lock:
+        _table, _table_loaded = None, False
+
+
+index_versions.on_reload(_reset_table)
+
+
+def answer_from_table(question: str):
+    """Return a precomputed answer for the question, or None to use the live pipeline."""
+    table = get_table()
+    if table is None:
+        return None
+    with request_log.stage("precomputed"):
+        match = table.lookup(question)
+    request_log.note_cache("precomputed", match is not None)
+    if match is None:
+        return None
+    entry, score = match
+    print(f"[Precomputed] served '{entry['question']}' (similarity {score:.3f})", file=sys.stderr)
+    return entry["answer"]
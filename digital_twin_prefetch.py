@@ -0,0 +1,312 @@
+"""
+Speculative prefetch of likely follow-up questions in chat sessions.
+
+Interview conversations follow predictable paths ("tell me about yourself" →
+"what projects" → "what was the hardest challenge"). With PREFETCH_ENABLED=1,
+after each answer in a session the prefetcher:
+
+  1. predicts the PREFETCH_TOP_N most likely next questions from the last
+     question (a small table of common transitions) and the not-yet-asked
+     interview_prep questions of the same kind (behavioral / technical /
+     situational), skipping anything the session already asked
+  2. answers them in background threads with the same pipeline the user is
+     on, which fills the LLM response cache (digital_twin_cache.py), so the
+     follow-up is served from cache if the user asks it
+  3. returns the predictions, which chat UIs can show as suggested questions
+     (asking a suggestion verbatim is what guarantees the cache hit)
+
+Prefetching is strictly lower priority than live traffic and strictly capped:
+
+  - at most PREFETCH_CONCURRENCY answers run at once and at most
+    PREFETCH_QUEUE wait; further predictions are dropped, never queued up
+  - a job is dropped while live requests are in flight (the `busy` check) or
+    when the Groq rate-limit bucket is below half full, so speculation never
+    takes a token a real user would have waited for
+  - PREFETCH_MAX_TOKENS_PER_HOUR caps the LLM tokens spent per clock hour
+    and PREFETCH_MAX_PER_SESSION caps prefetches per session
+  - the worker threads run at a raised nice level where the OS allows it
+
+Prefetch runs are logged with route "prefetch" in the request log; `stats()`
+(served at /prefetch/stats) reports predictions, runs, drops and spend.
+
+  python digital_twin_prefetch.py check
+      exits 1 unless a behavioral question predicts behavioral interview_prep
+      questions the session has not asked yet
+
+Environment variables:
+  - PREFETCH_ENABLED (default 0)
+  - PREFETCH_TOP_N (default 2), PREFETCH_CONCURRENCY (default 1), PREFETCH_QUEUE (default 8)
+  - PREFETCH_MAX_TOKENS_PER_HOUR (default 20000), PREFETCH_MAX_PER_SESSION (default 6)
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+
+import digital_twin_request_log as request_log
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") in ("1", "true", "True")
+TOP_N = int(os.getenv("PREFETCH_TOP_N", "2"))
+CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "1"))
+QUEUE_SIZE = int(os.getenv("PREFETCH_QUEUE", "8"))
+MAX_TOKENS_PER_HOUR = int(os.getenv("PREFETCH_MAX_TOKENS_PER_HOUR", "20000"))
+MAX_PER_SESSION = int(os.getenv("PREFETCH_MAX_PER_SESSION", "6"))
+
+MAX_SESSIONS = 1000
+HISTORY_LENGTH = 20
+PROVIDER_MIN_FREE = 0.5  # fraction of the Groq bucket that must be free to speculate
+_NICE_INCREMENT = 10
+
+# Common next steps in an interview conversation, keyed on the last question
+_TRANSITIONS = [
+    (re.compile(r"\b(about yourself|introduce yourself|your background|who are you)\b", re.I),
+     ["What projects have you worked on?", "What are your key technical skills?"]),
+    (re.compile(r"\bprojects?\b", re.I),
+     ["What was the hardest challenge in that project?", "What technologies did you use?"]),
+    (re.compile(r"\b(challenge|hardest|difficult|problem)\b", re.I),
+     ["What did you learn from it?", "Tell me about a time you failed and what you learned."]),
+    (re.compile(r"\b(skills?|tech stack|technologies)\b", re.I),
+     ["Which project best shows those skills?", "How do you optimize model inference speed?"]),
+    (re.compile(r"\b(experience|work history|worked)\b", re.I),
+     ["What are your career goals?", "What projects have you worked on?"]),
+    (re.compile(r"\b(goals?|future|five years)\b", re.I),
+     ["Why are you applying for this entry-level role when you have AI research experience?"]),
+]
+
+# Router intent -> interview_prep category to draw follow-ups from. Factual
+# questions (skills, education, stack) usually lead into technical depth;
+# direct lookups predict nothing beyond the transitions table
+_INTENT_CATEGORIES = {"behavioral": "behavioral", "technical": "technical", "factual": "technical",
+                      "general": "situational"}
+
+
+def _normalize(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+
+def _interview_questions() -> dict:
+    """interview_prep questions grouped by category (behavioral, technical, situational, ...)."""
+    import digital_twin_resources as resources
+    from digital_twin_precomputed import collect_interview_questions
+
+    grouped = {}
+    for path, question, _ in collect_interview_questions(resources.load_profile()):
+        match = re.search(r"\.(\w+)\[\d+\]$", path)
+        grouped.setdefault(match.group(1) if match else "other", []).append(question)
+    return grouped
+
+
+def predict_follow_ups(history, top_n: int = TOP_N) -> list:
+    """Most likely next questions after `history` (oldest first), excluding ones already asked."""
+    if not history:
+        return []
+    from digital_twin_intent import classify
+
+    last = history[-1]
+    asked = {_normalize(q) for q in history}
+    candidates = []
+    for pattern, follow_ups in _TRANSITIONS:
+        if pattern.search(last):
+            candidates.extend(follow_ups)
+    grouped = _interview_questions()
+    category = _INTENT_CATEGORIES.get(classify(last)[0])
+    candidates.extend(grouped.get(category, []))
+
+    predicted = []
+    for question in candidates:
+        key = _normalize(question)
+        if key not in asked and key not in {_normalize(p) for p in predicted}:
+            predicted.append(question)
+        if len(predicted) >= top_n:
+            break
+    return predicted
+
+
+def _lower_thread_priority() -> None:
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), _NICE_INCREMENT)
+    except (AttributeError, OSError):
+        pass  # not Linux, or not permitted: the caps still bound the impact
+
+
+def _provider_has_headroom() -> bool:
+    from digital_twin_admission import provider_bucket
+
+    bucket = provider_bucket("groq")
+    return bucket is None or bucket.tokens >= bucket.capacity * PROVIDER_MIN_FREE
+
+
+class Prefetcher:
+    """Predicts follow-ups per session and answers them in the background under hard caps."""
+
+    def __init__(self, concurrency: int = CONCURRENCY, queue_size: int = QUEUE_SIZE,
+                 max_tokens_per_hour: int = MAX_TOKENS_PER_HOUR, max_per_session: int = MAX_PER_SESSION,
+                 top_n: int = TOP_N, busy=None):
+        self.concurrency = max(1, concurrency)
+        self.queue_size = queue_size
+        self.max_tokens_per_hour = max_tokens_per_hour
+        self.max_per_session = max_per_session
+        self.top_n = top_n
+        self.busy = busy
+        self._sessions = OrderedDict()  # session id -> {"history": deque, "prefetched": int}
+        self._queue = deque()
+        self._inflight = set()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._pid = None
+        self._hour = None
+        self.tokens_this_hour = 0
+        self.counts = {"predicted": 0, "queued": 0, "completed": 0, "failed": 0,
+                       "dropped_queue_full": 0, "dropped_busy": 0, "dropped_budget": 0, "dropped_session_cap": 0}
+
+    def _ensure_started(self) -> None:
+        if self._threads and self._pid == os.getpid():
+            return
+        self._queue.clear()
+        self._inflight.clear()
+        self._pid = os.getpid()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"prefetch-{i}", daemon=True) for i in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _session(self, session_id: str) -> dict:
+        session = self._sessions.pop(session_id, None) or {"history": deque(maxlen=HISTORY_LENGTH), "prefetched": 0}
+        self._sessions[session_id] = session
+        while len(self._sessions) > MAX_SESSIONS:
+            self._sessions.popitem(last=False)
+        return session
+
+    def _budget_left(self) -> bool:
+        hour = int(time.time() // 3600)
+        if hour != self._hour:
+            self._hour, self.tokens_this_hour = hour, 0
+        return self.tokens_this_hour < self.max_tokens_per_hour
+
+    def observe(self, session_id: str, question: str, answer_fn) -> list:
+        """Record an answered question and prefetch its likely follow-ups with `answer_fn(question)`.
+
+        Returns the predicted follow-up questions.
+        """
+        with self._cond:
+            session = self._session(session_id)
+            session["history"].append(question)
+            history = list(session["history"])
+        try:
+            predicted = predict_follow_ups(history, self.top_n)
+        except Exception as e:
+            print(f"[Prefetch] prediction failed: {e}", file=sys.stderr)
+            return []
+
+        with self._cond:
+            self._ensure_started()
+            self.counts["predicted"] += len(predicted)
+            for follow_up in predicted:
+                key = _normalize(follow_up)
+                if key in self._inflight:
+                    continue
+                if session["prefetched"] >= self.max_per_session:
+                    self.counts["dropped_session_cap"] += 1
+                    continue
+                if len(self._queue) >= self.queue_size:
+                    self.counts["dropped_queue_full"] += 1
+                    continue
+                session["prefetched"] += 1
+                self._inflight.add(key)
+                self._queue.append((follow_up, answer_fn))
+                self.counts["queued"] += 1
+            self._cond.notify_all()
+        return predicted
+
+    def _run(self) -> None:
+        _lower_thread_priority()
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                question, answer_fn = self._queue.popleft()
+                over_budget = not self._budget_left()
+            try:
+                if over_budget:
+                    self._drop("dropped_budget")
+                elif (self.busy is not None and self.busy()) or not _provider_has_headroom():
+                    self._drop("dropped_busy")
+                else:
+                    self._answer(question, answer_fn)
+            finally:
+                with self._cond:
+                    self._inflight.discard(_normalize(question))
+
+    def _drop(self, reason: str) -> None:
+        with self._cond:
+            self.counts[reason] += 1
+
+    def _answer(self, question: str, answer_fn) -> None:
+        outcome = "completed"
+        with request_log.track_request("prefetch", question) as trace:
+            try:
+                answer_fn(question)
+            except Exception as e:
+                outcome = "failed"
+                print(f"[Prefetch] failed for {question!r}: {e}", file=sys.stderr)
+        with self._cond:
+            self.counts[outcome] += 1
+            self._budget_left()
+            self.tokens_this_hour += trace.tokens["prompt"] + trace.tokens["completion"]
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "enabled": True,
+                "concurrency": self.concurrency,
+                "queued_now": len(self._queue),
+                "sessions": len(self._sessions),
+                "tokens_this_hour": self.tokens_this_hour,
+                "max_tokens_per_hour": self.max_tokens_per_hour,
+                **self.counts,
+            }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher(busy=None):
+    """Process-wide prefetcher, or None when PREFETCH_ENABLED is off. `busy` is only used on creation."""
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher(busy=busy)
+    return _prefetcher
+
+
+def stats() -> dict:
+    return _prefetcher.stats() if _prefetcher is not None else {"enabled": PREFETCH_ENABLED}
+
+
+def check() -> bool:
+    """A behavioral question predicts only behavioral interview_prep questions that were not asked."""
+    behavioral = _interview_questions().get("behavioral", [])
+    if len(behavioral) < 2:
+        print("⚠️  fewer than two behavioral interview_prep questions; nothing to check", file=sys.stderr)
+        return True
+    history = [behavioral[0], "Describe a conflict with a teammate."]
+    predicted = predict_follow_ups(history, top_n=3)
+    ok = bool(predicted) and all(q in behavioral and q not in history for q in predicted)
+    print(f"{'✅' if ok else '❌'} after {history[-1]!r} predicted {predicted}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check follow-up prediction against the profile.")
+    parser.add_argument("command", choices=["check"])
+    parser.parse_args()
+    sys.exit(0 if check() else 1)
@@ -0,0 +1,229 @@
+"""
+Pre-fork multi-worker server for the Digital Twin FastAPI apps.
+
+`uvicorn --workers N` imports the app separately in every worker, so each one
+loads its own SentenceTransformer, profile and lookup tables and RSS grows by
+the full model size per worker. This runner imports the app and loads the
+read-only state once in a parent process, then forks the workers:
+
+  - model weights are moved to shared memory (torch `share_memory()`), so no
+    worker can dirty them and they are mapped once for all processes
+  - numpy lookup tables are made read-only and stay shared copy-on-write
+  - `gc.freeze()` moves everything loaded so far out of the garbage
+    collector's reach, so collections in the workers do not touch (and copy)
+    those pages
+  - no inference runs in the parent, so each worker starts its own torch
+    thread pool after the fork
+
+The parent owns the listening socket, restarts workers that die and forwards
+SIGINT/SIGTERM to them.
+
+Usage (Linux/macOS; fork is not available on Windows):
+  python digital_twin_prefork.py digital_twin_app:app --workers 4 --port 8000
+  python digital_twin_prefork.py digital_twin_app:app --workers 4 --report-memory
+
+See benchmarks/bench_prefork.py for per-worker memory and throughput scaling.
+"""
+
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+
+# Fork-safety for the HuggingFace tokenizers thread pool.
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def load_app(spec: str):
+    """Import "module:attribute" and return (app, module)."""
+    module_name, _, attr = spec.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr or "app"), module
+
+
+def share_model_memory(model) -> None:
+    """Make a torch model's weights read-only and place them in shared memory."""
+    try:
+        import torch
+    except ImportError:
+        return
+    if not isinstance(model, torch.nn.Module):
+        return
+    model.eval()
+    for param in model.parameters():
+        param.requires_grad_(False)
+    model.share_memory()
+
+
+def freeze_array(array) -> None:
+    """Mark a numpy array read-only so accidental writes fail instead of copying pages."""
+    if array is not None and hasattr(array, "flags"):
+        array.flags.writeable = False
+
+
+def preload_shared_state(module) -> None:
+    """Load the model and read-only corpus in the parent, laid out for sharing."""
+    import digital_twin_resources as resources
+
+    resources.load_profile()
+
+    models = []
+    app_model = getattr(module, "embedding_model", None)
+    if app_model is not None:
+        models.append(app_model)
+    try:
+        models.append(resources.get_embedding_model())
+    except ImportError:
+        pass
+    for model in {id(m): m for m in models}.values():
+        share_model_memory(model)
+
+    try:
+        from digital_twin_precomputed import get_table
+
+        table = get_table()
+        if table is not None:
+            freeze_array(getattr(table, "_matrix", None))
+    except ImportError:
+        pass
+
+    gc.collect()
+    gc.freeze()
+
+
+def read_memory(pid: int) -> dict:
+    """RSS / PSS / USS (private) in kB for a process, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+    return {
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "uss_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _run_worker(app, sock: socket.socket, threads: int, log_level: str) -> None:
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    config = uvicorn.Config(app, log_level=log_level, access_log=False, timeout_keep_alive=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class PreforkServer:
+    def __init__(self, app, host: str, port: int, workers: int, threads: int, log_level: str = "warning"):
+        self.app = app
+        self.workers = workers
+        self.threads = threads
+        self.log_level = log_level
+        self.children = set()
+        self.running = True
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((host, port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self.app, self.sock, self.threads, self.log_level)
+            except BaseException as e:
+                print(f"[Prefork] worker {os.getpid()} crashed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        self.children.add(pid)
+        return pid
+
+    def stop(self, signum=None, frame=None) -> None:
+        self.running = False
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                self.children.discard(pid)
+
+    def memory_report(self) -> dict:
+        report = {"parent": read_memory(os.getpid())}
+        for pid in sorted(self.children):
+            report[str(pid)] = read_memory(pid)
+        return report
+
+    def serve(self, report_after: float = None) -> None:
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚀 Pre-fork server: {self.workers} workers x {self.threads} threads on "
+              f"{self.sock.getsockname()[0]}:{self.sock.getsockname()[1]}")
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        report_at = time.monotonic() + report_after if report_after else None
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid:
+                self.children.discard(pid)
+                if self.running:
+                    print(f"[Prefork] worker {pid} exited ({status}); restarting", file=sys.stderr)
+                    self.spawn()
+                continue
+            if report_at and time.monotonic() >= report_at:
+                print_memory_report(self.memory_report())
+                report_at = None
+            time.sleep(0.2)
+        self.sock.close()
+
+
+def print_memory_report(report: dict) -> None:
+    print("📊 Memory (MB):      RSS      PSS   USS (private)")
+    for name, mem in report.items():
+        if mem:
+            print(f"   {name:>10}  {mem['rss_kb'] / 1024:8.1f} {mem['pss_kb'] / 1024:8.1f} {mem['uss_kb'] / 1024:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a Digital Twin app with pre-forked workers.")
+    parser.add_argument("app", nargs="?", default="digital_twin_app:app", help="module:attribute of the ASGI app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads per worker")
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--report-memory", action="store_true", help="print per-worker memory after warm-up")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("Pre-fork mode needs os.fork(); use `uvicorn --workers` on this platform.")
+
+    app, module = load_app(args.app)
+    preload_shared_state(module)
+    server = PreforkServer(app, args.host, args.port, args.workers, args.threads, args.log_level)
+    server.serve(report_after=5.0 if args.report_memory else None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+On-demand per-request profiling for the Digital Twin APIs.
+
+A request is profiled when either
+
+  - it carries the `X-Debug-Profile` header (whose value must equal
+    PROFILING_TOKEN when one is configured); the response then includes a
+    summary of the hottest frames, or
+  - it is picked by PROFILING_SAMPLE_RATE; only the profile file is stored.
+
+Profiles cover the request's own thread (embedding, vector call, JSON handling,
+LLM call) and are written to PROFILING_DIR: an HTML flame view with
+pyinstrument (sampling profiler, optional dependency), or a .prof file with
+the stdlib cProfile fallback (open with `snakeviz` or `python -m pstats`).
+
+With PROFILING_ENABLED unset the hook is a single boolean check per request.
+
+Environment variables:
+  - PROFILING_ENABLED (default "0")
+  - PROFILING_TOKEN (optional shared secret for the header)
+  - PROFILING_SAMPLE_RATE (default 0.0, fraction of requests)
+  - PROFILING_DIR (default logs/profiles, /tmp/profiles on Vercel)
+  - PROFILING_INTERVAL_MS (pyinstrument sampling interval, default 1)
+  - PROFILING_TOP_N (default 15)
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+
+import digital_twin_request_log as request_log
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") in ("1", "true", "True")
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_DIR = os.getenv(
+    "PROFILING_DIR", "/tmp/profiles" if os.getenv("VERCEL") else os.path.join(ROOT_DIR, "logs", "profiles")
+)
+INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))
+TOP_N = int(os.getenv("PROFILING_TOP_N", "15"))
+
+PROFILE_HEADER = "X-Debug-Profile"
+
+# cProfile hooks are process-wide on Python 3.12+, so only one may run at a time
+_cprofile_lock = threading.Lock()
+
+
+class ProfileCapture:
+    """Result of one profiled request; `summary` is filled in when the block exits."""
+
+    def __init__(self, route: str, return_summary: bool):
+        self.route = route
+        self.return_summary = return_summary
+        self.id = uuid.uuid4().hex[:12]
+        self.summary = None
+
+
+def _wants_profile(headers):
+    """(profile this request?, return the summary?)"""
+    value = headers.get(PROFILE_HEADER) if headers is not None else None
+    if value:
+        if PROFILING_TOKEN and value != PROFILING_TOKEN:
+            return False, False
+        return True, True
+    return (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE), False
+
+
+def _location(file_path, line_no) -> str:
+    path = file_path or "?"
+    if path.startswith(ROOT_DIR):
+        path = os.path.relpath(path, ROOT_DIR)
+    return f"{path}:{line_no}"
+
+
+def _pyinstrument_hottest(root) -> list:
+    """Aggregate self time per function over pyinstrument's frame tree."""
+    totals = {}
+    stack = [root] if root is not None else []
+    while stack:
+        frame = stack.pop()
+        stack.extend(frame.children)
+        self_time = getattr(frame, "total_self_time", None)
+        if self_time is None:
+            self_time = getattr(frame, "self_time", 0.0)
+        if not self_time or not frame.function:
+            continue
+        key = (frame.function, _location(frame.file_path, frame.line_no))
+        totals[key] = totals.get(key, 0.0) + self_time
+    ranked = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:TOP_N]
+    return [{"function": f, "location": loc, "self_ms": round(t * 1000, 2)} for (f, loc), t in ranked]
+
+
+def _cprofile_hottest(profiler) -> list:
+    import pstats
+
+    stats = pstats.Stats(profiler).stats
+    ranked = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:TOP_N]
+    return [
+        {
+            "function": func,
+            "location": _location(file_path, line_no),
+            "self_ms": round(tt * 1000, 2),
+            "cumulative_ms": round(ct * 1000, 2),
+            "calls": nc,
+        }
+        for (file_path, line_no, func), (_, nc, tt, ct, _) in ranked
+    ]
+
+
+def _output_path(capture: ProfileCapture, extension: str) -> str:
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    route = capture.route.strip("/").replace("/", "_") or "root"
+    return os.path.join(PROFILING_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{capture.id}.{extension}")
+
+
+@contextmanager
+def _profiled(capture: ProfileCapture):
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    start = time.perf_counter()
+    if Profiler is not None:
+        profiler = Profiler(interval=INTERVAL_MS / 1000)
+        profiler.start()
+        try:
+            yield capture
+        finally:
+            session = profiler.stop()
+            path = _output_path(capture, "html")
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+            except OSError as e:
+                print(f"[Profiling] could not write {path}: {e}", file=sys.stderr)
+                path = None
+            root = session.root_frame() if session is not None else None
+            capture.summary = {
+                "id": capture.id,
+                "profiler": "pyinstrument",
+                "wall_ms": round((time.perf_counter() - start) * 1000, 2),
+                "file": path,
+                "hottest": _pyinstrument_hottest(root),
+            }
+        return
+
+    import cProfile
+
+    if not _cprofile_lock.acquire(blocking=False):
+        # Another request is already being profiled in this process
+        yield None
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield capture
+        finally:
+            profiler.disable()
+    finally:
+        _cprofile_lock.release()
+    path = _output_path(capture, "prof")
+    try:
+        profiler.dump_stats(path)
+    except OSError as e:
+        print(f"[Profiling] could not write {path}: {e}", file=sys.stderr)
+        path = None
+    capture.summary = {
+        "id": capture.id,
+        "profiler": "cProfile",
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2),
+        "file": path,
+        "hottest": _cprofile_hottest(profiler),
+    }
+
+
+def profile_request(headers, route: str):
+    """Context manager yielding a ProfileCapture if this request is profiled, else None.
+
+    `headers` is any mapping with .get() (Starlette headers, http.server headers).
+    """
+    if not PROFILING_ENABLED:
+        return nullcontext()
+    profile, return_summary = _wants_profile(headers)
+    if not profile:
+        return nullcontext()
+    return _profiled(ProfileCapture(route, return_summary))
+
+
+def finish(capture) -> dict:
+    """Log where a finished capture went; return the summary if the caller asked for it."""
+    if capture is None or capture.summary is None:
+        return None
+    request_log.note(profile_id=capture.id, profile_file=capture.summary["file"])
+    print(f"[Profiling] {capture.route} profiled in {capture.summary['wall_ms']} ms → {capture.summary['file']}",
+          file=sys.stderr)
+    return capture.summary if capture.return_summary else None
@@ -0,0 +1,195 @@
+"""
+Replay a captured request log against a running Digital Twin API.
+
+Reads the JSON lines written by digital_twin_request_log and re-issues each
+request at its recorded offset from the first one, optionally sped up or
+slowed down, so load tests follow the shape of real traffic.
+
+Records only carry question text when the service ran with
+REQUEST_LOG_QUESTIONS=1. For hash-only logs, pass --questions with a file of
+candidate questions (one per line); they are matched to records by hash.
+
+Only HTTP requests are replayed (routes starting with "/"): MCP tool calls,
+CLI batch runs and the prefetcher's own background answers are logged too,
+but they have no URL, and re-sending speculative prefetch traffic as if
+users had sent it would inflate the load. Each request is re-sent with the
+mode, stage list, enhance/format overrides and session_id it was logged
+with, so /rag requests keep their mode and sessions keep prefetching.
+
+Usage:
+  python digital_twin_replay.py logs/request_log.jsonl --target http://localhost:8000
+  python digital_twin_replay.py logs/request_log.jsonl --target http://localhost:8000 --speed 5
+  python digital_twin_replay.py log.jsonl --target http://localhost:8000 --questions questions.txt --route /rag
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from digital_twin_request_log import question_hash
+
+# (request body field, request log field) re-sent with every replayed question
+_BODY_FIELDS = [
+    ("mode", "mode"),
+    ("stages", "request_stages"),
+    ("enhance_query", "enhance_query"),
+    ("format_response", "format_response"),
+    ("session_id", "session_id"),
+]
+
+
+def load_records(path: str, questions_path: str = None) -> tuple:
+    """Return (replayable records sorted by ts, number skipped for lack of question text,
+    number skipped as not HTTP requests)."""
+    by_hash = {}
+    if questions_path:
+        with open(questions_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    by_hash[question_hash(line.strip())] = line.strip()
+
+    records, skipped, not_http = [], 0, 0
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not str(record.get("route") or "").startswith("/"):
+                not_http += 1
+                continue
+            question = record.get("question") or by_hash.get(record.get("question_hash"))
+            if not question or "ts" not in record:
+                skipped += 1
+                continue
+            record["question"] = question
+            records.append(record)
+    records.sort(key=lambda r: r["ts"])
+    return records, skipped, not_http
+
+
+def request_body(record: dict) -> dict:
+    """JSON body re-creating a logged request: the question plus its logged mode and options."""
+    body = {"question": record["question"]}
+    for body_field, record_field in _BODY_FIELDS:
+        if record.get(record_field) is not None:
+            body[body_field] = record[record_field]
+    return body
+
+
+def send(target: str, route: str, body: dict, timeout: float) -> tuple:
+    """POST one request body; return (status, latency_ms)."""
+    body = json.dumps(body).encode("utf-8")
+    request = urllib.request.Request(
+        target.rstrip("/") + route, data=body, headers={"Content-Type": "application/json"}, method="POST"
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0  # connection error / timeout
+    return status, (time.perf_counter() - start) * 1000
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def replay(records: list, target: str, speed: float = 1.0, route: str = None,
+           concurrency: int = 64, timeout: float = 30.0) -> dict:
+    """Re-issue records at their recorded offsets divided by `speed`."""
+    results = []
+    lock = threading.Lock()
+    lag = []
+
+    def run(record):
+        status, latency = send(target, route or record["route"], request_body(record), timeout)
+        with lock:
+            results.append((status, latency))
+
+    t0_recorded = records[0]["ts"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            due = (record["ts"] - t0_recorded) / speed
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag.append(-delay * 1000)
+            pool.submit(run, record)
+    elapsed = time.perf_counter() - start
+
+    latencies = [l for s, l in results if 200 <= s < 300]
+    statuses = {}
+    for s, _ in results:
+        statuses[str(s)] = statuses.get(str(s), 0) + 1
+    return {
+        "requests": len(results),
+        "elapsed_s": round(elapsed, 2),
+        "achieved_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "recorded_span_s": round(records[-1]["ts"] - t0_recorded, 2),
+        "speed": speed,
+        "statuses": statuses,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies), 1) if latencies else None,
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+        },
+        # How far behind schedule the dispatcher fell; large values mean the
+        # client, not the server, was the bottleneck.
+        "max_dispatch_lag_ms": round(max(lag), 1) if lag else 0.0,
+    }
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a Digital Twin request log against a target API.")
+    parser.add_argument("log", help="request log (JSON lines)")
+    parser.add_argument("--target", required=True, help="base URL, e.g. http://localhost:8000")
+    parser.add_argument("--speed", type=_positive_float, default=1.0, help="time scale; 2 replays twice as fast")
+    parser.add_argument("--route", default=None, help="override the recorded route for every request")
+    parser.add_argument("--questions", default=None, help="question file to resolve hash-only records")
+    parser.add_argument("--concurrency", type=int, default=64, help="max in-flight requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N records")
+    args = parser.parse_args()
+
+    records, skipped, not_http = load_records(args.log, args.questions)
+    if args.limit:
+        records = records[:args.limit]
+    if not_http:
+        print(f"⚠️  Skipped {not_http} records that were not HTTP requests (MCP, CLI, prefetch)", file=sys.stderr)
+    if skipped:
+        print(f"⚠️  Skipped {skipped} records without question text", file=sys.stderr)
+    if not records:
+        print("No replayable records found", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"🔁 Replaying {len(records)} requests against {args.target} at {args.speed}x", file=sys.stderr)
+    summary = replay(records, args.target, speed=args.speed, route=args.route,
+                     concurrency=args.concurrency, timeout=args.timeout)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Structured per-request log for the Digital Twin Python services.
+
+Each request handled by the APIs produces one JSON line with the question
+hash, per-stage timings, cache hits, token counts (in total and per LLM
+stage, with their cost; see digital_twin_usage.py) and the LLM provider used:
+
+    with track_request("/rag", question):
+        answer = rag_answer(question)
+
+Pipeline code reports into the active request with `stage(...)` and `note(...)`;
+both are no-ops when no request is being tracked, so the CLI and scripts can
+call the same functions.
+
+Records are handed to a background writer thread through an in-memory queue
+and written in batches, so the request path never waits on disk. If the queue
+is full the record is dropped and counted rather than blocking.
+
+Environment variables:
+  - REQUEST_LOG_ENABLED (default "1")
+  - REQUEST_LOG_PATH (default logs/request_log.jsonl, or /tmp on Vercel)
+  - REQUEST_LOG_QUESTIONS (default "0"; set to "1" to store question text for replay)
+  - REQUEST_LOG_FLUSH_INTERVAL (seconds, default 1.0), REQUEST_LOG_BATCH_SIZE (default 256)
+"""
+
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import digital_twin_usage as usage
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LOG_ENABLED = os.getenv("REQUEST_LOG_ENABLED", "1") not in ("0", "false", "False")
+DEFAULT_LOG_PATH = (
+    "/tmp/digital_twin_request_log.jsonl"
+    if os.getenv("VERCEL")
+    else os.path.join(ROOT_DIR, "logs", "request_log.jsonl")
+)
+LOG_PATH = os.getenv("REQUEST_LOG_PATH", DEFAULT_LOG_PATH)
+LOG_QUESTIONS = os.getenv("REQUEST_LOG_QUESTIONS", "0") in ("1", "true", "True")
+FLUSH_INTERVAL = float(os.getenv("REQUEST_LOG_FLUSH_INTERVAL", "1.0"))
+BATCH_SIZE = int(os.getenv("REQUEST_LOG_BATCH_SIZE", "256"))
+QUEUE_SIZE = int(os.getenv("REQUEST_LOG_QUEUE_SIZE", "10000"))
+
+
+def question_hash(question: str) -> str:
+    """Stable hash of a normalized question (case and whitespace insensitive)."""
+    normalized = " ".join(question.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+class RequestTrace:
+    """Mutable record for one request; pipeline stages add timings and counters to it."""
+
+    def __init__(self, route: str, question: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.route = route
+        self.question = question
+        self.started = time.time()
+        self._start_perf = time.perf_counter()
+        self.stages = {}
+        self.cache = {}
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.stage_tokens = {}
+        self.cost_usd = 0.0
+        self.provider = None
+        self.fields = {}
+
+    def add_stage(self, name: str, elapsed_ms: float) -> None:
+        self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 2)
+
+    def to_record(self, status: int) -> dict:
+        record = {
+            "ts": round(self.started, 3),
+            "id": self.id,
+            "route": self.route,
+            "question_hash": question_hash(self.question),
+            "status": status,
+            "total_ms": round((time.perf_counter() - self._start_perf) * 1000, 2),
+            "stages_ms": self.stages,
+            "cache_hits": self.cache,
+            "tokens": self.tokens,
+            "stage_tokens": self.stage_tokens,
+            "cost_usd": round(self.cost_usd, 8),
+            "provider": self.provider,
+        }
+        if LOG_QUESTIONS:
+            record["question"] = self.question
+        record.update(self.fields)
+        return record
+
+
+_current = contextvars.ContextVar("digital_twin_request_trace", default=None)
+
+
+def current_trace():
+    """The RequestTrace for the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def stage(name: str):
+    """Time a pipeline stage into the active request, if any."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def note(**fields) -> None:
+    """Attach extra fields (e.g. retrieval_k=3) to the active request record."""
+    trace = _current.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+
+def note_cache(name: str, hit: bool) -> None:
+    trace = _current.get()
+    if trace is not None:
+        trace.cache[name] = hit
+
+
+def note_llm_call(provider: str, usage_info=None, stage: str = None, model: str = None) -> None:
+    """Record which provider served a completion and the tokens it reported,
+    in total and under the pipeline stage that made the call."""
+    trace = _current.get()
+    if trace is None:
+        return
+    trace.provider = provider
+    if usage_info is None:
+        return
+    prompt = int(getattr(usage_info, "prompt_tokens", 0) or 0)
+    completion = int(getattr(usage_info, "completion_tokens", 0) or 0)
+    trace.tokens["prompt"] += prompt
+    trace.tokens["completion"] += completion
+    trace.cost_usd += usage.cost_usd(model, prompt, completion)
+    if stage:
+        counts = trace.stage_tokens.setdefault(stage, {"calls": 0, "prompt": 0, "completion": 0})
+        counts["calls"] += 1
+        counts["prompt"] += prompt
+        counts["completion"] += completion
+
+
+class RequestLogWriter:
+    """Background thread that batches records and appends them as JSON lines."""
+
+    def __init__(self, path: str = LOG_PATH, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, queue_size: int = QUEUE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # A forked worker inherits the object but not the thread.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._thread = threading.Thread(target=self._run, name="request-log-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, record: dict) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self, first=None) -> list:
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list) -> None:
+        if not batch:
+            return
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in batch)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+            self.written += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            print(f"[Request Log] write failed: {e}", file=sys.stderr)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            # Give concurrent requests a moment to land in the same batch.
+            time.sleep(min(0.05, self.flush_interval))
+            self._write(self._drain(first))
+
+    def flush(self) -> None:
+        """Write everything still queued (called at interpreter exit)."""
+        if self._pid != os.getpid():
+            return
+        while not self._queue.empty():
+            self._write(self._drain())
+
+
+_writer = RequestLogWriter()
+atexit.register(_writer.flush)
+
+
+def get_writer() -> RequestLogWriter:
+    return _writer
+
+
+@contextmanager
+def track_request(route: str, question: str):
+    """Track one request and emit its record when the block exits."""
+    trace = RequestTrace(route, question)
+    token = _current.set(trace)
+    status = 200
+    try:
+        yield trace
+    except BaseException as e:
+        status = getattr(e, "status_code", 500)
+        raise
+    finally:
+        _current.reset(token)
+        record = trace.to_record(status)
+        usage.record(record)
+        if LOG_ENABLED:
+            _writer.submit(record)
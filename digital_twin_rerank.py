@@ -0,0 +1,154 @@
+"""
+Optional cross-encoder rerank stage for retrieval.
+
+Vector search over leaf-level profile snippets often ranks a loosely related
+leaf above the one that actually answers the question. When enabled, the
+retriever fetches a wider candidate set and this module rescores every
+(query, candidate) pair with a small local cross-encoder in one batch.
+
+- Pair scores are cached (LRU), so repeated questions cost nothing extra.
+- Each call has a latency budget. If the predicted cost of the uncached pairs
+  exceeds it, or the batch does not finish in time, the candidates are
+  returned in vector order. A late batch still completes in the background
+  and fills the cache for next time.
+
+Environment variables:
+  - RERANK_ENABLED (default "0")
+  - RERANK_MODEL (default cross-encoder/ms-marco-MiniLM-L-6-v2)
+  - RERANK_CANDIDATES (default 15)
+  - RERANK_BUDGET_MS (default 150)
+  - RERANK_CACHE_SIZE (default 4096)
+
+See benchmarks/bench_rerank.py for quality gain vs added latency.
+"""
+
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import digital_twin_request_log as request_log
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") in ("1", "true", "True")
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "15"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+
+
+def hit_text(hit) -> str:
+    """Text of a vector hit (Upstash result object or plain dict)."""
+    md = (hit.get("metadata") if isinstance(hit, dict) else getattr(hit, "metadata", None)) or {}
+    text = md.get("text") or md.get("content") or ""
+    title = md.get("title")
+    return f"{title}: {text}" if title and text else text
+
+
+class Reranker:
+    def __init__(self, model_name: str = RERANK_MODEL, cache_size: int = RERANK_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # One scoring thread: the cross-encoder already uses all cores per batch.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._per_pair_ms = None  # running estimate, learned from real batches
+        self._overhead_ms = 5.0
+        self.fallbacks = 0
+        self.reranked = 0
+
+    def _get_model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"🔄 Loading rerank model {self.model_name}...", file=sys.stderr)
+                    self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    @staticmethod
+    def _key(query: str, text: str) -> str:
+        return hashlib.sha1(f"{query}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key):
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _store(self, keys, scores) -> None:
+        with self._cache_lock:
+            for key, score in zip(keys, scores):
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _score_batch(self, query: str, texts: list, keys: list) -> list:
+        start = time.perf_counter()
+        scores = [float(s) for s in self._get_model().predict([(query, t) for t in texts], batch_size=len(texts))]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        per_pair = elapsed_ms / max(1, len(texts))
+        self._per_pair_ms = per_pair if self._per_pair_ms is None else 0.8 * self._per_pair_ms + 0.2 * per_pair
+        self._store(keys, scores)
+        return scores
+
+    def rerank(self, query: str, hits: list, budget_ms: float = RERANK_BUDGET_MS) -> tuple:
+        """Return (hits in best-first order, whether the rerank was applied)."""
+        if len(hits) < 2:
+            return hits, False
+        start = time.perf_counter()
+        texts = [hit_text(h) for h in hits]
+        keys = [self._key(query, t) for t in texts]
+        scores = [self._cached(k) for k in keys]
+        missing = [i for i, s in enumerate(scores) if s is None]
+
+        if missing:
+            predicted = self._overhead_ms + len(missing) * (self._per_pair_ms or 0.0)
+            if self._per_pair_ms is not None and predicted > budget_ms:
+                self.fallbacks += 1
+                request_log.note(rerank="skipped_budget")
+                return hits, False
+            future = self._executor.submit(
+                self._score_batch, query, [texts[i] for i in missing], [keys[i] for i in missing]
+            )
+            remaining = budget_ms / 1000 - (time.perf_counter() - start)
+            try:
+                fresh = future.result(timeout=max(0.0, remaining))
+            except FutureTimeout:
+                self.fallbacks += 1
+                request_log.note(rerank="timeout")
+                return hits, False
+            for i, score in zip(missing, fresh):
+                scores[i] = score
+
+        order = sorted(range(len(hits)), key=lambda i: scores[i], reverse=True)
+        self.reranked += 1
+        request_log.note(rerank="applied", rerank_ms=round((time.perf_counter() - start) * 1000, 2))
+        return [hits[i] for i in order], True
+
+    def warm_up(self) -> None:
+        """Load the model and calibrate the per-pair cost estimate."""
+        self._score_batch("warm up", ["warm up"] * 8, [None] * 8)
+        with self._cache_lock:
+            self._cache.pop(None, None)
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                _reranker = Reranker()
+    return _reranker
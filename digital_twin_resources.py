@@ -0,0 +1,240 @@
+"""
+Shared warm resources for the Digital Twin Python services.
+
+Holds one embedding model, one Upstash index, one Groq client, one OpenAI
+client and one parsed copy of digitaltwin.json per process. Everything is created lazily on first
+use behind a lock, so long-running processes (the MCP server, the FastAPI
+apps) pay the startup cost once and every later call reuses the same objects.
+
+Each LLM client gets its own pooled httpx client (LLM_HTTP_MAX_CONNECTIONS,
+LLM_HTTP_KEEPALIVE_EXPIRY, LLM_HTTP_TIMEOUT), so concurrent requests reuse warm
+connections to the provider.
+
+Log output goes to stderr so the module is safe to use from the stdio MCP
+server, where stdout carries the protocol.
+"""
+
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+
+import digital_twin_index_versions as index_versions
+import digital_twin_request_log as request_log
+from digital_twin_embed_batcher import get_batcher
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except ImportError:  # serverless bundles get their env from the platform
+    pass
+
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # 384-dim
+INDEX_DIMENSION = 1536  # Upstash index dimension; local vectors are zero-padded
+DEFAULT_GROQ_MODEL = "llama-3.1-8b-instant"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+# Connection pool of each LLM client: sized for the concurrent requests of one
+# process, with idle connections kept for reuse instead of re-handshaking TLS
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "32"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "30"))
+
+PROFILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "digitaltwin.json")
+
+_lock = threading.RLock()
+_embedding_model = None
+_index = None
+_groq_client = None
+_groq_checked = False
+_openai_client = None
+_openai_checked = False
+_profile = None
+
+
+def log(message: str) -> None:
+    """Print a diagnostic line to stderr."""
+    print(message, file=sys.stderr, flush=True)
+
+
+def get_embedding_model():
+    """Return the process-wide SentenceTransformer instance."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                from sentence_transformers import SentenceTransformer
+
+                log(f"🔄 Loading embedding model {LOCAL_EMBEDDING_MODEL}...")
+                _embedding_model = SentenceTransformer(LOCAL_EMBEDDING_MODEL)
+                log("✅ Embedding model ready")
+    return _embedding_model
+
+
+def embedding_model_loaded() -> bool:
+    """True once the embedding model is in memory (without triggering a load)."""
+    return _embedding_model is not None
+
+
+def get_index():
+    """Return the process-wide vector index: Upstash, or the local ANN index
+    when VECTOR_BACKEND=local (see digital_twin_ann.py)."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                from digital_twin_ann import VECTOR_BACKEND, get_local_index
+
+                if VECTOR_BACKEND == "local":
+                    _index = get_local_index()
+                    log("✅ Using local ANN index")
+                else:
+                    from upstash_vector import Index
+
+                    _index = Index.from_env()
+                    log("✅ Connected to Upstash Vector")
+    return _index
+
+
+def _pooled_http_client():
+    """httpx client for an LLM SDK with the pool limits above; None keeps the SDK default."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+                            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY),
+        timeout=httpx.Timeout(LLM_HTTP_TIMEOUT, connect=5.0),
+    )
+
+
+def get_groq_client():
+    """Return the process-wide Groq client, or None if GROQ_API_KEY is missing."""
+    global _groq_client, _groq_checked
+    if not _groq_checked:
+        with _lock:
+            if not _groq_checked:
+                api_key = os.getenv("GROQ_API_KEY")
+                if api_key:
+                    from groq import Groq
+
+                    _groq_client = Groq(api_key=api_key, http_client=_pooled_http_client())
+                    log("✅ Groq client initialized")
+                else:
+                    log("ℹ️  GROQ_API_KEY not found; generation is disabled")
+                _groq_checked = True
+    return _groq_client
+
+
+def get_openai_client():
+    """Return the process-wide OpenAI client, or None if OPENAI_API_KEY is missing."""
+    global _openai_client, _openai_checked
+    if not _openai_checked:
+        with _lock:
+            if not _openai_checked:
+                api_key = os.getenv("OPENAI_API_KEY")
+                if api_key:
+                    from openai import OpenAI
+
+                    _openai_client = OpenAI(api_key=api_key, http_client=_pooled_http_client())
+                    log("✅ OpenAI client initialized")
+                _openai_checked = True
+    return _openai_client
+
+
+def load_profile() -> dict:
+    """Load and memoize digitaltwin.json."""
+    global _profile
+    if _profile is None:
+        with _lock:
+            if _profile is None:
+                with open(PROFILE_PATH, "r", encoding="utf-8") as f:
+                    _profile = json.load(f)
+    return _profile
+
+
+def _reset_profile() -> None:
+    global _profile
+    _profile = None
+
+
+index_versions.on_reload(_reset_profile)
+
+
+def flatten_json(obj, parent_key="", sep="."):
+    """Recursively flatten nested JSON into (key, text) pairs, as the indexer does."""
+    items = []
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            new_key = f"{parent_key}{sep}{k}" if parent_key else k
+            items.extend(flatten_json(v, new_key, sep=sep))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            new_key = f"{parent_key}[{i}]"
+            items.extend(flatten_json(v, new_key, sep=sep))
+    else:
+        items.append((parent_key, str(obj)))
+    return items
+
+
+def pad_embedding(values) -> list:
+    """Zero-pad a local embedding to the Upstash index dimension."""
+    embedding_list = list(values)
+    if len(embedding_list) < INDEX_DIMENSION:
+        embedding_list.extend([0.0] * (INDEX_DIMENSION - len(embedding_list)))
+    return embedding_list
+
+
+def embed_texts(texts, batch_size: int = 64) -> list:
+    """Encode many texts in one batched call and return padded vectors."""
+    if not texts:
+        return []
+    embeddings = get_embedding_model().encode(
+        list(texts), batch_size=batch_size, show_progress_bar=False
+    )
+    return [pad_embedding(e.tolist()) for e in embeddings]
+
+
+def encode_matrix(texts, batch_size: int = 128):
+    """Encode texts into an (n, 384) float32 matrix of unit-length rows.
+
+    Used for local scoring, where the zero padding needed by Upstash only
+    wastes memory and FLOPs.
+    """
+    return get_embedding_model().encode(
+        list(texts),
+        batch_size=batch_size,
+        show_progress_bar=False,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+    ).astype("float32", copy=False)
+
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _embed_query_cached(text: str) -> tuple:
+    batcher = get_batcher()
+    if batcher is not None:
+        embedding = batcher.embed(text)
+    else:
+        embedding = get_embedding_model().encode(text, show_progress_bar=False)
+    return tuple(pad_embedding(embedding.tolist()))
+
+
+def embed_query(text: str) -> list:
+    """Embed a single query, memoizing repeated questions."""
+    with request_log.stage("embed"):
+        return list(_embed_query_cached(text.strip()))
+
+
+def warm_up() -> None:
+    """Load every resource eagerly so the first real request is not a cold start."""
+    load_profile()
+    get_groq_client()
+    try:
+        get_index()
+    except Exception as e:
+        log(f"⚠️  Upstash Vector unavailable: {e}")
+    embed_query("warm up")
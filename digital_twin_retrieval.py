@@ -0,0 +1,126 @@
+"""
+Adaptive retrieval for the Digital Twin RAG services.
+
+Instead of a fixed top_k, one query fetches a wider candidate set and the
+number of hits actually used is chosen from the score distribution:
+
+  - relative threshold: keep hits scoring at least RETRIEVAL_RELATIVE_THRESHOLD
+    times the best score
+  - score gap: cut at the largest drop between consecutive scores, if that
+    drop is at least RETRIEVAL_MIN_GAP
+
+The stricter of the two wins, clamped to [RETRIEVAL_MIN_K, RETRIEVAL_MAX_K].
+A narrow question ("what's your email") usually has one clear winner and gets
+a short prompt; a broad one has a flat score curve and keeps more context.
+
+With RERANK_ENABLED=1 and the query text passed in, the candidates are
+reordered by the cross-encoder in digital_twin_rerank.py before the cut; k is
+still chosen from the vector scores.
+
+With VECTOR_METADATA=local, hits are fetched ID-only and their text is
+resolved from the local store (digital_twin_metadata_store.py). Queries go
+to the namespace of the active index version (digital_twin_index_versions.py).
+When the index has section centroids, a query first picks the best top-level
+sections and only searches their leaves (digital_twin_sections.py).
+
+Environment variables (all optional):
+  - RETRIEVAL_CANDIDATES (default 10)
+  - RETRIEVAL_MIN_K (default 1), RETRIEVAL_MAX_K (default 6)
+  - RETRIEVAL_RELATIVE_THRESHOLD (default 0.85)
+  - RETRIEVAL_MIN_GAP (default 0.04)
+"""
+
+import os
+
+import digital_twin_request_log as request_log
+from digital_twin_index_versions import current_version
+from digital_twin_metadata_store import attach_metadata, get_metadata_store
+from digital_twin_rerank import RERANK_CANDIDATES, RERANK_ENABLED, get_reranker
+from digital_twin_sections import get_centroids, section_filter
+from digital_twin_resources import log
+
+CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "1"))
+MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "6"))
+RELATIVE_THRESHOLD = float(os.getenv("RETRIEVAL_RELATIVE_THRESHOLD", "0.85"))
+MIN_GAP = float(os.getenv("RETRIEVAL_MIN_GAP", "0.04"))
+
+
+def choose_k(scores, min_k: int = MIN_K, max_k: int = MAX_K,
+             relative_threshold: float = RELATIVE_THRESHOLD, min_gap: float = MIN_GAP) -> int:
+    """Pick how many of the (descending) scores to keep."""
+    n = min(len(scores), max_k)
+    if n <= min_k:
+        return n
+
+    best = scores[0]
+    k_relative = n
+    if best > 0:
+        k_relative = sum(1 for s in scores[:n] if s >= best * relative_threshold)
+
+    k_gap = n
+    largest_gap = 0.0
+    for i in range(max(min_k, 1), n):
+        gap = scores[i - 1] - scores[i]
+        if gap > largest_gap:
+            largest_gap, k_gap = gap, i
+    if largest_gap < min_gap:
+        k_gap = n
+
+    return max(min_k, min(k_relative, k_gap))
+
+
+def query_index(index, vector, top_k: int, include_metadata: bool = True, hierarchical: bool = True,
+                embedding_model: str = None, **query_kwargs):
+    """index.query(), resolving metadata locally (ID-only response) when the store is enabled.
+
+    With section centroids available (and no explicit filter), only the best
+    sections are searched; see digital_twin_sections.py. Pass the query's
+    `embedding_model` so centroids built with another model are not used.
+    """
+    # Namespace, metadata store and centroids come from one snapshot of the active
+    # version, so a concurrent swap cannot pair new vectors with old metadata
+    version = current_version()
+    store = get_metadata_store(version) if include_metadata else None
+    namespace = (version or {}).get("namespace", "")
+    if namespace and "namespace" not in query_kwargs:
+        query_kwargs["namespace"] = namespace
+    include = include_metadata and store is None
+    results = None
+    centroids = (get_centroids(version, embedding_model)
+                 if hierarchical and "filter" not in query_kwargs else None)
+    if centroids is not None:
+        with request_log.stage("sections"):
+            sections = centroids.pick(vector)
+        request_log.note(retrieval_sections=sections)
+        results = index.query(vector=vector, top_k=top_k, include_metadata=include,
+                              filter=section_filter(sections), **query_kwargs)
+    if not results:
+        results = index.query(vector=vector, top_k=top_k, include_metadata=include, **query_kwargs) or []
+    if store is not None:
+        with request_log.stage("metadata"):
+            results = attach_metadata(results, store)
+    return results
+
+
+def adaptive_query(index, vector, include_metadata: bool = True, candidates: int = CANDIDATES,
+                   min_k: int = MIN_K, max_k: int = MAX_K, query_text: str = None, **query_kwargs):
+    """Query once for `candidates` hits and return (hits, k) after the adaptive cut.
+
+    Pass `query_text` to let the optional rerank stage reorder the candidates.
+    """
+    rerank = RERANK_ENABLED and query_text is not None and include_metadata
+    if rerank:
+        candidates = max(candidates, RERANK_CANDIDATES)
+    with request_log.stage("retrieve"):
+        results = query_index(index, vector, max(candidates, max_k), include_metadata=include_metadata,
+                              **query_kwargs)
+    scores = [float(getattr(r, "score", 0.0)) for r in results]
+    k = choose_k(scores, min_k=min_k, max_k=max_k)
+    top = f"{scores[0]:.3f}" if scores else "n/a"
+    log(f"[Retrieval] adaptive k={k} of {len(results)} candidates (top score {top})")
+    request_log.note(retrieval_k=k, retrieval_candidates=len(results))
+    if rerank:
+        with request_log.stage("rerank"):
+            results, _ = get_reranker().rerank(query_text, list(results))
+    return results[:k], k
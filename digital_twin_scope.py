@@ -0,0 +1,315 @@
+"""
+Out-of-scope gate: answer questions the profile cannot cover without an LLM call.
+
+Retrieval always returns hits, even for "what's the weather in Paris", so the
+RAG paths used to spend a full completion turning poorly matching snippets
+into generic text. The gate looks at the best retrieval score instead:
+
+  - below the calibrated threshold the question is out of scope and gets a
+    templated first-person answer at once, with the closest interview_prep
+    questions as suggestions (when the local embedding model is loaded)
+  - otherwise the pipeline continues as before
+
+The score is always that of the raw question, as in calibration: the
+pipeline's scope stage runs before query enhancement, so an out-of-scope
+question in interview mode costs no LLM call at all.
+
+The threshold is learned from eval/scope_questions.json: every in-scope
+question (that file's list plus the interview_prep questions in the profile)
+and every out-of-scope one is run through the live retrieval path, and the
+threshold is set so that at most SCOPE_MAX_FALSE_REJECT of the in-scope
+questions would be turned away. Recalibrate after rebuilding the index with
+different data or another embedding model:
+
+  python digital_twin_scope.py calibrate
+
+The gate stays off until a calibration file exists (or SCOPE_THRESHOLD is
+set), so it never rejects questions on an uncalibrated guess. Scores from
+different embedding models are not comparable, so the gate also stays off
+for callers whose query embedder is not the one recorded in the calibration
+file (e.g. EMBEDDING_PROVIDER=openai against a MiniLM calibration); a
+SCOPE_THRESHOLD override is taken as set for the embedder in use. `stats()`
+(served at /scope/stats) reports how many questions it absorbed; absorbed
+requests carry `out_of_scope` and `scope_score` in the request log.
+
+Environment variables:
+  - SCOPE_GATE_ENABLED (default 1)
+  - SCOPE_THRESHOLD (overrides the calibrated threshold)
+  - SCOPE_CALIBRATION_PATH (default scope_calibration.json next to this file)
+  - SCOPE_SUGGESTIONS (suggested questions per answer, default 3)
+  - SCOPE_MAX_FALSE_REJECT (calibration only, default 0.02)
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from typing import NamedTuple
+
+import digital_twin_index_versions as index_versions
+import digital_twin_request_log as request_log
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GATE_ENABLED = os.getenv("SCOPE_GATE_ENABLED", "1") not in ("0", "false", "False")
+THRESHOLD_OVERRIDE = os.getenv("SCOPE_THRESHOLD")
+CALIBRATION_PATH = os.getenv("SCOPE_CALIBRATION_PATH", os.path.join(ROOT_DIR, "scope_calibration.json"))
+SUGGESTIONS = int(os.getenv("SCOPE_SUGGESTIONS", "3"))
+MAX_FALSE_REJECT = float(os.getenv("SCOPE_MAX_FALSE_REJECT", "0.02"))
+EVAL_PATH = os.path.join(ROOT_DIR, "eval", "scope_questions.json")
+
+OUT_OF_SCOPE_ANSWER = (
+    "That's outside what I can speak to from my own background. "
+    "I'm happy to talk about my experience, projects, skills and career goals."
+)
+
+
+class ScopeDecision(NamedTuple):
+    score: float
+    answer: str
+    suggestions: list
+
+    def text(self) -> str:
+        """Answer with the suggestions inlined, for plain-text channels (CLI, MCP)."""
+        if not self.suggestions:
+            return self.answer
+        return self.answer + "\n\nYou could ask me, for example:\n" + "\n".join(f"- {q}" for q in self.suggestions)
+
+
+def top_score(results) -> float:
+    """Best score among retrieval hits (objects with .score or dicts with "score")."""
+    scores = [float(r.get("score", 0.0) if isinstance(r, dict) else getattr(r, "score", 0.0)) for r in results or []]
+    return max(scores, default=0.0)
+
+
+_threshold = None
+_threshold_loaded = False
+_calibrated_model = None
+_mismatched_models = set()
+_questions = None
+_questions_lock = threading.Lock()
+_lock = threading.Lock()
+_counts = {"checked": 0, "absorbed": 0, "skipped_model_mismatch": 0}
+_absorbed_scores = deque(maxlen=1000)
+
+
+def get_threshold(embedding_model: str = None):
+    """The active threshold, or None when the gate is off or uncalibrated.
+
+    With `embedding_model` (the caller's query embedder), also None when the
+    calibration was made with a different model.
+    """
+    global _threshold, _threshold_loaded, _calibrated_model
+    if not GATE_ENABLED:
+        return None
+    if THRESHOLD_OVERRIDE:
+        return float(THRESHOLD_OVERRIDE)
+    if not _threshold_loaded:
+        with _lock:
+            if not _threshold_loaded:
+                if os.path.exists(CALIBRATION_PATH):
+                    try:
+                        with open(CALIBRATION_PATH, "r", encoding="utf-8") as f:
+                            calibration = json.load(f)
+                        _threshold = float(calibration["threshold"])
+                        _calibrated_model = calibration.get("embedding_model")
+                    except (OSError, ValueError, KeyError) as e:
+                        print(f"[Scope] failed to load {CALIBRATION_PATH}: {e}", file=sys.stderr)
+                _threshold_loaded = True
+    if _threshold is not None and embedding_model and _calibrated_model and embedding_model != _calibrated_model:
+        with _lock:
+            _counts["skipped_model_mismatch"] += 1
+            first = embedding_model not in _mismatched_models
+            _mismatched_models.add(embedding_model)
+        if first:
+            print(f"[Scope] calibrated with {_calibrated_model}, queries use {embedding_model}; "
+                  f"gate off for them until recalibrated", file=sys.stderr)
+        return None
+    return _threshold
+
+
+def _interview_questions():
+    """(questions, unit-norm embedding matrix) of the interview_prep questions, built once."""
+    global _questions
+    if _questions is None:
+        with _questions_lock:
+            if _questions is None:
+                import digital_twin_resources as resources
+                from digital_twin_precomputed import collect_interview_questions
+
+                questions = [q for _, q, _ in collect_interview_questions(resources.load_profile())]
+                _questions = (questions, resources.encode_matrix(questions) if questions else None)
+    return _questions
+
+
+def suggest_questions(question: str, n: int = SUGGESTIONS) -> list:
+    """interview_prep questions closest to `question`; empty unless the local model is already loaded."""
+    if n <= 0:
+        return []
+    try:
+        from digital_twin_resources import embedding_model_loaded, encode_matrix
+
+        if not embedding_model_loaded():
+            return []
+        questions, matrix = _interview_questions()
+        if matrix is None:
+            return []
+        scores = matrix @ encode_matrix([question])[0]
+    except ImportError:
+        return []
+    return [questions[i] for i in scores.argsort()[::-1][:n]]
+
+
+def gate(question: str, score: float, embedding_model: str = None):
+    """ScopeDecision when `score` (the best retrieval score) is below the threshold, else None.
+
+    `embedding_model` names the embedder that produced `score`; see get_threshold().
+    """
+    threshold = get_threshold(embedding_model)
+    if threshold is None:
+        return None
+    absorbed = score < threshold
+    with _lock:
+        _counts["checked"] += 1
+        if absorbed:
+            _counts["absorbed"] += 1
+            _absorbed_scores.append(score)
+    request_log.note(scope_score=round(score, 4))
+    if not absorbed:
+        return None
+    request_log.note(out_of_scope=True)
+    print(f"[Scope] out of scope (top score {score:.3f} < {threshold:.3f}); skipping the LLM", file=sys.stderr)
+    return ScopeDecision(score, OUT_OF_SCOPE_ANSWER, suggest_questions(question))
+
+
+def stats() -> dict:
+    threshold = get_threshold()
+    with _lock:
+        checked, absorbed = _counts["checked"], _counts["absorbed"]
+        skipped = _counts["skipped_model_mismatch"]
+        scores = list(_absorbed_scores)
+    return {
+        "enabled": threshold is not None,
+        "threshold": threshold,
+        "embedding_model": None if THRESHOLD_OVERRIDE else _calibrated_model,
+        "skipped_model_mismatch": skipped,
+        "checked": checked,
+        "absorbed": absorbed,
+        "absorbed_rate": round(absorbed / checked, 4) if checked else 0.0,
+        "median_absorbed_score": round(statistics.median(scores), 4) if scores else None,
+    }
+
+
+def _reset() -> None:
+    # A rebuilt index may come with a new calibration file and profile questions
+    global _threshold, _threshold_loaded, _calibrated_model, _questions
+    with _lock:
+        _threshold, _threshold_loaded, _calibrated_model, _questions = None, False, None, None
+        _mismatched_models.clear()
+
+
+index_versions.on_reload(_reset)
+
+
+# ---------------------------------------------------------------------------
+# Calibration
+# ---------------------------------------------------------------------------
+
+def choose_threshold(in_scores, out_scores, max_false_reject: float = MAX_FALSE_REJECT) -> dict:
+    """Threshold that rejects at most `max_false_reject` of the in-scope scores.
+
+    Everything strictly below the threshold is rejected, so the allowed-th
+    lowest in-scope score is the highest usable one. The threshold is placed
+    halfway down to the best out-of-scope score under it: the same questions
+    are absorbed, and in-scope paraphrases scoring a little lower still pass.
+    """
+    in_sorted = sorted(in_scores)
+    allowed = int(math.floor(max_false_reject * len(in_sorted)))
+    threshold = in_sorted[allowed]
+    below = [s for s in out_scores if s < threshold]
+    if below:
+        threshold = (threshold + max(below)) / 2
+    absorbed = sum(1 for s in out_scores if s < threshold)
+    return {
+        "threshold": round(threshold, 6),
+        "max_false_reject": max_false_reject,
+        "in_scope": {"n": len(in_sorted), "rejected": sum(1 for s in in_sorted if s < threshold),
+                     "min": round(in_sorted[0], 4), "median": round(statistics.median(in_sorted), 4)},
+        "out_of_scope": {"n": len(out_scores), "absorbed": absorbed,
+                         "absorbed_rate": round(absorbed / len(out_scores), 4) if out_scores else 0.0,
+                         "max": round(max(out_scores), 4) if out_scores else None,
+                         "median": round(statistics.median(out_scores), 4) if out_scores else None},
+    }
+
+
+def retrieval_score(question: str, embed=None, embedding_model: str = None) -> float:
+    """Best score the live retrieval path gives a question (the pipeline's scope stage makes this query).
+
+    `embed` defaults to the local embedding model (digital_twin_resources.embed_query);
+    pass the model another `embed` uses as `embedding_model`.
+    """
+    import digital_twin_resources as resources
+    from digital_twin_retrieval import CANDIDATES, query_index
+
+    vector = (embed or resources.embed_query)(question)
+    return top_score(query_index(resources.get_index(), vector, CANDIDATES,
+                                 embedding_model=embedding_model or resources.LOCAL_EMBEDDING_MODEL))
+
+
+def calibrate(eval_path: str = EVAL_PATH, max_false_reject: float = MAX_FALSE_REJECT) -> dict:
+    import digital_twin_resources as resources
+    from digital_twin_precomputed import collect_interview_questions
+
+    with open(eval_path, "r", encoding="utf-8") as f:
+        eval_set = json.load(f)
+    in_scope = list(eval_set["in_scope"]) + [q for _, q, _ in collect_interview_questions(resources.load_profile())]
+    out_of_scope = list(eval_set["out_of_scope"])
+    in_scores = [retrieval_score(q) for q in in_scope]
+    out_scores = [retrieval_score(q) for q in out_of_scope]
+
+    result = choose_threshold(in_scores, out_scores, max_false_reject)
+    version = index_versions.current_version() or {}
+    result.update({
+        "namespace": version.get("namespace", ""),
+        # retrieval_score() embeds with the local model; callers using another
+        # embedder compare against this and skip the gate
+        "embedding_model": resources.LOCAL_EMBEDDING_MODEL,
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "lowest_in_scope": sorted(zip(in_scores, in_scope))[:3],
+        "highest_out_of_scope": sorted(zip(out_scores, out_of_scope), reverse=True)[:3],
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the out-of-scope gate on the eval question set.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate_cmd = commands.add_parser("calibrate", help="learn the threshold and write the calibration file")
+    calibrate_cmd.add_argument("--eval", default=EVAL_PATH, help="JSON with in_scope and out_of_scope questions")
+    calibrate_cmd.add_argument("--max-false-reject", type=float, default=MAX_FALSE_REJECT,
+                               help="fraction of in-scope questions the gate may turn away")
+    calibrate_cmd.add_argument("--output", default=CALIBRATION_PATH)
+    calibrate_cmd.add_argument("--dry-run", action="store_true", help="print the result without writing it")
+    args = parser.parse_args()
+
+    result = calibrate(args.eval, args.max_false_reject)
+    print(json.dumps(result, indent=2))
+    in_scope, out_of_scope = result["in_scope"], result["out_of_scope"]
+    print(f"🎯 threshold {result['threshold']:.4f}: absorbs {out_of_scope['absorbed']}/{out_of_scope['n']} "
+          f"out-of-scope questions, turns away {in_scope['rejected']}/{in_scope['n']} in-scope ones",
+          file=sys.stderr)
+    if not args.dry_run:
+        tmp_path = f"{args.output}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        os.replace(tmp_path, args.output)
+        print(f"✅ wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Hierarchical two-stage retrieval over the profile's top-level sections.
+
+digitaltwin.json is already a hierarchy (experience, skills,
+projects_portfolio, interview_prep, ...), but a flat query scores every leaf.
+With section centroids:
+
+  1. embed_digitaltwin.py tags each vector with its `top_section` (the first
+     key of its path, prefixed with the profile name for extra twins;
+     attached documents are the "documents" section) and writes the mean
+     unit embedding of every section to a small JSON file.
+  2. At query time the query is scored against the centroids first and only
+     the RETRIEVAL_SECTIONS best sections are searched, through an Upstash
+     metadata filter (or the local ANN index's section rows).
+
+The second stage only touches the leaves of a few sections, so per-query work
+stops growing with the number of profiles and documents, and the hits come
+from a coherent part of the profile. If the filtered query finds nothing the
+retrieval path falls back to a flat query. Without a centroid file (an index
+built before this) retrieval stays flat.
+
+Versioned builds write section_centroids.<version>.json and name it in the
+version pointer, so centroids always match the namespace being queried. An
+in-place build rewrites the file under the same path; readers reload it when
+its inode or mtime changes, and a missing file is looked for again on every
+query.
+
+The file records the embedding model the centroids were built with (files
+from before that were built with the local model). Queries embedded by
+another model (digitaltwin_rag.py's OpenAI embeddings, EMBEDDING_PROVIDER=
+openai) are not comparable with them, so those stay flat.
+
+Environment variables:
+  - RETRIEVAL_HIERARCHICAL (default 1; 0 always queries every leaf)
+  - RETRIEVAL_SECTIONS (sections searched per query, default 3)
+  - SECTION_CENTROIDS_PATH (default section_centroids.json next to this file)
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+
+import digital_twin_index_versions as index_versions
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HIERARCHICAL_ENABLED = os.getenv("RETRIEVAL_HIERARCHICAL", "1") not in ("0", "false", "False")
+SECTIONS_PER_QUERY = int(os.getenv("RETRIEVAL_SECTIONS", "3"))
+CENTROIDS_PATH = os.getenv("SECTION_CENTROIDS_PATH", os.path.join(ROOT_DIR, "section_centroids.json"))
+
+SECTION_FIELD = "top_section"
+DOCUMENTS_SECTION = "documents"
+
+_FILTER_RE = re.compile(rf"^{SECTION_FIELD} IN \((.*)\)$")
+
+
+def top_section(key: str, prefix: str = "") -> str:
+    """Top-level section of a flattened profile key, e.g. "skills" for "skills.technical[0]"."""
+    return prefix + re.split(r"[.\[]", key, maxsplit=1)[0]
+
+
+def section_of_id(vector_id: str) -> str:
+    """Section of an indexed record, from its vector id (see embed_digitaltwin.py)."""
+    if vector_id.startswith(DOCUMENTS_SECTION + "/"):
+        return DOCUMENTS_SECTION
+    return top_section(vector_id)
+
+
+def section_filter(sections) -> str:
+    """Upstash metadata filter restricting a query to the given sections."""
+    quoted = ", ".join("'" + s.replace("'", "\\'") + "'" for s in sections)
+    return f"{SECTION_FIELD} IN ({quoted})"
+
+
+def parse_section_filter(filter_text: str):
+    """Inverse of section_filter(), for backends that emulate Upstash filters."""
+    match = _FILTER_RE.match(filter_text.strip())
+    if not match:
+        raise ValueError(f"unsupported filter: {filter_text!r}")
+    return {name.replace("\\'", "'") for name in re.findall(r"'((?:[^'\\]|\\.)*)'", match.group(1))}
+
+
+class SectionCentroidBuilder:
+    """Accumulates per-section sums of unit embeddings while the indexer streams chunks."""
+
+    def __init__(self):
+        self._sums = {}
+        self._counts = {}
+
+    def add(self, sections, matrix) -> None:
+        import numpy as np
+
+        matrix = np.asarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        for section, row in zip(sections, matrix):
+            if section in self._sums:
+                self._sums[section] += row
+                self._counts[section] += 1
+            else:
+                self._sums[section] = row.copy()
+                self._counts[section] = 1
+
+    def save(self, path: str = CENTROIDS_PATH, base: str = None, embedding_model: str = None) -> int:
+        """Write centroids to `path` (tmp file + os.replace); sections missing from this
+        build keep their centroid from `base` (incremental builds). Returns the section count.
+
+        `embedding_model` names the model the embeddings came from."""
+        import numpy as np
+
+        centroids = {}
+        if base and os.path.exists(base):
+            with open(base, "r", encoding="utf-8") as f:
+                centroids = json.load(f)["sections"]
+        for section, total in self._sums.items():
+            norm = float(np.linalg.norm(total)) or 1.0
+            centroids[section] = {
+                "count": self._counts[section],
+                "centroid": [round(float(x), 6) for x in total / norm],
+            }
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"sections": centroids, "embedding_model": embedding_model}, f)
+        os.replace(tmp_path, path)
+        return len(centroids)
+
+
+def versioned_centroids_path(version: str) -> str:
+    base, ext = os.path.splitext(CENTROIDS_PATH)
+    return f"{base}.{version}{ext}"
+
+
+def active_centroids_path(version=None):
+    """Centroid file for an index version; None for versions built without centroids."""
+    if version:
+        name = version.get("centroids_file")
+        return os.path.join(os.path.dirname(CENTROIDS_PATH), name) if name else None
+    return CENTROIDS_PATH
+
+
+class SectionCentroids:
+    """Loaded centroid matrix with a query → best sections lookup."""
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        sections = data["sections"]
+        self.embedding_model = data.get("embedding_model") or _local_embedding_model()
+        self.names = list(sections)
+        self.counts = [sections[name]["count"] for name in self.names]
+        self.matrix = np.asarray([sections[name]["centroid"] for name in self.names], dtype=np.float32)
+
+    def pick(self, vector, n: int = SECTIONS_PER_QUERY) -> list:
+        import numpy as np
+
+        # Local embeddings are zero-padded to the Upstash dimension; drop the padding
+        query = np.asarray(vector[:self.matrix.shape[1]], dtype=np.float32)
+        scores = self.matrix @ query
+        return [self.names[i] for i in np.argsort(-scores)[:n]]
+
+
+def _local_embedding_model() -> str:
+    from digital_twin_resources import LOCAL_EMBEDDING_MODEL
+
+    return LOCAL_EMBEDDING_MODEL
+
+
+_loaded = {}  # path -> ((inode, mtime), SectionCentroids or None if it failed to load)
+_loaded_lock = threading.Lock()
+_mismatched_models = set()
+
+
+def get_centroids(version=None, embedding_model: str = None):
+    """Centroids for an index version (the caller's snapshot), or None when
+    hierarchical retrieval is off, the index has no centroid file, or the
+    query embedder `embedding_model` is not the one the centroids were built with."""
+    if not HIERARCHICAL_ENABLED:
+        return None
+    path = active_centroids_path(version)
+    if path is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    signature = (st.st_ino, st.st_mtime_ns)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != signature:
+        with _loaded_lock:
+            cached = _loaded.get(path)
+            if cached is None or cached[0] != signature:
+                centroids = None
+                try:
+                    centroids = SectionCentroids(path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[Sections] failed to load {path}: {e}", file=sys.stderr)
+                cached = _loaded[path] = (signature, centroids)
+    centroids = cached[1]
+    if centroids is not None and embedding_model and embedding_model != centroids.embedding_model:
+        if embedding_model not in _mismatched_models:
+            _mismatched_models.add(embedding_model)
+            print(f"[Sections] centroids built with {centroids.embedding_model}, queries use "
+                  f"{embedding_model}; searching every section for them", file=sys.stderr)
+        return None
+    return centroids
+
+
+def _reset() -> None:
+    with _loaded_lock:
+        _loaded.clear()
+
+
+index_versions.on_reload(_reset)
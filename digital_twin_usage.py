@@ -0,0 +1,279 @@
+"""
+Token and cost accounting per route and pipeline stage, plus prompt-size budgets.
+
+Every completion made through digital_twin_cache.cached_chat_completion
+reports the usage Groq/OpenAI returned for it, tagged with the pipeline stage
+(enhance, generate, format, ...). Each request record in the request log then
+carries:
+
+    "tokens":       {"prompt": 1834, "completion": 412}
+    "stage_tokens": {"enhance": {"calls": 1, "prompt": 96, "completion": 31}, "generate": {...}, ...}
+    "cost_usd":     0.000125
+
+and the records are aggregated per route and stage in-process (served at
+/usage/stats by digital_twin_app.py). Cache hits spend nothing and add nothing.
+Per stage, `continuation_rate` is the share of requests whose length-budgeted
+answer ran out of room and took a second, continuation call
+(`{stage}_continued` in the record).
+
+Prices are USD per million tokens (input, output); override or extend them
+with LLM_PRICES='{"model-name": [input, output]}'.
+
+Command line:
+
+  python digital_twin_usage.py report [logs/request_log.jsonl]
+      per-route / per-stage totals, median prompt size and cost from a log
+
+  python digital_twin_usage.py check [--budgets eval/prompt_budgets.json] [--mode advanced]
+      runs the fixed question set through the pipeline with a dry-run LLM
+      client (no API calls, no response cache) and exits 1 when the median
+      prompt size per request of any mode exceeds its budget, so prompt
+      growth from PROFILE_CONTEXT or concatenated retrieval context fails CI
+      instead of showing up on the bill
+
+The check counts prompt tokens as ceil(chars / 4) plus a small per-message
+overhead rather than with a real tokenizer: the budget is compared against
+the same estimate on every machine, and growth is what it is there to catch.
+Modes that retrieve (rag, interview) need the embedding model and index.
+
+Environment variables:
+  - LLM_PRICES (JSON object of model -> [input, output] USD per 1M tokens)
+  - PROMPT_BUDGETS_PATH (default eval/prompt_budgets.json)
+  - PROMPT_TOKEN_BUDGET (overrides every mode's budget in `check`)
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import threading
+from collections import deque
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+try:
+    PRICES = {**DEFAULT_PRICES, **{k: tuple(v) for k, v in json.loads(os.getenv("LLM_PRICES", "{}")).items()}}
+except (ValueError, TypeError) as e:
+    print(f"[Usage] ignoring invalid LLM_PRICES: {e}", file=sys.stderr)
+    PRICES = dict(DEFAULT_PRICES)
+
+BUDGETS_PATH = os.getenv("PROMPT_BUDGETS_PATH", os.path.join(ROOT_DIR, "eval", "prompt_budgets.json"))
+TOKEN_BUDGET = os.getenv("PROMPT_TOKEN_BUDGET")
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+# The dry-run client answers with filler this fraction of max_tokens long:
+# later stages wrap earlier answers (enhanced query, draft answer), so the
+# stand-ins should be about as long as real ones
+DRY_RUN_COMPLETION_FRACTION = 1 / 3
+_SAMPLES_PER_ROUTE = 1000
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Price of one completion; 0.0 for models missing from the price table."""
+    price_in, price_out = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_prompt_tokens(messages) -> int:
+    return sum(estimate_tokens(m.get("content") or "") + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class UsageAggregator:
+    """Per-route and per-stage token totals built from request records."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        tokens = record.get("tokens") or {}
+        stage_tokens = record.get("stage_tokens") or {}
+        with self._lock:
+            route = self._routes.get(record.get("route"))
+            if route is None:
+                route = self._routes[record.get("route")] = {
+                    "requests": 0, "llm_requests": 0, "prompt": 0, "completion": 0, "cost_usd": 0.0,
+                    "stages": {}, "prompt_samples": deque(maxlen=_SAMPLES_PER_ROUTE),
+                }
+            route["requests"] += 1
+            if not stage_tokens and not tokens.get("prompt"):
+                return
+            route["llm_requests"] += 1
+            route["prompt"] += tokens.get("prompt", 0)
+            route["completion"] += tokens.get("completion", 0)
+            route["cost_usd"] += record.get("cost_usd", 0.0)
+            route["prompt_samples"].append(tokens.get("prompt", 0))
+            for name, counts in stage_tokens.items():
+                totals = route["stages"].setdefault(
+                    name, {"requests": 0, "calls": 0, "prompt": 0, "completion": 0, "continued": 0})
+                totals["requests"] += 1
+                totals["continued"] += 1 if record.get(f"{name}_continued") else 0
+                totals["calls"] += counts.get("calls", 1)
+                totals["prompt"] += counts.get("prompt", 0)
+                totals["completion"] += counts.get("completion", 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {}
+            for name, route in self._routes.items():
+                samples = sorted(route["prompt_samples"])
+                routes[name] = {
+                    "requests": route["requests"],
+                    "llm_requests": route["llm_requests"],
+                    "prompt_tokens": route["prompt"],
+                    "completion_tokens": route["completion"],
+                    "cost_usd": round(route["cost_usd"], 6),
+                    "median_prompt_tokens": statistics.median(samples) if samples else 0,
+                    "p95_prompt_tokens": samples[int(0.95 * (len(samples) - 1))] if samples else 0,
+                    "stages": {
+                        stage: {**totals,
+                                "mean_prompt_tokens": round(totals["prompt"] / totals["calls"], 1),
+                                "mean_completion_tokens": round(totals["completion"] / totals["calls"], 1),
+                                "continuation_rate": round(totals["continued"] / totals["requests"], 4)}
+                        for stage, totals in route["stages"].items()
+                    },
+                }
+            return {"routes": routes}
+
+
+_aggregator = UsageAggregator()
+
+
+def record(request_record: dict) -> None:
+    """Add one finished request (RequestTrace.to_record()) to the in-process totals."""
+    _aggregator.add(request_record)
+
+
+def stats() -> dict:
+    return _aggregator.stats()
+
+
+# ---------------------------------------------------------------------------
+# Command line: report / check
+# ---------------------------------------------------------------------------
+
+class DryRunClient:
+    """Stands in for a Groq/OpenAI client: records prompts, answers with filler, calls nothing."""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, *, model, messages, temperature, max_tokens, stop=None):
+        prompt_tokens = estimate_prompt_tokens(messages)
+        completion_tokens = max(1, int(max_tokens * DRY_RUN_COMPLETION_FRACTION))
+        text = ("lorem " * (completion_tokens * CHARS_PER_TOKEN // 6)).strip()
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        )
+
+
+def report(path: str) -> dict:
+    aggregator = UsageAggregator()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    aggregator.add(json.loads(line))
+                except ValueError:
+                    continue
+    return aggregator.stats()
+
+
+def load_budgets(path: str = BUDGETS_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if not config.get("questions") or not config.get("budgets"):
+        raise ValueError(f"{path} needs non-empty 'questions' and 'budgets'")
+    return config
+
+
+def measure_prompts(questions, mode: str) -> dict:
+    """Run `questions` through `mode` with the dry-run client; prompt tokens per request and stage."""
+    # Set before the cache and request log modules are first imported
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.environ["REQUEST_LOG_ENABLED"] = "0"
+    import digital_twin_request_log as request_log
+    import digital_twin_resources as resources
+    from digital_twin_pipeline import run_pipeline
+
+    resources._groq_client, resources._groq_checked = DryRunClient(), True
+    resources._openai_client, resources._openai_checked = None, True
+
+    per_request, per_stage, no_llm = [], {}, 0
+    for question in questions:
+        with request_log.track_request("usage-check", question) as trace:
+            run_pipeline(question, mode=mode)
+        if not trace.stage_tokens:
+            no_llm += 1  # answered by the router or precomputed table
+            continue
+        per_request.append(trace.tokens["prompt"])
+        for name, counts in trace.stage_tokens.items():
+            per_stage.setdefault(name, []).append(counts["prompt"])
+    return {
+        "questions": len(questions),
+        "answered_without_llm": no_llm,
+        "median_prompt_tokens": statistics.median(per_request) if per_request else 0,
+        "max_prompt_tokens": max(per_request, default=0),
+        "median_stage_prompt_tokens": {name: statistics.median(v) for name, v in per_stage.items()},
+    }
+
+
+def check(config: dict, modes=None, budget_override=None, out=None) -> bool:
+    """Print each mode's median prompt size against its budget; False if any is over."""
+    out = out or sys.stdout
+    ok = True
+    for mode in modes or list(config["budgets"]):
+        budget = budget_override or config["budgets"].get(mode)
+        if budget is None:
+            print(f"❌ {mode}: no budget configured", file=out)
+            ok = False
+            continue
+        result = measure_prompts(config["questions"], mode)
+        passed = result["median_prompt_tokens"] <= int(budget)
+        ok = ok and passed
+        status = "✅" if passed else "❌ over budget"
+        print(f"{status} {mode}: median prompt {result['median_prompt_tokens']} tokens "
+              f"(budget {budget}, max {result['max_prompt_tokens']}, "
+              f"{result['answered_without_llm']}/{result['questions']} answered without the LLM)", file=out)
+        for name, median in result["median_stage_prompt_tokens"].items():
+            print(f"     {name:<9} median {median}", file=out)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token usage report and prompt-size budget check.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    report_cmd = commands.add_parser("report", help="aggregate tokens and cost from a request log")
+    report_cmd.add_argument("log", nargs="?", default=None, help="request log (default REQUEST_LOG_PATH)")
+    check_cmd = commands.add_parser("check", help="fail when median prompt size exceeds the budget")
+    check_cmd.add_argument("--budgets", default=BUDGETS_PATH, help="question set and per-mode budgets (JSON)")
+    check_cmd.add_argument("--mode", action="append", help="mode to check (repeatable; default every budgeted mode)")
+    check_cmd.add_argument("--budget", type=int, default=TOKEN_BUDGET, help="override every mode's budget")
+    args = parser.parse_args()
+
+    if args.command == "report":
+        from digital_twin_request_log import LOG_PATH
+
+        print(json.dumps(report(args.log or LOG_PATH), indent=2))
+        return
+    ok = check(load_budgets(args.budgets), args.mode, args.budget)
+    print("✅ prompt sizes within budget" if ok else "❌ prompt size budget exceeded")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
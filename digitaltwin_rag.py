@@ -7,14 +7,43 @@ answers with an LLM using the retrieved context.
 This script queries Upstash Vector using an OpenAI embedding vector (1536-dim)
 to match the embedding model used during indexing. It uses Groq for chat
 completion by default and falls back to OpenAI if GROQ_API_KEY is missing.
+
+Usage:
+  python digitaltwin_rag.py "What are your skills?"     one question
+  python digitaltwin_rag.py                             interactive chat
+  python digitaltwin_rag.py --batch questions.txt       batch mode ("-" reads stdin)
+
+Batch mode reads one question per line (plain text, or JSON objects with
+"question" and an optional "id"), answers them with at most --concurrency in
+flight on one shared set of clients, and streams one JSON line per answer to
+stdout (or --output) as soon as it is ready, with its timings. Progress and
+diagnostics go to stderr. Provider rate limits are waited out and retried.
+
+With --prefetch (or PREFETCH_ENABLED=1) the interactive chat suggests likely
+follow-up questions and answers them in the background while you read
+(see digital_twin_prefetch.py).
 """
 
+import argparse
+import contextlib
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from upstash_vector import Index
 from groq import Groq
 from openai import OpenAI
+from digital_twin_ann import VECTOR_BACKEND, get_local_index
+from digital_twin_admission import Overloaded
+from digital_twin_cache import cached_chat_completion
+from digital_twin_retrieval import adaptive_query, query_index
+from digital_twin_precomputed import answer_from_table
+from digital_twin_prefetch import Prefetcher, get_prefetcher
+from digital_twin_request_log import stage, track_request
+from digital_twin_scope import gate as scope_gate, top_score
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +56,9 @@ DEFAULT_GROQ_MODEL = "llama-3.1-8b-instant"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))
+BATCH_RETRIES = 3
+
 
 def setup_openai_client() -> OpenAI:
     if not OPENAI_API_KEY:
@@ -50,7 +82,10 @@ def setup_groq_client():
 
 
 def setup_vector_database():
-    """Connect to Upstash Vector and report current vector count."""
+    """Connect to Upstash Vector (or the local ANN index) and report current vector count."""
+    if VECTOR_BACKEND == "local":
+        print("✅ Using the local ANN index (VECTOR_BACKEND=local)")
+        return get_local_index()
     print("🔄 Connecting to Upstash Vector...")
     index = Index.from_env()
     print("✅ Connected to Upstash Vector successfully!")
@@ -65,20 +100,28 @@ def setup_vector_database():
 
 
 def embed_query(openai_client: OpenAI, text: str):
-    resp = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=text)
+    with stage("embed"):
+        resp = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=text)
     return resp.data[0].embedding
 
 
-def query_vectors(index: Index, openai_client: OpenAI, query_text: str, top_k: int = 3):
-    """Query Upstash Vector for similar vectors using an embedding vector."""
+def query_vectors(index: Index, openai_client: OpenAI, query_text: str, top_k: int | None = None):
+    """Query Upstash Vector for similar vectors using an embedding vector.
+
+    With top_k=None the number of hits is chosen adaptively from the scores.
+    """
     vector = embed_query(openai_client, query_text)
-    results = index.query(vector=vector, top_k=top_k, include_metadata=True)
+    if top_k is None:
+        results, _ = adaptive_query(index, vector, query_text=query_text, embedding_model=EMBEDDING_MODEL)
+        return results
+    results = query_index(index, vector, top_k, embedding_model=EMBEDDING_MODEL)
     return results
 
 
 def generate_response_with_groq(client: Groq, prompt: str, model: str = DEFAULT_GROQ_MODEL) -> str:
     try:
-        completion = client.chat.completions.create(
+        return cached_chat_completion(
+            client,
             model=model,
             messages=[
                 {
@@ -90,14 +133,16 @@ def generate_response_with_groq(client: Groq, prompt: str, model: str = DEFAULT_
             temperature=0.7,
             max_tokens=500,
         )
-        return completion.choices[0].message.content.strip()
+    except Overloaded:
+        raise
     except Exception as e:
         return f"❌ Error generating response: {e}"
 
 
 def generate_response_with_openai(openai_client: OpenAI, prompt: str, model: str = "gpt-4o-mini") -> str:
     try:
-        completion = openai_client.chat.completions.create(
+        return cached_chat_completion(
+            openai_client,
             model=model,
             messages=[
                 {
@@ -109,27 +154,39 @@ def generate_response_with_openai(openai_client: OpenAI, prompt: str, model: str
             temperature=0.7,
             max_tokens=500,
         )
-        return completion.choices[0].message.content.strip()
+    except Overloaded:
+        raise
     except Exception as e:
         return f"❌ Error generating response (OpenAI): {e}"
 
 
-def rag_query(index: Index, openai_client: OpenAI, groq_client: Groq | None, question: str) -> str:
+def rag_query(index: Index, openai_client: OpenAI, groq_client: Groq | None, question: str,
+              verbose: bool = True) -> str:
+    """Answer one question. Raises Overloaded when the LLM provider's rate limit is exhausted."""
     try:
+        precomputed = answer_from_table(question)
+        if precomputed:
+            return precomputed
+
         # 1) Vector search
-        results = query_vectors(index, openai_client, question, top_k=3)
+        results = query_vectors(index, openai_client, question)
         if not results:
             return "I don't have specific information about that topic."
+        out_of_scope = scope_gate(question, top_score(results), EMBEDDING_MODEL)
+        if out_of_scope is not None:
+            return out_of_scope.text()
 
         # 2) Extract context
-        print("\n🧠 Searching your professional profile...\n")
+        if verbose:
+            print("\n🧠 Searching your professional profile...\n")
         top_docs = []
         for res in results:
             md = getattr(res, "metadata", {}) or {}
             content = md.get("text") or md.get("content") or ""
             title = md.get("title", "Information")
             score = getattr(res, "score", 0.0)
-            print(f"🔹 Found: {title} (Relevance: {score:.3f})")
+            if verbose:
+                print(f"🔹 Found: {title} (Relevance: {score:.3f})")
             if content:
                 if md.get("text") is None and title:
                     top_docs.append(f"{title}: {content}")
@@ -139,7 +196,8 @@ def rag_query(index: Index, openai_client: OpenAI, groq_client: Groq | None, que
         if not top_docs:
             return "I found some information but couldn't extract details."
 
-        print("⚡ Generating personalized response...\n")
+        if verbose:
+            print("⚡ Generating personalized response...\n")
         context = "\n\n".join(top_docs)
         prompt = (
             "Based on the following information about yourself, answer the question.\n"
@@ -154,11 +212,155 @@ def rag_query(index: Index, openai_client: OpenAI, groq_client: Groq | None, que
             return generate_response_with_groq(groq_client, prompt)
         else:
             return generate_response_with_openai(openai_client, prompt)
+    except Overloaded:
+        raise
     except Exception as e:
         return f"❌ Error during query: {e}"
 
 
+def read_questions(stream):
+    """Yield (id, question, error) from lines of plain text or JSON objects; blank lines are skipped.
+
+    A line that cannot be parsed yields its line number, no question and the
+    parse error, so one bad line does not stop the rest of the file.
+    """
+    for n, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                yield str(n), None, f"invalid input line {n}: {e}"
+                continue
+            yield str(item.get("id", n)), str(item.get("question", "")).strip(), None
+        else:
+            yield str(n), line, None
+
+
+def _error_record(qid: str, question, error: str) -> dict:
+    return {"id": qid, "question": question, "answer": None, "error": error}
+
+
+def answer_one(index, openai_client, groq_client, qid: str, question: str, retries: int = BATCH_RETRIES) -> dict:
+    """Answer one batch question and return its output record with timings."""
+    attempt = 0
+    while True:
+        with track_request("cli-batch", question) as trace:
+            try:
+                answer = rag_query(index, openai_client, groq_client, question, verbose=False)
+                error = answer[2:].strip() if answer.startswith("❌") else None
+            except Overloaded as e:
+                if attempt < retries:
+                    attempt += 1
+                    print(f"⏳ [{qid}] rate limited, retrying in {e.retry_after}s", file=sys.stderr)
+                    time.sleep(e.retry_after)
+                    continue
+                answer, error = None, e.detail
+        record = trace.to_record(200)
+        return {
+            "id": qid,
+            "question": question,
+            "answer": None if error else answer,
+            "error": error,
+            "total_ms": record["total_ms"],
+            "stages_ms": record["stages_ms"],
+            "cache_hits": record["cache_hits"],
+            "tokens": record["tokens"],
+            "stage_tokens": record["stage_tokens"],
+            "cost_usd": record["cost_usd"],
+            "provider": record["provider"],
+            "retries": attempt,
+        }
+
+
+def run_batch(index, openai_client, groq_client, questions, out, concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """Answer (id, question, error) items from read_questions() with bounded concurrency,
+    writing JSONL to `out` as each finishes."""
+    write_lock = threading.Lock()
+    done = failed = 0
+    start = time.perf_counter()
+
+    def write(record):
+        nonlocal done, failed
+        done += 1
+        failed += record["error"] is not None
+        with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        if done % 10 == 0:
+            print(f"  {done} answered ({done / (time.perf_counter() - start):.1f}/s)", file=sys.stderr)
+
+    def finish(future):
+        qid, question = pending.pop(future)
+        try:
+            record = future.result()
+        except Exception as e:
+            # One failing question must not abort the rest of the run
+            print(f"❌ [{qid}] {e}", file=sys.stderr)
+            record = _error_record(qid, question, str(e))
+        write(record)
+
+    # Only `concurrency` questions are read ahead, so huge inputs stream through in constant memory
+    pending = {}  # future -> (id, question)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="rag-batch") as pool:
+        for qid, question, error in questions:
+            if error is not None:
+                write(_error_record(qid, question, error))
+                continue
+            if not question:
+                continue
+            if len(pending) >= concurrency:
+                for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                    finish(future)
+            future = pool.submit(answer_one, index, openai_client, groq_client, qid, question)
+            pending[future] = (qid, question)
+        for future in wait(pending).done:
+            finish(future)
+    return {"answered": done, "failed": failed, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ask your Digital Twin questions.")
+    parser.add_argument("question", nargs="*", help="question to answer once (default: $QUESTION or interactive)")
+    parser.add_argument("--batch", metavar="FILE", help='answer every question in FILE ("-" for stdin) as JSONL')
+    parser.add_argument("--output", metavar="FILE", help="batch output file (default: stdout)")
+    parser.add_argument("--prefetch", action="store_true",
+                        help="in interactive mode, prefetch answers to likely follow-ups (or PREFETCH_ENABLED=1)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="questions in flight at once in batch mode (default: $RAG_BATCH_CONCURRENCY or 4)")
+    return parser.parse_args(argv)
+
+
+def batch_main(args):
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    source = sys.stdin if args.batch == "-" else open(args.batch, "r", encoding="utf-8")
+    try:
+        # Keep stdout clean for the JSONL stream; setup chatter goes to stderr
+        with contextlib.redirect_stdout(sys.stderr):
+            openai_client = setup_openai_client()
+            groq_client = setup_groq_client()
+            index = setup_vector_database()
+            summary = run_batch(index, openai_client, groq_client, read_questions(source), out,
+                                concurrency=max(1, args.concurrency))
+        print(f"✅ Batch done: {summary['answered']} answered, {summary['failed']} failed "
+              f"in {summary['seconds']}s", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+
 def main():
+    args = parse_args()
+    if args.batch:
+        batch_main(args)
+        return
+
     print("🤖 Your Digital Twin - AI Profile Assistant")
     print("=" * 50)
     print("🔗 Vector Storage: Upstash (1536-dim vectors)")
@@ -171,11 +373,14 @@ def main():
     print("✅ Your Digital Twin is ready!\n")
 
     # One-shot mode (CLI args or QUESTION env var)
-    question_arg = " ".join(sys.argv[1:]).strip()
+    question_arg = " ".join(args.question).strip()
     question_env = os.getenv("QUESTION", "").strip()
     if question_arg or question_env:
         question = question_arg or question_env
-        answer = rag_query(index, openai_client, groq_client, question)
+        try:
+            answer = rag_query(index, openai_client, groq_client, question)
+        except Overloaded as e:
+            answer = f"⏳ {e.detail} Try again in {e.retry_after}s."
         print(f"🤖 Digital Twin: {answer}")
         return
 
@@ -183,6 +388,11 @@ def main():
     print("🤖 Chat with your AI Digital Twin!")
     print("Ask questions about your experience, skills, projects, or career goals.")
     print("Type 'exit' to quit.\n")
+    prefetcher = Prefetcher() if args.prefetch else get_prefetcher()
+
+    def prefetch_answer(follow_up):
+        return rag_query(index, openai_client, groq_client, follow_up, verbose=False)
+
     while True:
         q = input("You: ").strip()
         if q.lower() in ("exit", "quit"):
@@ -190,8 +400,15 @@ def main():
             break
         if not q:
             continue
-        ans = rag_query(index, openai_client, groq_client, q)
+        try:
+            ans = rag_query(index, openai_client, groq_client, q)
+        except Overloaded as e:
+            ans = f"⏳ {e.detail} Try again in {e.retry_after}s."
         print(f"🤖 Digital Twin: {ans}\n")
+        if prefetcher is not None:
+            suggestions = prefetcher.observe("cli", q, prefetch_answer)
+            if suggestions:
+                print("💡 You might ask next: " + " | ".join(suggestions) + "\n")
 
 
 if __name__ == "__main__":
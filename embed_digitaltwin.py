@@ -6,37 +6,60 @@
 
 import os
 import json
+import time
+import argparse
+import contextlib
+import itertools
 from dotenv import load_dotenv
 from upstash_vector import Index
 
 # Load environment variables
 load_dotenv()
 
-# Try to import sentence-transformers for local embeddings
-try:
-    from sentence_transformers import SentenceTransformer
-    USE_LOCAL_EMBEDDINGS = True
-    print("✅ Using local sentence-transformers model (free, no API key needed)")
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions, fast and efficient
-except ImportError:
-    USE_LOCAL_EMBEDDINGS = False
-    print("⚠️  sentence-transformers not installed. Installing...")
-    import subprocess
-    subprocess.check_call(['pip', 'install', 'sentence-transformers'])
-    from sentence_transformers import SentenceTransformer
-    embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-    USE_LOCAL_EMBEDDINGS = True
-
-vector_index = Index(
-    url=os.getenv("UPSTASH_VECTOR_REST_URL"),
-    token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+import digital_twin_resources as resources
+import digital_twin_ann as ann
+from digital_twin_embedding_pool import EmbeddingPool, chunked
+from digital_twin_index_versions import (
+    POINTER_PATH, current_namespace, current_version, new_version_name, prune_namespaces, publish_version,
 )
+from digital_twin_metadata_store import METADATA_MODE, STORE_PATH, MetadataStoreWriter, versioned_store_path
+from digital_twin_sections import (
+    CENTROIDS_PATH, DOCUMENTS_SECTION, SECTION_FIELD, SectionCentroidBuilder, active_centroids_path,
+    top_section, versioned_centroids_path,
+)
+
+ENCODE_CHUNK_SIZE = 256     # records per worker task
+UPSERT_BATCH_SIZE = 100     # vectors per Upstash upsert call
+DOCUMENT_EXTENSIONS = (".md", ".txt")
+DOCUMENT_CHUNK_WORDS = 200
+
+_vector_index = None
+
 
-def load_digital_twin():
+def ensure_sentence_transformers():
+    """Install sentence-transformers on first run if it is missing."""
+    try:
+        import sentence_transformers  # noqa: F401
+        print("✅ Using local sentence-transformers model (free, no API key needed)")
+    except ImportError:
+        print("⚠️  sentence-transformers not installed. Installing...")
+        import subprocess
+        subprocess.check_call(['pip', 'install', 'sentence-transformers'])
+
+def get_vector_index():
+    global _vector_index
+    if _vector_index is None:
+        _vector_index = Index(
+            url=os.getenv("UPSTASH_VECTOR_REST_URL"),
+            token=os.getenv("UPSTASH_VECTOR_REST_TOKEN")
+        )
+    return _vector_index
+
+def load_digital_twin(json_path=None):
     """Load professional profile JSON file."""
     # Get the directory where this script is located
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_path = os.path.join(script_dir, "digitaltwin.json")
+    json_path = json_path or os.path.join(script_dir, "digitaltwin.json")
     with open(json_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
@@ -58,52 +81,233 @@ def flatten_json(obj, parent_key="", sep="."):
 def generate_embedding(text: str):
     """Create embeddings for given text using local sentence-transformers model."""
     # Using all-MiniLM-L6-v2: 384-dim, fast, and free
-    # Pad to 1536 dimensions to match Upstash Vector index
-    embedding = embedding_model.encode(text, show_progress_bar=False)
-    embedding_list = embedding.tolist()
-    
-    # Pad with zeros to reach 1536 dimensions (Upstash index requirement)
-    if len(embedding_list) < 1536:
-        padding = [0.0] * (1536 - len(embedding_list))
-        embedding_list.extend(padding)
-    
-    return embedding_list
-
-def upload_embeddings_to_upstash(flattened_data):
-    """Send embeddings to Upstash Vector database."""
-    print(f"Uploading {len(flattened_data)} records to Upstash Vector...")
+    # Padded with zeros to 1536 dimensions to match the Upstash Vector index
+    return resources.pad_embedding(
+        resources.get_embedding_model().encode(text, show_progress_bar=False).tolist()
+    )
 
-    count = 0
-    for key, text in flattened_data:
-        if not text.strip():
-            continue
-        
-        try:
-            embedding = generate_embedding(text)
-            # Upstash Vector API format: upsert(vectors=[...])
-            vector_index.upsert(
-                vectors=[
-                    {
-                        "id": key,
-                        "vector": embedding,
-                        "metadata": {"text": text}
-                    }
-                ]
-            )
-            count += 1
-            if count % 50 == 0:
-                print(f"  Uploaded {count}/{len(flattened_data)} records...")
-        except Exception as e:
-            print(f"⚠️  Error uploading {key}: {e}")
+def iter_profile_records(profile_paths):
+    """Yield (id, text, metadata) for every non-empty leaf of each profile.
+
+    The first profile keeps the plain flattened keys as ids; further profiles
+    (other twins) are prefixed with their file name so ids cannot collide.
+    """
+    for i, path in enumerate(profile_paths):
+        prefix = "" if i == 0 else os.path.splitext(os.path.basename(path))[0] + ":"
+        for key, text in flatten_json(load_digital_twin(path)):
+            if text.strip():
+                metadata = {"text": text, SECTION_FIELD: top_section(key, prefix)}
+                if prefix:
+                    metadata["profile"] = prefix[:-1]
+                yield f"{prefix}{key}", text, metadata
+
+def iter_document_records(directory, max_words=DOCUMENT_CHUNK_WORDS):
+    """Yield (id, text, metadata) for word-window chunks of attached .md/.txt documents."""
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(DOCUMENT_EXTENSIONS):
             continue
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            words = f.read().split()
+        for n, start in enumerate(range(0, len(words), max_words)):
+            text = " ".join(words[start:start + max_words])
+            yield f"{DOCUMENTS_SECTION}/{name}#{n}", text, {"text": text, "title": name, SECTION_FIELD: DOCUMENTS_SECTION}
+
+def upload_embeddings_to_upstash(records, workers=1, chunk_size=ENCODE_CHUNK_SIZE,
+                                 upsert_batch_size=UPSERT_BATCH_SIZE, local_metadata=METADATA_MODE == "local",
+                                 namespace="", store_path=STORE_PATH, centroids_path=CENTROIDS_PATH,
+                                 centroids_base=CENTROIDS_PATH):
+    """Embed (id, text, metadata) records and send them to Upstash Vector in batches.
+
+    Records are streamed: at most a few chunks are being encoded or waiting
+    for upload at any time, so memory stays flat however many records there are.
+    With local_metadata the vectors carry only their id and section (for
+    filtering) and the metadata goes to the local store (see
+    digital_twin_metadata_store.py). Section centroids are written to
+    `centroids_path` (see digital_twin_sections.py).
+    Returns (uploaded, failed) record counts.
+    """
+    print(f"Uploading records to Upstash Vector ({workers} embedding worker{'s' if workers > 1 else ''})...")
+    vector_index = get_vector_index()
+    start = time.perf_counter()
+    count = 0
+    failed = 0
+    centroids = SectionCentroidBuilder()
+
+    with EmbeddingPool(workers=workers) as pool, \
+            (MetadataStoreWriter(store_path) if local_metadata else contextlib.nullcontext()) as store:
+        for chunk, matrix in pool.map(chunked(records, chunk_size), key=lambda r: r[1]):
+            centroids.add([metadata[SECTION_FIELD] for _, _, metadata in chunk], matrix)
+            if store is not None:
+                store.add((key, metadata) for key, _, metadata in chunk)
+            for offset in range(0, len(chunk), upsert_batch_size):
+                batch = chunk[offset:offset + upsert_batch_size]
+                vectors = []
+                for (key, _, metadata), row in zip(batch, matrix[offset:offset + upsert_batch_size]):
+                    vector = {"id": key, "vector": resources.pad_embedding(row.tolist())}
+                    if store is None:
+                        vector["metadata"] = metadata
+                    else:
+                        vector["metadata"] = {SECTION_FIELD: metadata[SECTION_FIELD]}
+                    vectors.append(vector)
+                try:
+                    if namespace:
+                        vector_index.upsert(vectors=vectors, namespace=namespace)
+                    else:
+                        vector_index.upsert(vectors=vectors)
+                    count += len(vectors)
+                except Exception as e:
+                    failed += len(vectors)
+                    print(f"⚠️  Error uploading batch starting at {batch[0][0]}: {e}")
+            elapsed = time.perf_counter() - start
+            print(f"  Uploaded {count} records ({count / max(elapsed, 1e-9):.0f} records/s)...")
+
+    print(f"✅ All data embedded and uploaded successfully! Total: {count} records"
+          + (f", {failed} failed" if failed else ""))
+    if local_metadata:
+        print(f"🗂️  Metadata for {store.count} records written to {store_path}")
+    sections = centroids.save(centroids_path, base=centroids_base, embedding_model=resources.LOCAL_EMBEDDING_MODEL)
+    print(f"🧭 {sections} section centroids written to {centroids_path}")
+    return count, failed
+
+def index_embeddings_locally(records, workers=1, chunk_size=ENCODE_CHUNK_SIZE, namespace="", base_namespace=None,
+                             centroids_path=CENTROIDS_PATH, centroids_base=CENTROIDS_PATH):
+    """Embed (id, text, metadata) records into the local ANN index (VECTOR_BACKEND=local).
+
+    Records are upserted into a copy of the `base_namespace` index (None: start
+    empty), and the index and its metadata store are written to the
+    `namespace` directory when every chunk has been added.
+    Returns (indexed, failed) record counts.
+    """
+    directory = ann.namespace_dir(namespace)
+    base_directory = ann.namespace_dir(base_namespace) if base_namespace is not None else None
+    print(f"Indexing records into the local ANN index at {directory} "
+          f"({workers} embedding worker{'s' if workers > 1 else ''})...")
+    local_index = ann.open_index(base_directory)
+    if len(local_index):
+        print(f"  Adding to {ann.describe(local_index)} from {base_directory}")
+    start = time.perf_counter()
+    count = 0
+    centroids = SectionCentroidBuilder()
+
+    base_store = ann.metadata_path(base_directory) if base_directory else None
+    with EmbeddingPool(workers=workers) as pool, \
+            MetadataStoreWriter(ann.metadata_path(directory), base=base_store) as store:
+        for chunk, matrix in pool.map(chunked(records, chunk_size), key=lambda r: r[1]):
+            local_index.add([key for key, _, _ in chunk], matrix)
+            centroids.add([metadata[SECTION_FIELD] for _, _, metadata in chunk], matrix)
+            store.add((key, metadata) for key, _, metadata in chunk)
+            count += len(chunk)
+            elapsed = time.perf_counter() - start
+            print(f"  Indexed {count} records ({count / max(elapsed, 1e-9):.0f} records/s)...")
+        local_index.save(directory)
 
-    print(f"✅ All data embedded and uploaded successfully! Total: {count} records")
+    print(f"✅ Local ANN index saved: {ann.describe(local_index)}")
+    sections = centroids.save(centroids_path, base=centroids_base, embedding_model=resources.LOCAL_EMBEDDING_MODEL)
+    print(f"🧭 {sections} section centroids written to {centroids_path}")
+    return count, 0
+
+def precompute_interview_answers(profile_data):
+    """Pre-generate answers for the interview_prep questions (see digital_twin_precomputed.py)."""
+    from groq import Groq
+    from digital_twin_precomputed import build_table
+
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        print("⚠️  GROQ_API_KEY not set; skipping precomputed answers")
+        return
+    print("🧠 Precomputing answers for interview_prep questions...")
+    build_table(profile_data, Groq(api_key=groq_api_key))
 
 def main():
+    parser = argparse.ArgumentParser(description="Embed digitaltwin.json into Upstash Vector.")
+    parser.add_argument("profiles", nargs="*",
+                        help="profile JSON files to index (default: digitaltwin.json)")
+    parser.add_argument("--documents", help="directory of .md/.txt documents to index with the profile")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="embedding processes, each with its own model (default 1, try the core count)")
+    parser.add_argument("--chunk-size", type=int, default=ENCODE_CHUNK_SIZE,
+                        help="records per worker task")
+    parser.add_argument("--upsert-batch", type=int, default=UPSERT_BATCH_SIZE,
+                        help="vectors per Upstash upsert call")
+    parser.add_argument("--backend", choices=("upstash", "local"), default=ann.VECTOR_BACKEND,
+                        help="index into Upstash Vector or the local ANN index (default: $VECTOR_BACKEND)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="with --backend local and a new version, start from the active version's index")
+    parser.add_argument("--metadata", choices=("upstash", "local"), default=METADATA_MODE,
+                        help="where snippet text lives: in Upstash metadata or a local store (default: $VECTOR_METADATA)")
+    parser.add_argument("--new-version", action="store_true",
+                        help="build into a fresh namespace and switch the APIs to it when done "
+                             "(implied once index_version.json exists)")
+    parser.add_argument("--keep-versions", type=int, default=2,
+                        help="index versions to keep after a versioned build, including the new one")
+    parser.add_argument("--precompute-answers", action="store_true",
+                        help="also pre-generate answers for interview_prep questions")
+    parser.add_argument("--answers-only", action="store_true",
+                        help="only refresh the precomputed answers, skip the vector upload")
+    args = parser.parse_args()
+
     print("🚀 Starting Digital Twin RAG Embedding Process...")
-    profile_data = load_digital_twin()
-    flattened_data = flatten_json(profile_data)
-    upload_embeddings_to_upstash(flattened_data)
+    ensure_sentence_transformers()
+    profile_paths = args.profiles or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "digitaltwin.json")]
+    local_metadata = args.metadata == "local"
+    local_backend = args.backend == "local"
+    # Once versions are in use the APIs read the namespace named by the
+    # pointer, so an in-place build would never be served
+    versioned = not args.answers_only and (args.new_version or os.path.exists(POINTER_PATH))
+    version = new_version_name() if versioned else None
+    failed = 0
+    count = 0
+    if not args.answers_only:
+        records = iter_profile_records(profile_paths)
+        if args.documents:
+            records = itertools.chain(records, iter_document_records(args.documents))
+        if versioned:
+            print(f"🟦 Building index version {version} (namespace '{version}')")
+        # In-place builds upsert into the existing index, so sections they do not
+        # touch keep their centroids; a new version starts from scratch
+        centroids_path = versioned_centroids_path(version) if versioned else CENTROIDS_PATH
+        centroids_base = None if versioned else CENTROIDS_PATH
+        if local_backend:
+            base = None
+            if versioned and args.incremental:
+                base = current_namespace()
+                centroids_base = active_centroids_path(current_version())
+            count, failed = index_embeddings_locally(
+                records, workers=args.workers, chunk_size=args.chunk_size, namespace=version or "",
+                base_namespace=base if versioned else "",
+                centroids_path=centroids_path, centroids_base=centroids_base,
+            )
+        else:
+            count, failed = upload_embeddings_to_upstash(
+                records, workers=args.workers, chunk_size=args.chunk_size, upsert_batch_size=args.upsert_batch,
+                local_metadata=local_metadata, namespace=version or "",
+                store_path=versioned_store_path(version) if versioned else STORE_PATH,
+                centroids_path=centroids_path, centroids_base=centroids_base,
+            )
+    if args.precompute_answers or args.answers_only:
+        precompute_interview_answers(load_digital_twin(profile_paths[0]))
+    if versioned:
+        if failed:
+            print(f"❌ {failed} records failed; version {version} was NOT published, the APIs keep the current one")
+            return
+        publish_version({
+            "version": version,
+            "namespace": version,
+            # The local ANN index keeps its metadata inside the version directory
+            "metadata_file": os.path.basename(versioned_store_path(version))
+            if local_metadata and not local_backend else None,
+            "centroids_file": os.path.basename(versioned_centroids_path(version)),
+            "backend": args.backend,
+            "records": count,
+        })
+        print(f"🟩 Published index version {version}; running APIs switch over within a few seconds")
+        removed = prune_namespaces(ann.get_local_index() if local_backend else get_vector_index(), args.keep_versions)
+        for old in removed:
+            for old_file in (versioned_store_path(old), versioned_centroids_path(old)):
+                if os.path.exists(old_file):
+                    os.remove(old_file)
+        if removed:
+            print(f"🧹 Removed old index versions: {', '.join(removed)}")
 
 if __name__ == "__main__":
     main()